@@ -2,7 +2,8 @@ import gradio as gr
 import asyncio
 import os
 from dotenv import load_dotenv
-from agent.graph.agent import agent
+from agent.graph.agent import DEFAULT_THREAD_ID, agent
+from agent.server import serve
 import logging
 
 # Configure logging
@@ -12,28 +13,53 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-async def respond(message, history):
+async def respond(message, history, request: gr.Request):
     """
-    Handles the chat response from the LangGraph agent.
+    Streams the chat response from the LangGraph agent token by token.
     """
     try:
         logger.info(f"Processing query: {message}")
-        result = await agent.run(message)
-        answer = result.get("answer", "I'm sorry, I couldn't find an answer to your question.")
-        return answer
+        answer = ""
+        # Each browser session is its own thread (and session rate-limit bucket);
+        # per-client rate limits are keyed on the caller's address
+        thread_id = getattr(request, "session_hash", None) or DEFAULT_THREAD_ID
+        client = (
+            request.client.host
+            if request is not None and request.client is not None
+            else None
+        )
+        async for event in agent.stream_run(
+            message, thread_id=thread_id, client_id=client
+        ):
+            if event.type == "progress" and not answer:
+                yield f"⏳ {event.text}..."
+            elif event.type == "token":
+                answer += event.text
+                yield answer
+            elif event.type == "reset":
+                # A streamed draft was withdrawn; the real answer follows
+                answer = ""
+                yield "⏳ ..."
+            elif event.type == "answer":
+                answer = event.text or answer
+        yield answer or "I'm sorry, I couldn't find an answer to your question."
     except Exception as e:
         logger.error(f"Error in responder: {e}")
-        return f"An error occurred: {str(e)}"
+        yield f"An error occurred: {str(e)}"
 
 # Define the Gradio Interface
 demo = gr.ChatInterface(
     fn=respond,
     title="Monte Azul Expert Agent",
     description="I am an expert agent specialized in Corporación Monte Azul. Ask me anything about our services and projects.",
-    examples=["What is Monte Azul Group?", "What is Prado?", "How can I contact sales?"],
+    examples=[
+        "What is Monte Azul Group?",
+        "What is Prado?",
+        "How can I contact sales?"
+    ]
 )
 
 if __name__ == "__main__":
     # Ensure the app runs correctly in local and HF environments
     port = int(os.environ.get("PORT", 7860))
-    demo.launch(server_name="0.0.0.0", server_port=port)
+    serve(demo, host="0.0.0.0", port=port)
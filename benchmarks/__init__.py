@@ -0,0 +1,6 @@
+"""
+Offline evaluation and benchmark scripts for the Monte Azul agent.
+
+Run from the repository root with `src` on the path, e.g.:
+    PYTHONPATH=src python -m benchmarks.router_eval
+"""
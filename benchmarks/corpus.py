@@ -0,0 +1,88 @@
+"""
+Synthetic, seeded corpora shaped like the indexed site: pages split into ~120-word
+Spanish chunks, with a Zipf-distributed shared vocabulary plus per-page topic terms
+so that both keyword and semantic search have something to discriminate on.
+"""
+import random
+from typing import Dict, List
+from langchain_core.documents import Document
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+CHUNKS_PER_PAGE = 20
+WORDS_PER_CHUNK = 120
+
+_COMMON = (
+    "el la de que en los del se las por un para con una su al lo como más pero sus le "
+    "ya o este sí porque esta entre cuando muy sin sobre también me hasta hay donde "
+    "quien desde proyecto empresa servicio cliente desarrollo diseño construcción "
+    "calidad equipo vivienda oficina comercial residencial inversión ubicación acceso "
+    "seguridad áreas verdes sostenible energía agua comunidad familia trabajo "
+    "experiencia años mercado contacto ventas información precio financiamiento "
+    "entrega etapa lote apartamento casa"
+).split()
+_TOPICS = (
+    "prado", "altavista", "bosque", "laguna", "colinas", "mirador", "jardines",
+    "portal", "reserva", "cumbre", "valle", "horizonte", "brisas", "robles", "cedros",
+    "sabana", "montaña", "río", "estrella", "aurora",
+)
+_QUALIFIERS = (
+    "amenidades", "piscina", "gimnasio", "parque", "club", "senderos", "terraza",
+    "lobby", "parqueo", "bodega", "cocina", "balcón", "vista", "planta", "modelo",
+    "acabados",
+)
+
+def _zipf_weights(n: int) -> List[float]:
+    return [1.0 / (rank + 1) for rank in range(n)]
+
+def build_documents(size: str, seed: int = 7) -> List[Document]:
+    """
+    `size` chunks ("1k", "10k", "100k" or an integer string), grouped into pages of
+    CHUNKS_PER_PAGE chunks with `source` metadata.
+    """
+    total = SIZES.get(size) or int(size)
+    rng = random.Random(seed)
+    weights = _zipf_weights(len(_COMMON))
+    docs = []
+    for i in range(total):
+        page = i // CHUNKS_PER_PAGE
+        topic = _TOPICS[page % len(_TOPICS)]
+        extra = _QUALIFIERS[(page // len(_TOPICS)) % len(_QUALIFIERS)]
+        words = rng.choices(_COMMON, weights=weights, k=WORDS_PER_CHUNK)
+        for pos in rng.sample(range(WORDS_PER_CHUNK), 6):
+            words[pos] = rng.choice((topic, topic, extra, f"{topic}{page}"))
+        docs.append(
+            Document(
+                page_content=" ".join(words).capitalize() + ".",
+                metadata={
+                    "source": f"https://bench.local/{topic}/{page}",
+                    "chunk": i % CHUNKS_PER_PAGE
+                }
+            )
+        )
+    return docs
+
+def pages(docs: List[Document]) -> Dict[str, List[Document]]:
+    by_source: Dict[str, List[Document]] = {}
+    for doc in docs:
+        by_source.setdefault(doc.metadata["source"], []).append(doc)
+    return by_source
+
+def build_queries(count: int = 50, seed: int = 11) -> List[str]:
+    """
+    Mixed-language questions about topics present in every corpus size.
+    """
+    rng = random.Random(seed)
+    templates = (
+        "¿Qué es {topic}?",
+        "¿Qué {extra} tiene el proyecto {topic}?",
+        "¿Cuál es el precio de una casa en {topic}?",
+        "What amenities does {topic} offer?",
+        "¿Dónde está ubicado {topic} y cómo lo contacto?",
+        "información de ventas y financiamiento para {topic} {extra}",
+    )
+    return [
+        rng.choice(templates).format(
+            topic=rng.choice(_TOPICS), extra=rng.choice(_QUALIFIERS)
+        )
+        for _ in range(count)
+    ]
@@ -0,0 +1,200 @@
+"""
+Deterministic offline stand-ins for the OpenAI chat and embedding models.
+
+`install()` replaces `langchain_openai.ChatOpenAI` / `OpenAIEmbeddings` before the
+agent creates its clients, so the real code paths (client registry, embedding
+cache, retriever, graph) run unchanged against these backends.
+"""
+import asyncio
+import hashlib
+import time
+import zlib
+from typing import Any, AsyncIterator, Iterator, List, Type
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel
+from agent.core.text_analysis import SpanishAnalyzer
+
+_analyzer = SpanishAnalyzer()
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hashed bag-of-stems vectors (L2-normalized): texts sharing words are close, so
+    retrieval quality and score distributions resemble a real model's.
+    """
+    def __init__(self, size: int = 256, latency: float = 0.0, **_: Any):
+        self.size = size
+        self.latency = latency
+        self.calls = 0
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in _analyzer.analyze(text):
+            h = zlib.crc32(token.encode("utf-8"))
+            vector[h % self.size] += 1.0 if (h >> 16) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            vector[0] = 1.0
+            norm = 1.0
+        return (vector / norm).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+_ANSWER_WORDS = (
+    "Monte Azul desarrolla proyectos residenciales comerciales y de oficinas con "
+    "enfoque en sostenibilidad diseño y calidad de vida para sus clientes en Costa Rica"
+).split()
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model whose output depends only on its input. Structured output returns a
+    research plan derived from the query, or a verdict that is "sufficient" for a
+    `sufficient_rate` share of prompts; plain calls return (and stream word by word)
+    an answer of `answer_words` words.
+    """
+    model_name: str = "fake"
+    latency: float = 0.0
+    answer_words: int = 80
+    sufficient_rate: float = 1.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        seed = int(
+            hashlib.sha1(str(messages[-1].content).encode("utf-8")).hexdigest()[:8], 16
+        )
+        return " ".join(
+            _ANSWER_WORDS[(seed + i) % len(_ANSWER_WORDS)]
+            for i in range(self.answer_words)
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: List[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(
+            generations=[
+                ChatGeneration(message=AIMessage(content=self._answer(messages)))
+            ]
+        )
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: List[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        if self.latency:
+            time.sleep(self.latency)
+        for word in self._answer(messages).split(" "):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: List[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(
+            generations=[
+                ChatGeneration(message=AIMessage(content=self._answer(messages)))
+            ]
+        )
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: List[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for word in self._answer(messages).split(" "):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(
+        self, schema: Type[BaseModel], **kwargs: Any
+    ) -> RunnableLambda:
+        async def respond(messages: List[BaseMessage]) -> BaseModel:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            prompt = str(messages[-1].content)
+            if "plan" in schema.model_fields:
+                query = prompt.split("User Query:", 1)[-1].split("\n", 1)[0].strip()
+                return schema(
+                    reflection="Need facts from the index.",
+                    plan=[query, f"{query} proyectos"]
+                )
+            seed = int(hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8], 16)
+            if (seed % 1000) / 1000 < self.sufficient_rate:
+                return schema(
+                    is_sufficient=True,
+                    reasoning="The retrieved context covers the question."
+                )
+            return schema(
+                is_sufficient=False, reasoning="Some details are still missing."
+            )
+        return RunnableLambda(
+            lambda messages: asyncio.run(respond(messages)), afunc=respond
+        )
+
+def install(
+    llm_latency: float = 0.0,
+    embedding_latency: float = 0.0,
+    embedding_size: int = 256,
+    sufficient_rate: float = 1.0
+) -> None:
+    """
+    Routes every chat/embedding client the agent creates to the fakes. Must run before
+    the first client is created (clients are cached process-wide).
+    """
+    import langchain_openai
+
+    langchain_openai.ChatOpenAI = lambda model="fake", **_: FakeChatModel(
+        model_name=model, latency=llm_latency, sufficient_rate=sufficient_rate
+    )
+    langchain_openai.OpenAIEmbeddings = lambda **_: FakeEmbeddings(
+        size=embedding_size, latency=embedding_latency
+    )
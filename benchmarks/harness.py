@@ -0,0 +1,137 @@
+"""
+Timing/memory measurement and baseline comparison for the benchmark suite.
+"""
+import gc
+import inspect
+import json
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List
+import numpy as np
+
+@dataclass
+class BenchResult:
+    name: str
+    iterations: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    throughput: float      # items per second (items = queries, chunks, turns...)
+    unit: str
+    peak_mem_mb: float     # tracemalloc peak over the memory pass (Python + NumPy)
+
+async def _call(fn: Callable[[int], Any], i: int) -> Any:
+    result = fn(i)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+async def measure(
+    name: str,
+    fn: Callable[[int], Any],
+    iterations: int,
+    warmup: int = 2,
+    items_per_call: int = 1,
+    unit: str = "ops",
+    memory_iterations: int = 3
+) -> BenchResult:
+    """
+    Runs `fn(i)` (sync or async) for i in [0, iterations) after `warmup` untimed calls
+    (i in [iterations, iterations + warmup)), then `memory_iterations` more calls
+    under tracemalloc, which is kept out of the timed loop because it slows
+    allocation-heavy code severalfold. Callers whose calls are not idempotent
+    (ingestion) should map every `i` to distinct work.
+    """
+    for i in range(warmup):
+        await _call(fn, iterations + i)
+
+    gc.collect()
+    latencies = np.empty(iterations)
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        await _call(fn, i)
+        latencies[i] = time.perf_counter() - t0
+    total = time.perf_counter() - start
+
+    peak = 0
+    if memory_iterations:
+        gc.collect()
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        for i in range(memory_iterations):
+            await _call(fn, iterations + warmup + i)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    ms = latencies * 1000
+    return BenchResult(
+        name=name,
+        iterations=iterations,
+        p50_ms=round(float(np.percentile(ms, 50)), 3),
+        p95_ms=round(float(np.percentile(ms, 95)), 3),
+        p99_ms=round(float(np.percentile(ms, 99)), 3),
+        mean_ms=round(float(ms.mean()), 3),
+        throughput=round(iterations * items_per_call / total, 2) if total else 0.0,
+        unit=unit,
+        peak_mem_mb=round(peak / 2**20, 3)
+    )
+
+def print_report(results: List[BenchResult]) -> None:
+    header = (
+        f"{'benchmark':<34} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'throughput':>16} {'peak MB':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r.name:<34} {r.iterations:>5} {r.p50_ms:>9.2f} "
+            f"{r.p95_ms:>9.2f} {r.p99_ms:>9.2f} {r.throughput:>10.1f} "
+            f"{r.unit + '/s':<5} {r.peak_mem_mb:>8.2f}"
+        )
+
+def save_baseline(path: str, results: List[BenchResult], meta: Dict[str, Any]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"meta": meta, "results": {r.name: asdict(r) for r in results}},
+            f,
+            indent=2,
+            sort_keys=True
+        )
+        f.write("\n")
+
+def compare(
+    results: List[BenchResult],
+    baseline_path: str,
+    tolerance: float = 0.25,
+    min_delta_ms: float = 0.5,
+    min_delta_mb: float = 1.0
+) -> List[str]:
+    """
+    Regressions versus the stored baseline: p50/p95 latency or peak memory more than
+    `tolerance` above it (ignoring differences below the absolute noise floors).
+    Benchmarks missing from the baseline are reported as new, not as failures.
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for r in results:
+        base = baseline.get(r.name)
+        if base is None:
+            print(f"  (new) {r.name}: no baseline")
+            continue
+        for metric, floor in (
+            ("p50_ms", min_delta_ms),
+            ("p95_ms", min_delta_ms),
+            ("peak_mem_mb", min_delta_mb)
+        ):
+            current, previous = getattr(r, metric), base[metric]
+            if current > previous * (1 + tolerance) and current - previous > floor:
+                regressions.append(
+                    f"{r.name} {metric}: {previous} -> {current} "
+                    f"(+{(current / previous - 1) if previous else float('inf'):.0%})"
+                )
+    return regressions
@@ -0,0 +1,36 @@
+"""
+Evaluates the router against the labeled corpus and reports accuracy and latency.
+Exits with status 1 on any misclassification.
+
+    PYTHONPATH=src python -m benchmarks.router_eval
+"""
+import sys
+import time
+from agent.core.router import classify_turn
+from tests.test_router import ROUTER_CORPUS
+
+def main() -> int:
+    failures = []
+    for text, kind, language in ROUTER_CORPUS:
+        route = classify_turn(text)
+        if route.kind != kind or (kind is not None and route.language != language):
+            failures.append((text, (kind, language), (route.kind, route.language)))
+
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text, _, _ in ROUTER_CORPUS:
+            classify_turn(text)
+    per_call_us = (time.perf_counter() - start) / (rounds * len(ROUTER_CORPUS)) * 1e6
+
+    accuracy = 1 - len(failures) / len(ROUTER_CORPUS)
+    print(
+        f"router accuracy: {accuracy:.1%} ({len(ROUTER_CORPUS)} turns), "
+        f"{per_call_us:.1f} us/turn"
+    )
+    for text, expected, got in failures:
+        print(f"  MISMATCH {text!r}: expected {expected}, got {got}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+LLM scheduling under overload: many sessions running reflector -> critic -> responder
+turns against a simulated provider with a requests-per-second limit (a token bucket
+holding one second of requests, like OpenAI's RPM limits) that answers 429 with a
+retry-after once it is exhausted. Compares calling the provider directly
+with SDK-style retries against routing every call through the LLMScheduler.
+One extra "heavy" session runs several turns in parallel to check fairness.
+Turn latency and fairness (Jain's index) are over the regular sessions; "heavy" is the
+heavy session's share of completed turns (fair share is 1 / (sessions + 1)).
+Direct-mode latencies only cover the turns that survived their retries, so the exit
+status compares outcomes: it is 1 if scheduling lowers goodput (completed turns per
+second, 5% tolerance) or fails more calls.
+
+    PYTHONPATH=src python -m benchmarks.scheduler [--sessions 40] [--seconds 10]
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Tuple
+import numpy as np
+
+class Provider:
+    """
+    Accepts `rate` requests per second (bucket of one second's worth) with
+    exponential service times; refuses the rest with 429 and the time until the
+    next request would be accepted.
+    """
+    def __init__(self, rate: float, service_time: float, rng: random.Random):
+        self.rate = rate
+        self.service_time = service_time
+        self.rng = rng
+        self.tokens = rate
+        self.updated = time.perf_counter()
+        self.served = 0
+        self.throttled = 0
+
+    async def call(self) -> Tuple[int, float | None]:
+        now = time.perf_counter()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            self.throttled += 1
+            return 429, (1 - self.tokens) / self.rate
+        self.tokens -= 1
+        await asyncio.sleep(self.rng.expovariate(1 / self.service_time))
+        self.served += 1
+        return 200, None
+
+async def with_retries(
+    send: Callable[[], Awaitable[Tuple[int, float | None]]],
+    rng: random.Random,
+    max_retries: int = 3,
+    backoff: float = 0.05
+) -> bool:
+    """
+    The OpenAI SDK's retry loop: honor retry-after, else jittered exponential backoff.
+    """
+    for attempt in range(max_retries + 1):
+        status, retry_after = await send()
+        if status == 200:
+            return True
+        if attempt == max_retries:
+            return False
+        delay = (
+            retry_after
+            if retry_after is not None
+            else min(backoff * 2 ** attempt, 8 * backoff)
+        )
+        await asyncio.sleep(delay * (1 - 0.25 * rng.random()))
+    return False
+
+TURN = (("reflector", "research"), ("critic", "research"), ("responder", "interactive"))
+
+def _percentile_ms(samples: List[float], q: float) -> float:
+    return float(np.percentile(samples, q)) * 1000 if samples else float("nan")
+
+async def run_mode(scheduled: bool, args: argparse.Namespace) -> Dict[str, float]:
+    from agent.core.scheduler import (
+        INTERACTIVE,
+        RESEARCH,
+        LLMScheduler,
+        SchedulerOverloaded
+    )
+
+    rng = random.Random(11)
+    provider = Provider(args.rate, args.service_ms / 1000, rng)
+    scheduler = LLMScheduler(
+        max_concurrency=args.max_concurrency, max_queue=1024, queue_timeout=args.seconds
+    )
+    priorities = {"research": RESEARCH, "interactive": INTERACTIVE}
+    responder_latency: List[float] = []
+    turn_latency: List[float] = []
+    turns: Counter = Counter()
+    failed_calls = 0
+    deadline = time.perf_counter() + args.seconds
+
+    async def send_scheduled(priority: int, tenant: str) -> Tuple[int, float | None]:
+        await scheduler.acquire(priority, tenant)
+        try:
+            status, retry_after = await provider.call()
+            scheduler.record_response(status, retry_after)
+            return status, retry_after
+        finally:
+            scheduler.release()
+
+    async def llm_call(tenant: str, priority: str) -> bool:
+        if not scheduled:
+            return await with_retries(provider.call, rng)
+        try:
+            return await with_retries(
+                lambda: send_scheduled(priorities[priority], tenant), rng
+            )
+        except SchedulerOverloaded:
+            return False
+
+    async def session(tenant: str) -> None:
+        nonlocal failed_calls
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            ok = True
+            for node, priority in TURN:
+                call_start = time.perf_counter()
+                if not await llm_call(tenant, priority):
+                    failed_calls += 1
+                    ok = False
+                    break
+                if node == "responder":
+                    responder_latency.append(time.perf_counter() - call_start)
+            if ok and time.perf_counter() < deadline:
+                if tenant != "heavy":
+                    # The heavy tenant should wait: it gets one conversation's share
+                    turn_latency.append(time.perf_counter() - start)
+                turns[tenant] += 1
+            await asyncio.sleep(rng.expovariate(1 / (args.think_ms / 1000)))
+
+    tasks = [session(f"s{i}") for i in range(args.sessions)]
+    # The heavy tenant: one conversation driving several turns at once
+    tasks += [session("heavy") for _ in range(args.heavy)]
+    await asyncio.gather(*tasks)
+
+    light = np.array([turns[f"s{i}"] for i in range(args.sessions)], dtype=float)
+    jain = (
+        float(light.sum() ** 2 / (len(light) * (light ** 2).sum()))
+        if light.any()
+        else 0.0
+    )
+    total_calls = provider.served + failed_calls
+    return {
+        "goodput": sum(turns.values()) / args.seconds,
+        "failed_calls": failed_calls,
+        "fail_rate": failed_calls / total_calls if total_calls else 0.0,
+        "throttled": provider.throttled,
+        "resp_p50": _percentile_ms(responder_latency, 50),
+        "resp_p99": _percentile_ms(responder_latency, 99),
+        "turn_p99": _percentile_ms(turn_latency, 99),
+        "jain": jain,
+        "heavy_share": turns["heavy"] / max(1, sum(turns.values())),
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sessions", type=int, default=40, help="Concurrent conversations"
+    )
+    parser.add_argument(
+        "--heavy", type=int, default=8, help="Parallel turns of the heavy conversation"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=150.0,
+        help="Requests per second the provider accepts"
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=16,
+        help="Scheduler concurrency limit before adaptation"
+    )
+    parser.add_argument(
+        "--service-ms", type=float, default=50.0, help="Mean provider latency"
+    )
+    parser.add_argument(
+        "--think-ms",
+        type=float,
+        default=20.0,
+        help="Mean pause between a session's turns"
+    )
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    results = {
+        "direct": asyncio.run(run_mode(False, args)),
+        "scheduled": asyncio.run(run_mode(True, args)),
+    }
+    print(
+        f"{'mode':<10} {'turns/s':>8} {'failed':>7} {'429s':>6} {'resp p50':>9} "
+        f"{'resp p99':>9} {'turn p99':>9} {'fairness':>9} {'heavy':>6}"
+    )
+    for mode, r in results.items():
+        print(
+            f"{mode:<10} {r['goodput']:>8.1f} {r['fail_rate']:>6.1%} "
+            f"{r['throttled']:>6} {r['resp_p50']:>7.0f}ms {r['resp_p99']:>7.0f}ms "
+            f"{r['turn_p99']:>7.0f}ms {r['jain']:>9.3f} {r['heavy_share']:>6.1%}"
+        )
+    direct, scheduled = results["direct"], results["scheduled"]
+    return (
+        1
+        if scheduled["goodput"] < direct["goodput"] * 0.95
+        or scheduled["fail_rate"] > direct["fail_rate"]
+        else 0
+    )
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Speculative responder: streams full turns through MonteAzulAgent with and without
+SPECULATIVE_RESPONDER against fake LLMs with a fixed per-call latency, and reports
+turn latency, time to the first answer token, the share of drafts committed and the
+tokens spent on discarded drafts. `--accept-rate` is the share of critic verdicts
+that find the research sufficient (lower it to exercise cancelled drafts).
+Exits with status 1 if speculation makes turns slower at the median (5% tolerance).
+
+    PYTHONPATH=src python -m benchmarks.speculation [--turns 40] [--llm-latency-ms 200]
+        [--accept-rate 0.8]
+"""
+import argparse
+import asyncio
+import logging
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+import numpy as np
+from benchmarks.corpus import build_documents, build_queries, pages
+from benchmarks.suite import configure_environment
+
+async def run_mode(
+    speculative: bool, args: argparse.Namespace, queries: List[str]
+) -> Dict[str, float]:
+    from agent.core.metrics import SPECULATIVE_DRAFTS, SPECULATIVE_WASTE_TOKENS
+    from agent.graph.agent import MonteAzulAgent
+
+    agent = MonteAzulAgent(speculative=speculative)
+    before = {
+        o: SPECULATIVE_DRAFTS.value(outcome=o) for o in ("committed", "discarded")
+    }
+    wasted_before = SPECULATIVE_WASTE_TOKENS.value(kind="completion")
+    latencies: List[float] = []
+    first_tokens: List[float] = []
+    for i in range(args.turns):
+        start = time.perf_counter()
+        first = None
+        async for event in agent.stream_run(
+            queries[i % len(queries)], thread_id=f"spec-{speculative}-{i}"
+        ):
+            if first is None and event.type == "token":
+                first = time.perf_counter() - start
+        latencies.append(time.perf_counter() - start)
+        first_tokens.append(first if first is not None else latencies[-1])
+    await agent.shutdown()
+    committed = SPECULATIVE_DRAFTS.value(outcome="committed") - before["committed"]
+    discarded = SPECULATIVE_DRAFTS.value(outcome="discarded") - before["discarded"]
+    return {
+        "p50": float(np.percentile(latencies, 50)) * 1000,
+        "p95": float(np.percentile(latencies, 95)) * 1000,
+        "ttft": float(np.percentile(first_tokens, 50)) * 1000,
+        "win_rate": (
+            committed / (committed + discarded)
+            if committed + discarded
+            else float("nan")
+        ),
+        "wasted_tokens": (
+            SPECULATIVE_WASTE_TOKENS.value(kind="completion") - wasted_before
+        ) / args.turns
+    }
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    from agent.core.index_sync import sync_source
+    from agent.graph.nodes.research_nodes import get_retriever
+
+    retriever = get_retriever()
+    for source, docs in pages(build_documents(args.size)).items():
+        sync_source(retriever.vector_store, retriever.sparse_index, source, docs)
+    queries = build_queries()
+    return {
+        "baseline": await run_mode(False, args, queries),
+        "speculative": await run_mode(True, args, queries),
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--size", default="1k", help="Corpus size")
+    parser.add_argument(
+        "--llm-latency-ms",
+        type=float,
+        default=200.0,
+        help="Latency of every fake LLM call"
+    )
+    parser.add_argument(
+        "--accept-rate",
+        type=float,
+        default=0.8,
+        help="Share of critic verdicts that accept the research"
+    )
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="monteazul-spec-")
+    configure_environment(workdir, with_caches=False)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("AgentMiddleware").setLevel(logging.WARNING)
+
+    from benchmarks import fakes
+    fakes.install(
+        llm_latency=args.llm_latency_ms / 1000, sufficient_rate=args.accept_rate
+    )
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(
+        f"{'mode':<12} {'turn p50':>9} {'turn p95':>9} {'ttft p50':>9} "
+        f"{'win rate':>9} {'wasted tok/turn':>16}"
+    )
+    for mode, r in results.items():
+        win_rate = "-" if np.isnan(r["win_rate"]) else f"{r['win_rate']:.1%}"
+        print(
+            f"{mode:<12} {r['p50']:>7.0f}ms {r['p95']:>7.0f}ms {r['ttft']:>7.0f}ms "
+            f"{win_rate:>9} {r['wasted_tokens']:>16.1f}"
+        )
+    return 1 if results["speculative"]["p50"] > results["baseline"]["p50"] * 1.05 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
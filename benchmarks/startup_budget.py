@@ -0,0 +1,84 @@
+"""
+Guards serving cold start: imports the agent in a fresh interpreter and fails if
+the import exceeds its time budget or pulls in modules that must load lazily
+(Chroma, Docling, the OpenAI SDK, the Postgres checkpointer).
+Exits with status 1 on a regression.
+
+    PYTHONPATH=src python -m benchmarks.startup_budget [--budget 1.5] [--runs 3]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+MODULE = "agent.graph.agent"
+# Loaded on first use / during warm-up, never at import
+LAZY_MODULES = (
+    "chromadb",
+    "langchain_chroma",
+    "docling",
+    "langchain_docling",
+    "langchain_openai",
+    "openai",
+    "tiktoken",
+    "langgraph.checkpoint.postgres",
+    "gradio",
+)
+
+_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import {MODULE}
+elapsed = time.perf_counter() - start
+loaded = sorted(m for m in {LAZY_MODULES!r} if m in sys.modules)
+print(json.dumps({{"seconds": elapsed, "loaded": loaded}}))
+"""
+
+def probe() -> dict:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "startup-budget")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, ["src", env.get("PYTHONPATH")]))
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=1.5,
+        help="Maximum import time in seconds (best of --runs)"
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    results = [probe() for _ in range(args.runs)]
+    best = min(r["seconds"] for r in results)
+    loaded = sorted({m for r in results for m in r["loaded"]})
+
+    print(
+        f"import {MODULE}: {best:.3f}s (best of {args.runs}, budget {args.budget:.2f}s)"
+    )
+    failed = False
+    if best > args.budget:
+        print(
+            f"  OVER BUDGET by {best - args.budget:.3f}s "
+            f"(see `python -X importtime -c 'import {MODULE}'`)"
+        )
+        failed = True
+    for module in loaded:
+        print(f"  EAGER IMPORT of {module} (must be loaded lazily)")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
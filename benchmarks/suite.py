@@ -0,0 +1,294 @@
+"""
+Offline benchmark suite: ingestion, RAGRetriever.retrieve, every research node and
+full MonteAzulAgent.run turns over synthetic 1k/10k/100k-chunk corpora, with fake
+LLM and embedding backends (no network, no API keys, no Docling).
+
+    PYTHONPATH=src python -m benchmarks                  # all sizes vs. the baseline
+    PYTHONPATH=src python -m benchmarks --sizes 1k,10k   # quicker CI run
+    PYTHONPATH=src python -m benchmarks --save-baseline  # record a new baseline
+
+Exits with status 1 if any benchmark regresses beyond --tolerance.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+from typing import TYPE_CHECKING, Any, Dict, List
+from benchmarks.corpus import SIZES, build_documents, build_queries, pages
+from benchmarks.harness import (
+    BenchResult,
+    compare,
+    measure,
+    print_report,
+    save_baseline
+)
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+def configure_environment(workdir: str, with_caches: bool) -> None:
+    """
+    Must run before any agent module reads Settings (they are cached process-wide).
+    """
+    flag = "true" if with_caches else "false"
+    os.environ.update(
+        {
+            "OPENAI_API_KEY": "offline-benchmark",
+            "CHROMA_PATH": workdir,
+            "DATABASE_URL": "",
+            "ANSWER_CACHE_ENABLED": flag,
+            "RETRIEVAL_CACHE_ENABLED": flag,
+            "EMBEDDING_CACHE_ENABLED": flag,
+            "RETRIEVAL_CACHE_SHARED_PATH": ""
+        }
+    )
+
+class _CorpusConversionService:
+    """
+    Stands in for the Docling pool: "converting" a URL returns its synthetic chunks.
+    """
+    def __init__(self, by_source: Dict[str, List["Document"]]) -> None:
+        self.by_source = by_source
+
+    def convert(self, source: str, export_type: str) -> List["Document"]:
+        return list(self.by_source.get(source, []))
+
+async def bench_size(size: str, scale: float, results: List[BenchResult]) -> None:
+    from langchain_core.messages import HumanMessage
+    from agent.core.config import get_settings
+    import agent.core.ingestion as ingestion
+    import agent.graph.nodes.research_nodes as nodes
+    from agent.graph.agent import MonteAzulAgent
+
+    settings = get_settings()
+    settings.COLLECTION_NAME = f"bench_{size}"
+    nodes.get_retriever.cache_clear()
+
+    def n(base: int) -> int:
+        return max(5, int(base * scale))
+
+    # --- Ingestion: one page (CHUNKS_PER_PAGE chunks) per call ---
+    by_source = pages(build_documents(size))
+    urls = list(by_source)
+    ingestion.get_conversion_service = lambda: _CorpusConversionService(by_source)
+    indexer = ingestion.WebsiteIndexer()
+    # The last 5 pages serve the warm-up (2) and memory-pass (3) calls,
+    # so every call indexes new chunks
+    timed_pages = len(urls) - 5
+    chunks_per_page = len(by_source[urls[0]])
+    results.append(
+        await measure(
+            f"ingest_page[{size}]",
+            lambda i: indexer.index_website(urls[i]),
+            iterations=timed_pages,
+            warmup=2,
+            items_per_call=chunks_per_page,
+            unit="chunks"
+        )
+    )
+    results.append(
+        await measure(
+            f"reingest_unchanged[{size}]",
+            lambda i: indexer.index_website(urls[i % len(urls)]),
+            iterations=n(20),
+            items_per_call=chunks_per_page,
+            unit="chunks"
+        )
+    )
+
+    # --- Retrieval ---
+    retriever = nodes.get_retriever()
+    queries = build_queries()
+    results.append(
+        await measure(
+            f"retrieve[{size}]",
+            lambda i: retriever.retrieve(queries[i % len(queries)]),
+            iterations=n(100),
+            unit="queries"
+        )
+    )
+    results.append(
+        await measure(
+            f"aretrieve_many_3[{size}]",
+            lambda i: retriever.aretrieve_many(
+                [queries[(i + j) % len(queries)] for j in range(3)]
+            ),
+            iterations=n(50),
+            items_per_call=3,
+            unit="queries"
+        )
+    )
+
+    # --- Nodes ---
+    def state(query: str, **extra: Any) -> Dict[str, Any]:
+        base = {
+            "query": query,
+            "route": None,
+            "plan": [],
+            "completed_steps": [],
+            "reflection": "",
+            "iterations": 0,
+            "is_sufficient": False,
+            "research": [],
+            "answer": None,
+            "messages": [HumanMessage(content=query)]
+        }
+        base.update(extra)
+        return base
+
+    planned = [state(q, plan=[q, f"{q} proyectos"], iterations=1) for q in queries]
+    researched = []
+    for s in planned:
+        update = await nodes.researcher(s)
+        researched.append({**s, **update})
+
+    results.append(
+        await measure(
+            f"node_router[{size}]",
+            lambda i: nodes.router(state(queries[i % len(queries)])),
+            iterations=n(200)
+        )
+    )
+    results.append(
+        await measure(
+            f"node_quick_responder[{size}]",
+            lambda i: nodes.quick_responder(state("¡Hola!")),
+            iterations=n(200)
+        )
+    )
+    results.append(
+        await measure(
+            f"node_reflector[{size}]",
+            lambda i: nodes.reflector(researched[i % len(researched)]),
+            iterations=n(100)
+        )
+    )
+    results.append(
+        await measure(
+            f"node_researcher[{size}]",
+            lambda i: nodes.researcher(planned[i % len(planned)]),
+            iterations=n(50)
+        )
+    )
+    results.append(
+        await measure(
+            f"node_critic[{size}]",
+            lambda i: nodes.critic(researched[i % len(researched)]),
+            iterations=n(100)
+        )
+    )
+    results.append(
+        await measure(
+            f"node_responder[{size}]",
+            lambda i: nodes.responder(researched[i % len(researched)]),
+            iterations=n(100)
+        )
+    )
+
+    # --- Full turns (fresh thread per turn, local SQLite checkpointer) ---
+    agent = MonteAzulAgent()
+    results.append(
+        await measure(
+            f"agent_run[{size}]",
+            lambda i: agent.run(
+                queries[i % len(queries)], thread_id=f"bench-{size}-{i}"
+            ),
+            iterations=n(30),
+            unit="turns"
+        )
+    )
+    await agent.shutdown()
+
+async def run_suite(sizes: List[str], scale: float) -> List[BenchResult]:
+    results: List[BenchResult] = []
+    for size in sizes:
+        print(f"== {size} chunks ==", file=sys.stderr)
+        await bench_size(size, scale, results)
+    return results
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes",
+        default=",".join(SIZES),
+        help="Comma-separated corpus sizes (1k,10k,100k)"
+    )
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="Multiplier for iteration counts"
+    )
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Write results to --baseline instead of comparing"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed relative regression (0.25 = 25%%)"
+    )
+    parser.add_argument(
+        "--llm-latency-ms",
+        type=float,
+        default=0.0,
+        help="Simulated latency per fake LLM call"
+    )
+    parser.add_argument(
+        "--with-caches",
+        action="store_true",
+        help="Keep embedding/retrieval/answer caches enabled"
+    )
+    parser.add_argument(
+        "--workdir",
+        default=None,
+        help="Index directory (default: a temporary directory)"
+    )
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="monteazul-bench-")
+    configure_environment(workdir, args.with_caches)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("AgentMiddleware").setLevel(logging.WARNING)
+
+    from benchmarks import fakes
+    fakes.install(llm_latency=args.llm_latency_ms / 1000)
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    try:
+        results = asyncio.run(run_suite(sizes, args.scale))
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"process max RSS: {max_rss_mb:.0f} MB")
+
+    meta: Dict[str, str] = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "sizes": ",".join(sizes),
+        "scale": str(args.scale),
+        "with_caches": str(args.with_caches),
+    }
+    if args.save_baseline:
+        save_baseline(args.baseline, results, meta)
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    regressions = compare(results, args.baseline, args.tolerance)
+    for line in regressions:
+        print(f"  REGRESSION {line}")
+    return 1 if regressions else 0
@@ -2,6 +2,7 @@ import argparse
 import logging
 import asyncio
 from agent.core.ingestion import WebsiteIndexer
+from agent.core.conversion import get_conversion_service
 from dotenv import load_dotenv
 
 # Configure logging
@@ -11,7 +12,25 @@ logger = logging.getLogger(__name__)
 async def main():
     parser = argparse.ArgumentParser(description="Ingest website content into the vector store.")
     parser.add_argument("--url", type=str, help="The URL to ingest (overrides .env WEBSITE_URL)")
-    parser.add_argument("--clear", action="store_true", help="Clear the existing index before ingesting")
+    parser.add_argument(
+        "--clear",
+        action="store_true",
+        help=(
+            "Drop the existing index before ingesting (not needed for updates: "
+            "re-ingestion is incremental)"
+        )
+    )
+    parser.add_argument(
+        "--crawl",
+        action="store_true",
+        help="Crawl the whole site (sitemap and links) instead of a single page"
+    )
+    parser.add_argument(
+        "--max-pages", type=int, help="Maximum pages to fetch when crawling"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, help="Concurrent fetches when crawling"
+    )
     
     args = parser.parse_args()
     
@@ -23,11 +42,30 @@ async def main():
         logger.info("Clearing existing index...")
         indexer.clear_index()
     
+    if args.crawl:
+        logger.info("Starting crawl...")
+        report = await indexer.crawl_website(
+            url=args.url, max_pages=args.max_pages, concurrency=args.concurrency
+        )
+        logger.info(
+            f"Crawl completed: {report['pages_changed']} changed / "
+            f"{report['pages_unchanged']} unchanged / "
+            f"{report['pages_failed']} failed pages; {report['added']} chunks added, "
+            f"{report['deleted']} deleted."
+        )
+        return
+
     logger.info(f"Starting ingestion process...")
     # index_website is not async in the current implementation, but we run it in a main async for future-proofing or if needed.
     # Actually WebsiteIndexer.index_website is synchronous based on view_file
-    indexer.index_website(url=args.url)
-    logger.info("Ingestion completed successfully.")
+    report = indexer.index_website(url=args.url)
+    logger.info(
+        f"Ingestion completed successfully: {report['added']} added, "
+        f"{report['deleted']} deleted, {report['unchanged']} unchanged."
+    )
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    finally:
+        get_conversion_service().shutdown()
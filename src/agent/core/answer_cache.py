@@ -0,0 +1,97 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+class SemanticAnswerCache:
+    """
+    Final answers indexed by query embedding, scoped by language and index version.
+
+    A new query reuses a previous answer when the cosine similarity of the two queries
+    is at least `threshold`. All entries are dropped when the index version changes,
+    since the underlying knowledge may have changed.
+    """
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        threshold: float = 0.95,
+        max_entries: int = 1000,
+        ttl_seconds: float = 86400.0
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._lock = threading.Lock()
+        # language -> (unit vectors matrix, [(query, answer, created_at)])
+        self._entries: Dict[str, Tuple[np.ndarray, List[Tuple[str, str, float]]]] = {}
+
+    def _check_version(self, version: int) -> None:
+        if version != self._version:
+            if self._entries:
+                logger.info(
+                    f"Index version {self._version} -> {version}: "
+                    "answer cache invalidated"
+                )
+            self._entries.clear()
+            self._version = version
+
+    async def embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(await self.embeddings.aembed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(
+        self, vector: np.ndarray, language: str, version: int
+    ) -> Tuple[str, float] | None:
+        """
+        Returns (answer, similarity) of the closest cached query, if close enough.
+        """
+        with self._lock:
+            self._check_version(version)
+            matrix, rows = self._entries.get(language, (None, []))
+            if matrix is None or not rows:
+                self.misses += 1
+                return None
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+            _, answer, created_at = rows[best]
+            if (
+                similarities[best] < self.threshold
+                or time.time() - created_at > self.ttl_seconds
+            ):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return answer, float(similarities[best])
+
+    def store(
+        self, vector: np.ndarray, query: str, answer: str, language: str, version: int
+    ) -> None:
+        with self._lock:
+            self._check_version(version)
+            matrix, rows = self._entries.get(
+                language, (np.empty((0, vector.shape[0]), np.float32), [])
+            )
+            matrix = np.vstack([matrix, vector[None, :]])
+            rows = rows + [(query, answer, time.time())]
+            if len(rows) > self.max_entries:
+                # Oldest entries first out
+                matrix, rows = matrix[-self.max_entries:], rows[-self.max_entries:]
+            self._entries[language] = (matrix, rows)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": sum(len(rows) for _, rows in self._entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
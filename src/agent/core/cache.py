@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache whose entries also expire after `ttl_seconds`.
+    """
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class SQLiteCache:
+    """
+    Shared cache tier: a SQLite file (WAL) that several worker processes or replicas
+    on the same volume can read and write. Values are stored as JSON.
+    """
+    def __init__(
+        self, path: str, ttl_seconds: float = 3600.0, max_entries: int = 50_000
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=5.0
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at >= ?",
+                (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache(key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + self.ttl_seconds)
+            )
+            self._writes += 1
+            if self._writes % 256 == 0:
+                self._prune_locked()
+
+    def _prune_locked(self) -> None:
+        self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM cache WHERE key IN "
+            "(SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+class TieredCache:
+    """
+    In-process LRU+TTL tier in front of an optional shared tier, with hit-rate stats.
+
+    `encode`/`decode` translate values to and from the JSON-friendly form the shared
+    tier stores (the in-process tier keeps the original objects).
+    """
+    def __init__(
+        self,
+        local: TTLCache,
+        shared: SQLiteCache | None = None,
+        encode: Callable[[Any], Any] = lambda v: v,
+        decode: Callable[[Any], Any] = lambda v: v
+    ):
+        self.local = local
+        self.shared = shared
+        self.encode = encode
+        self.decode = decode
+        self.hits_local = 0
+        self.hits_shared = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any | None:
+        value = self.local.get(key)
+        if value is not None:
+            self.hits_local += 1
+            return value
+        if self.shared is not None:
+            stored = self.shared.get(key)
+            if stored is not None:
+                value = self.decode(stored)
+                self.local.set(key, value)
+                self.hits_shared += 1
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, self.encode(value))
+            except sqlite3.Error as e:
+                logger.warning(f"Shared cache write failed: {e}")
+
+    def clear_local(self) -> None:
+        self.local.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits_local + self.hits_shared + self.misses
+        hits = self.hits_local + self.hits_shared
+        return {
+            "entries": len(self.local),
+            "hits_local": self.hits_local,
+            "hits_shared": self.hits_shared,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
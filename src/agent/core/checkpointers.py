@@ -0,0 +1,552 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict, defaultdict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    Sequence,
+    Set,
+    Tuple
+)
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_metadata
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from agent.core.metrics import REGISTRY, GaugeSample
+
+if TYPE_CHECKING:
+    import aiosqlite
+    from agent.core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_EVICTIONS = REGISTRY.counter(
+    "agent_checkpoint_evictions_total",
+    "Threads evicted from the in-memory checkpointer",
+    ["reason"]
+)
+CHECKPOINT_FLUSHES = REGISTRY.counter(
+    "agent_checkpoint_flushes_total", "Batched SQLite checkpoint commits"
+)
+CHECKPOINT_FLUSHED_ROWS = REGISTRY.counter(
+    "agent_checkpoint_flushed_rows_total",
+    "Checkpoint and write rows committed to SQLite"
+)
+
+# Live savers, reported by one collector however often they are reopened
+_SAVERS: "weakref.WeakSet" = weakref.WeakSet()
+
+def _collect_metrics() -> Iterator[GaugeSample]:
+    savers = list(_SAVERS)
+    memory = [s.stats() for s in savers if isinstance(s, BoundedMemorySaver)]
+    yield (
+        "agent_checkpoint_memory_threads",
+        "Threads held by the in-memory checkpointer",
+        {},
+        sum(m["threads"] for m in memory)
+    )
+    yield (
+        "agent_checkpoint_memory_bytes",
+        "Serialized size of the in-memory checkpoints",
+        {},
+        sum(m["bytes"] for m in memory)
+    )
+    pending = sum(s.pending for s in savers if hasattr(s, "pending"))
+    yield (
+        "agent_checkpoint_pending_rows",
+        "Checkpoint rows buffered for the next SQLite commit",
+        {},
+        pending
+    )
+
+REGISTRY.add_collector(_collect_metrics)
+
+def _typed_size(value: Tuple[str, bytes]) -> int:
+    return len(value[1])
+
+class BoundedMemorySaver(InMemorySaver):
+    """
+    In-memory checkpointer that is safe to run for weeks.
+
+    Threads are kept in LRU order and evicted when idle longer than `ttl_seconds`, when
+    more than `max_threads` are stored, or when their serialized checkpoints, blobs and
+    writes exceed `max_bytes` in total. The thread being written is never evicted.
+    Per-thread key indexes make eviction and deletion proportional to the thread's
+    size instead of scanning the whole store, and `prune()` supports "keep_latest".
+    An evicted thread simply starts a fresh conversation.
+    """
+    def __init__(
+        self,
+        max_threads: int = 1000,
+        max_bytes: int = 256 * 2**20,
+        ttl_seconds: float = 86400.0,
+        clock: Callable[[], float] = time.monotonic,
+        **kwargs: Any
+    ):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._last_used: "OrderedDict[str, float]" = OrderedDict()
+        self._thread_bytes: Dict[str, int] = defaultdict(int)
+        self._thread_writes: Dict[str, Set[tuple]] = defaultdict(set)
+        self._thread_blobs: Dict[str, Set[tuple]] = defaultdict(set)
+        self._bytes = 0
+        self._evictions = 0
+        self._lock = threading.RLock()
+        _SAVERS.add(self)
+
+    # Writes
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            result = super().put(config, checkpoint, metadata, new_versions)
+            added = 0
+            for channel, version in new_versions.items():
+                key = (thread_id, checkpoint_ns, channel, version)
+                if key not in self._thread_blobs[thread_id]:
+                    self._thread_blobs[thread_id].add(key)
+                    added += _typed_size(self.blobs[key])
+            saved = self.storage[thread_id][checkpoint_ns][checkpoint["id"]]
+            added += _typed_size(saved[0]) + _typed_size(saved[1])
+            self._grow(thread_id, added)
+            self._enforce(keep=thread_id)
+        return result
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        outer = (
+            thread_id,
+            config["configurable"].get("checkpoint_ns", ""),
+            config["configurable"]["checkpoint_id"]
+        )
+        with self._lock:
+            before = dict(self.writes.get(outer, {}))
+            super().put_writes(config, writes, task_id, task_path)
+            after = self.writes.get(outer, {})
+            added = sum(
+                _typed_size(w[2]) for k, w in after.items() if before.get(k) is not w
+            )
+            added -= sum(
+                _typed_size(w[2]) for k, w in before.items() if after.get(k) is not w
+            )
+            self._thread_writes[thread_id].add(outer)
+            self._grow(thread_id, added)
+            self._enforce(keep=thread_id)
+
+    # Reads
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            if not self._touch(thread_id):
+                return None
+            return super().get_tuple(config)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: Dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None
+    ) -> Iterator[CheckpointTuple]:
+        with self._lock:
+            if config is not None:
+                thread_id = config["configurable"]["thread_id"]
+                if not self._touch(thread_id):
+                    return iter(())
+            # Materialized so the lock is not held across the caller's iteration
+            return iter(
+                list(super().list(config, filter=filter, before=before, limit=limit))
+            )
+
+    # Deletion and pruning
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._drop(thread_id)
+
+    def prune(
+        self, thread_ids: Sequence[str], *, strategy: str = "keep_latest"
+    ) -> None:
+        """
+        "keep_latest" keeps the newest checkpoint of each namespace (with its pending
+        writes and the blobs it references); "delete" removes the threads.
+        """
+        with self._lock:
+            for thread_id in thread_ids:
+                if strategy == "delete":
+                    self._drop(thread_id)
+                elif thread_id in self.storage:
+                    self._prune_thread(thread_id)
+
+    async def aprune(
+        self, thread_ids: Sequence[str], *, strategy: str = "keep_latest"
+    ) -> None:
+        self.prune(thread_ids, strategy=strategy)
+
+    def _prune_thread(self, thread_id: str) -> None:
+        freed = 0
+        live_blobs = set()
+        for checkpoint_ns, checkpoints in self.storage[thread_id].items():
+            if not checkpoints:
+                continue
+            latest = max(checkpoints)
+            versions = self.serde.loads_typed(checkpoints[latest][0])[
+                "channel_versions"
+            ]
+            live_blobs.update(
+                (thread_id, checkpoint_ns, channel, version)
+                for channel, version in versions.items()
+            )
+            for checkpoint_id in [c for c in checkpoints if c != latest]:
+                saved = checkpoints.pop(checkpoint_id)
+                freed += _typed_size(saved[0]) + _typed_size(saved[1])
+                outer = (thread_id, checkpoint_ns, checkpoint_id)
+                freed += sum(
+                    _typed_size(w[2]) for w in self.writes.pop(outer, {}).values()
+                )
+                self._thread_writes[thread_id].discard(outer)
+        for key in self._thread_blobs[thread_id] - live_blobs:
+            freed += _typed_size(self.blobs.pop(key))
+        self._thread_blobs[thread_id] &= live_blobs
+        self._grow(thread_id, -freed)
+
+    # Bookkeeping
+
+    def _grow(self, thread_id: str, delta: int) -> None:
+        self._thread_bytes[thread_id] += delta
+        self._bytes += delta
+        self._last_used[thread_id] = self._clock()
+        self._last_used.move_to_end(thread_id)
+
+    def _touch(self, thread_id: str) -> bool:
+        """
+        Marks a thread as used; an expired thread is evicted. Returns whether it exists.
+        """
+        last_used = self._last_used.get(thread_id)
+        if last_used is None:
+            return False
+        if self._clock() - last_used > self.ttl_seconds:
+            self._evict(thread_id, "ttl")
+            return False
+        self._last_used[thread_id] = self._clock()
+        self._last_used.move_to_end(thread_id)
+        return True
+
+    def _enforce(self, keep: str) -> None:
+        now = self._clock()
+        while self._last_used:
+            thread_id, last_used = next(iter(self._last_used.items()))
+            if thread_id == keep or now - last_used <= self.ttl_seconds:
+                break
+            self._evict(thread_id, "ttl")
+        while len(self._last_used) > self.max_threads or self._bytes > self.max_bytes:
+            thread_id = next(iter(self._last_used))
+            if thread_id == keep:
+                break
+            self._evict(
+                thread_id,
+                "max_threads" if len(self._last_used) > self.max_threads else "memory"
+            )
+
+    def _evict(self, thread_id: str, reason: str) -> None:
+        self._drop(thread_id)
+        self._evictions += 1
+        CHECKPOINT_EVICTIONS.inc(reason=reason)
+
+    def _drop(self, thread_id: str) -> None:
+        self.storage.pop(thread_id, None)
+        for key in self._thread_writes.pop(thread_id, ()):
+            self.writes.pop(key, None)
+        for key in self._thread_blobs.pop(thread_id, ()):
+            self.blobs.pop(key, None)
+        self._bytes -= self._thread_bytes.pop(thread_id, 0)
+        self._last_used.pop(thread_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "threads": len(self._last_used),
+                "bytes": self._bytes,
+                "evictions": self._evictions
+            }
+
+_INSERT_CHECKPOINT = (
+    "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, "
+    "parent_checkpoint_id, type, checkpoint, metadata) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+_WRITE_COLUMNS = (
+    "(thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, idx, channel, type, "
+    "value) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_REPLACE_WRITE = f"INSERT OR REPLACE INTO writes {_WRITE_COLUMNS}"
+_IGNORE_WRITE = f"INSERT OR IGNORE INTO writes {_WRITE_COLUMNS}"
+_LATEST = (
+    "(SELECT MAX(c2.checkpoint_id) FROM checkpoints c2 "
+    "WHERE c2.thread_id = {table}.thread_id AND c2.checkpoint_ns = "
+    "{table}.checkpoint_ns)"
+)
+
+def _batched_sqlite_saver() -> type:
+    # langgraph-checkpoint-sqlite / aiosqlite are only imported for the SQLite mode
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    class BatchedSqliteSaver(AsyncSqliteSaver):
+        """
+        Durable local checkpointer: AsyncSqliteSaver on a WAL database whose writes are
+        buffered and committed in batches (one transaction per `flush_interval`, or as
+        soon as `max_batch` rows are pending) instead of one commit per checkpoint and
+        per node write. Rows for the same key are coalesced in the buffer. Reads flush
+        first, so they always see every write; a crash loses at most one interval.
+        """
+        def __init__(
+            self,
+            conn: "aiosqlite.Connection",
+            *,
+            flush_interval: float = 0.05,
+            max_batch: int = 256,
+            **kwargs: Any
+        ):
+            super().__init__(conn, **kwargs)
+            self.flush_interval = flush_interval
+            self.max_batch = max_batch
+            self._pending_checkpoints: Dict[tuple, tuple] = {}
+            self._pending_writes: Dict[tuple, Tuple[bool, tuple]] = {}
+            self._flush_task: asyncio.Task | None = None
+            _SAVERS.add(self)
+
+        @classmethod
+        async def open(cls, path: str, **kwargs: Any) -> "BatchedSqliteSaver":
+            import aiosqlite
+
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            conn = await aiosqlite.connect(path)
+            await conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL: commits do not fsync; the database stays consistent on crash
+            await conn.execute("PRAGMA synchronous=NORMAL")
+            saver = cls(conn, **kwargs)
+            await saver.setup()
+            return saver
+
+        async def aclose(self) -> None:
+            await self.flush()
+            await self.conn.close()
+
+        @property
+        def pending(self) -> int:
+            return len(self._pending_checkpoints) + len(self._pending_writes)
+
+        # Buffered writes
+
+        async def aput(
+            self,
+            config: RunnableConfig,
+            checkpoint: Checkpoint,
+            metadata: CheckpointMetadata,
+            new_versions: ChannelVersions
+        ) -> RunnableConfig:
+            await self.setup()
+            thread_id = config["configurable"]["thread_id"]
+            checkpoint_ns = config["configurable"]["checkpoint_ns"]
+            type_, serialized = self.serde.dumps_typed(checkpoint)
+            serialized_metadata = json.dumps(
+                get_checkpoint_metadata(config, metadata), ensure_ascii=False
+            ).encode("utf-8", "ignore")
+            self._pending_checkpoints[
+                (str(thread_id), checkpoint_ns, checkpoint["id"])
+            ] = (
+                str(thread_id),
+                checkpoint_ns,
+                checkpoint["id"],
+                config["configurable"].get("checkpoint_id"),
+                type_,
+                serialized,
+                serialized_metadata
+            )
+            await self._schedule_flush()
+            return {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint["id"]
+                }
+            }
+
+        async def aput_writes(
+            self,
+            config: RunnableConfig,
+            writes: Sequence[Tuple[str, Any]],
+            task_id: str,
+            task_path: str = ""
+        ) -> None:
+            await self.setup()
+            replace = all(w[0] in WRITES_IDX_MAP for w in writes)
+            configurable = config["configurable"]
+            for idx, (channel, value) in enumerate(writes):
+                row = (
+                    str(configurable["thread_id"]),
+                    str(configurable["checkpoint_ns"]),
+                    str(configurable["checkpoint_id"]),
+                    task_id,
+                    task_path,
+                    WRITES_IDX_MAP.get(channel, idx),
+                    channel,
+                    *self.serde.dumps_typed(value)
+                )
+                key = row[:4] + (row[5],)
+                if replace:
+                    self._pending_writes[key] = (True, row)
+                else:
+                    # INSERT OR IGNORE semantics: the first write for a key wins
+                    self._pending_writes.setdefault(key, (False, row))
+            await self._schedule_flush()
+
+        async def _schedule_flush(self) -> None:
+            if self.pending >= self.max_batch:
+                await self.flush()
+            elif self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.create_task(self._flush_later())
+
+        async def _flush_later(self) -> None:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Checkpoint flush failed: {e}")
+
+        async def flush(self) -> None:
+            """
+            Commits every buffered row in one transaction.
+            """
+            if not self.pending:
+                return
+            checkpoints, self._pending_checkpoints = self._pending_checkpoints, {}
+            writes, self._pending_writes = self._pending_writes, {}
+            try:
+                async with self.lock:
+                    if checkpoints:
+                        await self.conn.executemany(
+                            _INSERT_CHECKPOINT, list(checkpoints.values())
+                        )
+                    replaced = [row for replace, row in writes.values() if replace]
+                    ignored = [row for replace, row in writes.values() if not replace]
+                    if replaced:
+                        await self.conn.executemany(_REPLACE_WRITE, replaced)
+                    if ignored:
+                        await self.conn.executemany(_IGNORE_WRITE, ignored)
+                    await self.conn.commit()
+            except BaseException:
+                # Back into the buffer (behind anything newer) for the next flush
+                for key, row in checkpoints.items():
+                    self._pending_checkpoints.setdefault(key, row)
+                for key, row in writes.items():
+                    self._pending_writes.setdefault(key, row)
+                raise
+            CHECKPOINT_FLUSHES.inc()
+            CHECKPOINT_FLUSHED_ROWS.inc(len(checkpoints) + len(writes))
+
+        # Reads see buffered writes
+
+        async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+            await self.flush()
+            return await super().aget_tuple(config)
+
+        async def alist(
+            self, config: RunnableConfig | None, **kwargs: Any
+        ) -> AsyncIterator[CheckpointTuple]:
+            await self.flush()
+            async for item in super().alist(config, **kwargs):
+                yield item
+
+        async def aget_delta_channel_history(self, *args: Any, **kwargs: Any) -> Any:
+            await self.flush()
+            return await super().aget_delta_channel_history(*args, **kwargs)
+
+        async def adelete_thread(self, thread_id: str) -> None:
+            await self.flush()
+            await super().adelete_thread(thread_id)
+
+        async def aprune(
+            self, thread_ids: Sequence[str], *, strategy: str = "keep_latest"
+        ) -> None:
+            """
+            "keep_latest" keeps the newest checkpoint of each namespace and its writes;
+            "delete" removes the threads.
+            """
+            await self.flush()
+            if strategy == "delete":
+                for thread_id in thread_ids:
+                    await super().adelete_thread(thread_id)
+                return
+            async with self.lock:
+                for thread_id in thread_ids:
+                    await self.conn.execute(
+                        "DELETE FROM writes WHERE thread_id = ? AND checkpoint_id < "
+                        f"{_LATEST.format(table='writes')}",
+                        (str(thread_id),)
+                    )
+                    await self.conn.execute(
+                        "DELETE FROM checkpoints WHERE thread_id = ? AND "
+                        f"checkpoint_id < {_LATEST.format(table='checkpoints')}",
+                        (str(thread_id),)
+                    )
+                await self.conn.commit()
+
+    return BatchedSqliteSaver
+
+def supports_pruning(saver: BaseCheckpointSaver) -> bool:
+    """
+    Whether `saver` implements aprune() (the base class raises NotImplementedError).
+    """
+    saver = getattr(saver, "inner", saver)  # TracedCheckpointer
+    return type(saver).aprune is not BaseCheckpointSaver.aprune
+
+def bounded_memory_saver(settings: "Settings") -> BoundedMemorySaver:
+    return BoundedMemorySaver(
+        max_threads=settings.CHECKPOINT_MEMORY_MAX_THREADS,
+        max_bytes=int(settings.CHECKPOINT_MEMORY_MAX_MB * 2**20),
+        ttl_seconds=settings.CHECKPOINT_MEMORY_TTL_SECONDS
+    )
+
+async def open_sqlite_saver(settings: "Settings") -> BaseCheckpointSaver:
+    """
+    Opens the durable local checkpointer at CHECKPOINT_SQLITE_PATH.
+    """
+    return await _batched_sqlite_saver().open(
+        settings.checkpoint_sqlite_path,
+        flush_interval=settings.CHECKPOINT_FLUSH_INTERVAL_MS / 1000
+    )
@@ -1,4 +1,6 @@
+import os
 from functools import lru_cache
+from typing import Dict, List
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
@@ -9,28 +11,418 @@ class Settings(BaseSettings):
     """
     # OpenAI Configuration
     OPENAI_API_KEY: str = Field(..., description="API key for OpenAI models")
+    OPENAI_BASE_URL: str | None = Field(
+        default=None,
+        description="OpenAI-compatible endpoint (defaults to api.openai.com)"
+    )
+    REFLECTOR_MODEL: str = Field(
+        default="gpt-4o", description="Model that plans the research"
+    )
+    CRITIC_MODEL: str = Field(
+        default="gpt-4o-mini", description="Model that judges research sufficiency"
+    )
+    RESPONDER_MODEL: str = Field(
+        default="gpt-4o", description="Model that writes the final answer"
+    )
+    COMPACTOR_MODEL: str = Field(
+        default="gpt-4o-mini",
+        description="Model that summarizes older conversation turns"
+    )
+    SPECULATIVE_RESPONDER: bool = Field(
+        default=False,
+        description=(
+            "Draft the answer while the critic runs; "
+            "keep it if the research is judged sufficient"
+        )
+    )
+    LLM_CONNECT_TIMEOUT: float = Field(
+        default=5.0, description="Seconds to establish a connection to the LLM endpoint"
+    )
+    LLM_READ_TIMEOUT: float = Field(
+        default=60.0,
+        description=(
+            "Seconds to wait for response data (per read, so long streams are fine)"
+        )
+    )
+    LLM_MAX_RETRIES: int = Field(
+        default=3, description="Retries on connection errors, 429s and 5xx responses"
+    )
+    LLM_MAX_CONNECTIONS: int = Field(
+        default=20, description="Connections per (model, endpoint) pool"
+    )
+    LLM_MAX_KEEPALIVE: int = Field(
+        default=10, description="Idle keep-alive connections kept per pool"
+    )
+    LLM_MAX_CONCURRENCY: int = Field(
+        default=8, description="In-flight requests per model; extra calls wait"
+    )
+    LLM_MODEL_CONCURRENCY: Dict[str, int] = Field(
+        default_factory=dict,
+        description='Per-model overrides of LLM_MAX_CONCURRENCY, e.g. {"gpt-4o": 4}'
+    )
+    LLM_MODEL_MAX_RETRIES: Dict[str, int] = Field(
+        default_factory=dict, description="Per-model overrides of LLM_MAX_RETRIES"
+    )
+    LLM_SCHEDULER_ENABLED: bool = Field(
+        default=False,
+        description=(
+            "Route every LLM/embedding request through the process-wide scheduler "
+            "(opt-in)"
+        )
+    )
+    LLM_SCHEDULER_MAX_CONCURRENCY: int = Field(
+        default=16,
+        description=(
+            "Provider requests in flight across all models "
+            "(halved on 429s, then regrown)"
+        )
+    )
+    LLM_SCHEDULER_TPM: float = Field(
+        default=0,
+        description=(
+            "Tokens per minute across all models (0 = unlimited); set just under the "
+            "account's limit"
+        )
+    )
+    LLM_SCHEDULER_MAX_QUEUE: int = Field(
+        default=256,
+        description="Calls waiting for dispatch before new ones are refused"
+    )
+    LLM_SCHEDULER_QUEUE_TIMEOUT: float = Field(
+        default=30.0, description="Seconds a call may wait for dispatch"
+    )
+    LLM_PRICES_PER_MTOKEN: Dict[str, List[float]] = Field(
+        default_factory=dict,
+        description=(
+            'USD per 1M [input, output] tokens, e.g. '
+            '{"gpt-4o": [2.5, 10]}; extends the built-in table'
+        )
+    )
     
     # LangGraph/LangChain Configuration
     LANGCHAIN_TRACING_V2: bool = Field(default=False)
-    LANGCHAIN_API_KEY: str | None = Field(default=None, description="API key for LangChain tracing")
+    LANGCHAIN_API_KEY: str | None = Field(
+        default=None, description="API key for LangChain tracing"
+    )
     LANGCHAIN_PROJECT: str = Field(default="langgraph-agent")
 
     # App Settings
     ENVIRONMENT: str = Field(default="development")
     LOG_LEVEL: str = Field(default="INFO")
 
+    # Request tracing and profiling
+    TRACING_ENABLED: bool = Field(
+        default=False,
+        description=(
+            "Record a span timeline (nodes, retrieval, LLM, checkpointer) for every "
+            "turn (opt-in)"
+        )
+    )
+    TRACE_BUFFER_SIZE: int = Field(
+        default=200, description="Most recent traces kept in memory for /traces"
+    )
+    TRACES_TOKEN: str | None = Field(
+        default=None,
+        description=(
+            "Bearer token required by /traces (they hold thread ids and queries); "
+            "unset disables the endpoints"
+        )
+    )
+    TRACE_EXPORT_DIR: str | None = Field(
+        default=None, description="Write every trace here as a Chrome-trace JSON file"
+    )
+    TRACE_OTLP_ENDPOINT: str | None = Field(
+        default=None,
+        description="OTLP/HTTP JSON collector, e.g. http://localhost:4318/v1/traces"
+    )
+    PROFILE_SAMPLE_RATE: float = Field(
+        default=0.0,
+        description="Fraction of turns run under the sampling profiler (0 = off)"
+    )
+    PROFILE_INTERVAL_MS: float = Field(
+        default=5.0, description="Sampling profiler interval"
+    )
+    PROFILE_DIR: str = Field(
+        default="./profiles",
+        description=(
+            "Folded-stack profiles are written to "
+            "PROFILE_DIR/<thread_id>/<trace_id>.folded"
+        )
+    )
+
     # RAG Configuration
-    CHROMA_PATH: str = Field(default="./chroma_db", description="Path to persist ChromaDB")
-    COLLECTION_NAME: str = Field(default="monte_azul_docs", description="ChromaDB collection name")
-    EMBEDDING_MODEL: str = Field(default="text-embedding-3-small", description="OpenAI embedding model")
-    WEBSITE_URL: str = Field(default="https://www.monteazulgroup.com/es", description="Website to scrape")
+    CHROMA_PATH: str = Field(
+        default="./chroma_db", description="Path to persist ChromaDB"
+    )
+    COLLECTION_NAME: str = Field(
+        default="monte_azul_docs", description="ChromaDB collection name"
+    )
+    EMBEDDING_MODEL: str = Field(
+        default="text-embedding-3-small", description="OpenAI embedding model"
+    )
+    WEBSITE_URL: str = Field(
+        default="https://www.monteazulgroup.com/es", description="Website to scrape"
+    )
+    EMBEDDING_CACHE_ENABLED: bool = Field(
+        default=True, description="Cache embeddings on disk keyed by (model, text)"
+    )
+    EMBEDDING_CACHE_PATH: str | None = Field(
+        default=None,
+        description=(
+            "SQLite file for the embedding cache (defaults to "
+            "CHROMA_PATH/embedding_cache.sqlite3)"
+        )
+    )
+    EMBEDDING_CACHE_MAX_ENTRIES: int = Field(
+        default=200_000,
+        description="Least recently used vectors are evicted beyond this size"
+    )
+    BM25_INDEX_PATH: str | None = Field(
+        default=None,
+        description=(
+            "Directory of the on-disk BM25 index (defaults to "
+            "CHROMA_PATH/bm25/<collection>)"
+        )
+    )
+
+    # Hybrid retrieval / rank fusion
+    RETRIEVAL_K: int = Field(default=5, description="Fused results returned per query")
+    RETRIEVAL_CANDIDATES_K: int = Field(
+        default=10, description="Candidates fetched from each retriever before fusion"
+    )
+    RETRIEVAL_DENSE_WEIGHT: float = Field(
+        default=0.6, description="Fusion weight of semantic (Chroma) results"
+    )
+    RETRIEVAL_SPARSE_WEIGHT: float = Field(
+        default=0.4, description="Fusion weight of keyword (BM25) results"
+    )
+    RETRIEVAL_MIN_SCORE: float = Field(
+        default=0.0, description="Drop fused hits whose normalized score is below this"
+    )
+
+    # Responder context packing
+    RESPONDER_CONTEXT_TOKENS: int = Field(
+        default=6000,
+        description="Token budget for retrieved context in the responder prompt"
+    )
+    CONTEXT_MMR_LAMBDA: float = Field(
+        default=0.7,
+        description=(
+            "Relevance vs. diversity trade-off when "
+            "packing context (1 = relevance only)"
+        )
+    )
+    CONTEXT_DEDUP_THRESHOLD: float = Field(
+        default=0.8,
+        description="Word 3-gram Jaccard above which chunks count as duplicates"
+    )
+
+    # Conversation history compaction
+    HISTORY_KEEP_TURNS: int = Field(
+        default=3, description="Most recent turns kept verbatim in the thread state"
+    )
+    HISTORY_COMPACT_TRIGGER_TOKENS: int = Field(
+        default=2000,
+        description="History size above which older turns are folded into a summary"
+    )
+    HISTORY_SUMMARY_TOKENS: int = Field(
+        default=300, description="Target length of the rolling summary"
+    )
+    CHECKPOINT_PRUNE_ENABLED: bool = Field(
+        default=True,
+        description=(
+            "Keep only the latest checkpoint of a thread after its history is compacted"
+        )
+    )
+
+    # Retrieval result cache
+    RETRIEVAL_CACHE_ENABLED: bool = Field(
+        default=True,
+        description="Cache retrieval results per normalized query and index version"
+    )
+    RETRIEVAL_CACHE_MAX_ENTRIES: int = Field(
+        default=1024, description="In-process LRU size"
+    )
+    RETRIEVAL_CACHE_TTL_SECONDS: float = Field(
+        default=3600.0, description="Lifetime of a cached result"
+    )
+    RETRIEVAL_CACHE_SHARED_PATH: str | None = Field(
+        default=None, description="Optional SQLite file shared by workers/replicas"
+    )
+    CHUNK_CACHE_MAX_ENTRIES: int = Field(
+        default=4096,
+        description="Chunk texts kept in process for resolving research references"
+    )
+
+    # Semantic answer cache (in front of the graph)
+    ANSWER_CACHE_ENABLED: bool = Field(
+        default=False,
+        description="Reuse answers of semantically equivalent questions (opt-in)"
+    )
+    ANSWER_CACHE_THRESHOLD: float = Field(
+        default=0.95, description="Minimum cosine similarity between queries for a hit"
+    )
+    ANSWER_CACHE_MAX_ENTRIES: int = Field(
+        default=1000, description="Cached answers kept per language"
+    )
+    ANSWER_CACHE_TTL_SECONDS: float = Field(
+        default=86400.0, description="Lifetime of a cached answer"
+    )
+
+    # Docling conversion pool
+    DOCLING_WORKERS: int = Field(
+        default=0, description="Conversion worker processes (0 = CPU count - 1)"
+    )
+    DOCLING_MAX_PENDING: int = Field(
+        default=64, description="Maximum queued conversion jobs before submitters wait"
+    )
+
+    # Site crawler (ingest_data.py --crawl)
+    CRAWL_MAX_PAGES: int = Field(
+        default=200, description="Maximum pages fetched per crawl"
+    )
+    CRAWL_CONCURRENCY: int = Field(default=8, description="Concurrent page fetches")
+    CRAWL_DELAY_SECONDS: float = Field(
+        default=0.5, description="Minimum delay between requests to the same host"
+    )
+    CRAWL_STATE_PATH: str | None = Field(
+        default=None,
+        description="SQLite crawl state (defaults to CHROMA_PATH/crawl_state.sqlite3)"
+    )
+    CRAWL_CACHE_DIR: str | None = Field(
+        default=None,
+        description="Fetched HTML cache (defaults to CHROMA_PATH/crawl_cache)"
+    )
+
+    # Rate limiting and admission control
+    RATE_LIMIT_BACKEND: str = Field(
+        default="memory",
+        description=(
+            "Token bucket store: memory (per process), sqlite (per host) or postgres "
+            "(shared, uses DATABASE_URL)"
+        )
+    )
+    RATE_LIMIT_SQLITE_PATH: str | None = Field(
+        default=None,
+        description="SQLite bucket store (defaults to CHROMA_PATH/rate_limits.sqlite3)"
+    )
+    RATE_LIMIT_SESSION_RPM: float = Field(
+        default=10, description="Turns per minute per conversation (0 = unlimited)"
+    )
+    RATE_LIMIT_CLIENT_RPM: float = Field(
+        default=30, description="Turns per minute per client address (0 = unlimited)"
+    )
+    RATE_LIMIT_SESSION_TPM: float = Field(
+        default=60_000,
+        description="LLM tokens per minute per conversation (0 = unlimited)"
+    )
+    RATE_LIMIT_CLIENT_TPM: float = Field(
+        default=200_000,
+        description="LLM tokens per minute per client address (0 = unlimited)"
+    )
+    ADMISSION_MAX_IN_FLIGHT: int = Field(
+        default=16, description="Turns run concurrently per process (0 = unlimited)"
+    )
+    ADMISSION_MAX_QUEUE: int = Field(
+        default=32, description="Turns waiting for a slot before new ones are shed"
+    )
+    ADMISSION_QUEUE_TIMEOUT: float = Field(
+        default=10.0, description="Seconds a turn may wait for a slot"
+    )
 
     # Website search fallback
     TAVILY_API_KEY: str | None = Field(default=None)
 
 
     # Database Configuration (Supabase/Postgres)
-    DATABASE_URL: str | None = Field(default=None, description="PostgreSQL URL for persistent memory")
+    DATABASE_URL: str | None = Field(
+        default=None, description="PostgreSQL URL for persistent memory"
+    )
+    DB_POOL_MIN_SIZE: int = Field(
+        default=1, description="Connections kept open in the shared checkpointer pool"
+    )
+    DB_POOL_MAX_SIZE: int = Field(
+        default=20, description="Upper bound of the shared checkpointer pool"
+    )
+    DB_POOL_TIMEOUT: float = Field(
+        default=10.0, description="Seconds to wait for a pooled connection"
+    )
+    DB_BREAKER_FAILURE_THRESHOLD: int = Field(
+        default=3, description="Consecutive DB failures before using the fallback saver"
+    )
+    DB_BREAKER_RESET_SECONDS: float = Field(
+        default=30.0,
+        description="Seconds before the DB is retried after the breaker opens"
+    )
+
+    # Local checkpointer (no DATABASE_URL, or Postgres down)
+    LOCAL_CHECKPOINTER: str = Field(
+        default="sqlite",
+        description=(
+            "sqlite (durable, batched writes) or memory (bounded, lost on restart)"
+        )
+    )
+    CHECKPOINT_SQLITE_PATH: str | None = Field(
+        default=None,
+        description=(
+            "SQLite checkpoint database (defaults to CHROMA_PATH/checkpoints.sqlite3)"
+        )
+    )
+    CHECKPOINT_FLUSH_INTERVAL_MS: float = Field(
+        default=50.0,
+        description=(
+            "Checkpoint writes are committed to "
+            "SQLite in batches at most this far apart"
+        )
+    )
+    CHECKPOINT_MEMORY_MAX_THREADS: int = Field(
+        default=1000,
+        description=(
+            "Conversations kept by the in-memory checkpointer before LRU eviction"
+        )
+    )
+    CHECKPOINT_MEMORY_MAX_MB: float = Field(
+        default=256.0,
+        description="Serialized checkpoint size kept in memory before LRU eviction"
+    )
+    CHECKPOINT_MEMORY_TTL_SECONDS: float = Field(
+        default=86400.0,
+        description="Idle time after which an in-memory conversation is evicted"
+    )
+
+    @property
+    def bm25_index_path(self) -> str:
+        return self.BM25_INDEX_PATH or os.path.join(
+            self.CHROMA_PATH, "bm25", self.COLLECTION_NAME
+        )
+
+    @property
+    def embedding_cache_path(self) -> str:
+        return self.EMBEDDING_CACHE_PATH or os.path.join(
+            self.CHROMA_PATH, "embedding_cache.sqlite3"
+        )
+
+    @property
+    def crawl_state_path(self) -> str:
+        return self.CRAWL_STATE_PATH or os.path.join(
+            self.CHROMA_PATH, "crawl_state.sqlite3"
+        )
+
+    @property
+    def rate_limit_sqlite_path(self) -> str:
+        return self.RATE_LIMIT_SQLITE_PATH or os.path.join(
+            self.CHROMA_PATH, "rate_limits.sqlite3"
+        )
+
+    @property
+    def checkpoint_sqlite_path(self) -> str:
+        return self.CHECKPOINT_SQLITE_PATH or os.path.join(
+            self.CHROMA_PATH, "checkpoints.sqlite3"
+        )
+
+    @property
+    def crawl_cache_dir(self) -> str:
+        return self.CRAWL_CACHE_DIR or os.path.join(self.CHROMA_PATH, "crawl_cache")
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -0,0 +1,153 @@
+import logging
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+if TYPE_CHECKING:
+    import tiktoken
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+@lru_cache(maxsize=8)
+def _encoding(model: str) -> "tiktoken.Encoding | None":
+    """
+    The model's tokenizer, or None if it cannot be loaded (tiktoken downloads BPE files
+    on first use). Failures are cached too, so an offline host pays the attempt once.
+    """
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(
+            f"Tokenizer for {model} unavailable ({e}); estimating ~4 chars/token."
+        )
+        return None
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """
+    Counts tokens with the model's tokenizer (falls back to ~4 chars/token if
+    unavailable).
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def _shingles(text: str, size: int = 3) -> frozenset:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return frozenset([" ".join(words)])
+    return frozenset(
+        " ".join(words[i:i + size]) for i in range(len(words) - size + 1)
+    )
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class ContextPacker:
+    """
+    Builds the responder's context block within a token budget.
+
+    1. Drops near-duplicate chunks (word 3-gram Jaccard >= `dedup_threshold`).
+    2. Picks chunks by Maximal Marginal Relevance: relevance is the retrieval score,
+       redundancy the overlap with chunks already picked.
+    3. Emits chunks grouped under one header per source page instead of one JSON
+       object per chunk.
+    """
+    def __init__(
+        self,
+        token_budget: int = 6000,
+        model: str = "gpt-4o",
+        mmr_lambda: float = 0.7,
+        dedup_threshold: float = 0.8
+    ):
+        self.token_budget = token_budget
+        self.model = model
+        self.mmr_lambda = mmr_lambda
+        self.dedup_threshold = dedup_threshold
+
+    def pack(self, chunks: List[Dict[str, Any]]) -> Tuple[str, Dict[str, int]]:
+        """
+        `chunks` are resolved research entries ({"url", "content", "score"?}) in
+        retrieval order. Returns (context_text, stats).
+        """
+        candidates = []
+        for position, chunk in enumerate(chunks):
+            content = str(chunk.get("content") or "").strip()
+            if not content:
+                continue
+            score = (chunk.get("metadata") or {}).get("score", chunk.get("score"))
+            candidates.append(
+                {
+                    "url": chunk.get("url", "Monte Azul Website"),
+                    "content": content,
+                    # Without a retrieval score, fall back to the original order
+                    "relevance": (
+                        float(score) if score is not None else 1.0 / (position + 1)
+                    ),
+                    "shingles": _shingles(content),
+                    "tokens": count_tokens(content, self.model)
+                }
+            )
+        tokens_in = sum(c["tokens"] for c in candidates)
+
+        # 1. Near-duplicate removal (keep the most relevant copy)
+        unique: List[Dict[str, Any]] = []
+        for cand in sorted(candidates, key=lambda c: c["relevance"], reverse=True):
+            if all(
+                _jaccard(cand["shingles"], kept["shingles"]) < self.dedup_threshold
+                for kept in unique
+            ):
+                unique.append(cand)
+
+        # 2. MMR selection within the budget
+        if unique:
+            top = max(c["relevance"] for c in unique) or 1.0
+            for cand in unique:
+                cand["relevance"] /= top
+        selected: List[Dict[str, Any]] = []
+        remaining = list(unique)
+        used = 0
+        while remaining:
+            best, best_value = None, float("-inf")
+            for cand in remaining:
+                redundancy = max(
+                    (_jaccard(cand["shingles"], s["shingles"]) for s in selected),
+                    default=0.0
+                )
+                value = (
+                    self.mmr_lambda * cand["relevance"]
+                    - (1 - self.mmr_lambda) * redundancy
+                )
+                if value > best_value:
+                    best, best_value = cand, value
+            remaining.remove(best)
+            if used + best["tokens"] <= self.token_budget:
+                selected.append(best)
+                used += best["tokens"]
+
+        # 3. Compact rendering grouped by page (pages in order of their best chunk)
+        by_url: Dict[str, List[str]] = {}
+        for cand in selected:
+            by_url.setdefault(cand["url"], []).append(cand["content"])
+        context = "\n\n".join(
+            f"### Source: {url}\n" + "\n---\n".join(contents)
+            for url, contents in by_url.items()
+        )
+        tokens_out = count_tokens(context, self.model) if context else 0
+        stats = {
+            "chunks_in": len(candidates),
+            "duplicates_dropped": len(candidates) - len(unique),
+            "chunks_packed": len(selected),
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "tokens_saved": max(tokens_in - tokens_out, 0)
+        }
+        return context, stats
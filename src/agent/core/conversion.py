@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Any, Callable, List, Sequence
+from langchain_core.documents import Document
+from agent.core.config import get_settings
+from agent.core.metrics import FALLBACKS
+
+logger = logging.getLogger(__name__)
+
+# Values of langchain_docling.loader.ExportType, kept as plain strings so this module
+# (and its callers) can be imported without loading Docling.
+EXPORT_DOC_CHUNKS = "doc_chunks"
+EXPORT_MARKDOWN = "markdown"
+
+# --- Worker process side ---
+
+_converter = None
+
+def _init_worker() -> None:
+    """
+    Runs once per worker: builds a DocumentConverter and preloads its pipelines/models.
+    """
+    global _converter
+    from docling.datamodel.base_models import InputFormat
+    from docling.document_converter import DocumentConverter
+
+    _converter = DocumentConverter()
+    for input_format in (InputFormat.HTML, InputFormat.PDF):
+        try:
+            _converter.initialize_pipeline(input_format)
+        except Exception as e:  # a missing optional model must not kill the worker
+            logging.getLogger(__name__).warning(
+                f"Could not preload Docling {input_format} pipeline: {e}"
+            )
+
+def _convert(source: str, export_type: str) -> List[Document]:
+    from langchain_docling import DoclingLoader
+    from langchain_docling.loader import ExportType
+
+    loader = DoclingLoader(
+        file_path=[source],
+        converter=_converter,
+        export_type=ExportType(export_type)
+    )
+    return loader.load()
+
+def _ping() -> int:
+    return os.getpid()
+
+# --- Service ---
+
+class ConversionService:
+    """
+    Shared pool of warm Docling converters.
+
+    Each worker process loads Docling's layout/table models once at start-up, so pages
+    are converted in parallel across cores without per-call model loading. At most
+    `max_pending` jobs are queued; further submitters wait for a free slot. If a worker
+    dies (OOM, native crash) the pool is broken: its pending jobs fail and the next
+    submission starts a fresh pool.
+    """
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor: ProcessPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                logger.info(
+                    f"Starting Docling conversion pool with {self.workers} workers"
+                )
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    # spawn: Docling/torch are not fork-safe once the parent has threads
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker
+                )
+            return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor) -> None:
+        with self._executor_lock:
+            if self._executor is not executor:
+                return  # already replaced
+            self._executor = None
+        FALLBACKS.inc(kind="conversion_pool_restart")
+        logger.warning(
+            "Docling conversion pool broke (a worker died); it will be restarted"
+        )
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _on_done(self, executor: ProcessPoolExecutor, future: Future) -> None:
+        self._slots.release()
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._discard_executor(executor)
+
+    def _submit_with_slot(self, fn: Callable[..., Any], *args: Any) -> Future:
+        try:
+            executor = self._get_executor()
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                # Broke between jobs: nothing was queued yet, so retry on a fresh pool
+                self._discard_executor(executor)
+                executor = self._get_executor()
+                future = executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._on_done(executor, f))
+        return future
+
+    def _release_once_acquired(self, acquiring: asyncio.Future) -> None:
+        if not acquiring.cancelled() and acquiring.exception() is None:
+            self._slots.release()
+
+    def submit(self, source: str, export_type: str = EXPORT_DOC_CHUNKS) -> Future:
+        """
+        Queues a conversion, blocking while the job queue is full.
+        """
+        self._slots.acquire()
+        return self._submit_with_slot(_convert, source, export_type)
+
+    def convert(
+        self, source: str, export_type: str = EXPORT_DOC_CHUNKS
+    ) -> List[Document]:
+        return self.submit(source, export_type).result()
+
+    def convert_many(
+        self, sources: Sequence[str], export_type: str = EXPORT_DOC_CHUNKS
+    ) -> List[List[Document]]:
+        futures = [self.submit(source, export_type) for source in sources]
+        return [future.result() for future in futures]
+
+    async def aconvert(
+        self, source: str, export_type: str = EXPORT_DOC_CHUNKS
+    ) -> List[Document]:
+        # Wait for a queue slot off the event loop, then await the worker result
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self._slots.acquire))
+        try:
+            await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # The thread still takes the slot; give it back as soon as it does
+            acquiring.add_done_callback(self._release_once_acquired)
+            raise
+        return await asyncio.wrap_future(
+            self._submit_with_slot(_convert, source, export_type)
+        )
+
+    def warm_up(self) -> None:
+        """
+        Starts every worker (and thus loads the models) ahead of the first real job.
+        """
+        executor = self._get_executor()
+        pids = {
+            f.result()
+            for f in [executor.submit(_ping) for _ in range(self.workers * 2)]
+        }
+        logger.info(f"Docling conversion pool warm ({len(pids)} workers)")
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+@lru_cache
+def get_conversion_service() -> ConversionService:
+    """
+    Returns the process-wide conversion service shared by scraping and ingestion.
+    """
+    settings = get_settings()
+    workers = settings.DOCLING_WORKERS or max(1, (os.cpu_count() or 2) - 1)
+    return ConversionService(workers=workers, max_pending=settings.DOCLING_MAX_PENDING)
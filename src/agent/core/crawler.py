@@ -0,0 +1,423 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+from html.parser import HTMLParser
+from typing import Dict, List, Set, Tuple
+from urllib.parse import urldefrag, urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+import httpx
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "MonteAzulAgentCrawler/1.0"
+
+SKIPPED_EXTENSIONS = (
+    ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".css", ".js", ".json",
+    ".zip", ".rar", ".mp3", ".mp4", ".avi", ".mov", ".woff", ".woff2", ".ttf", ".xml",
+)
+
+class _LinkExtractor(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.links: List[str] = []
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, str | None]]) -> None:
+        if tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self.links.append(href)
+
+class CrawlState:
+    """
+    SQLite-backed crawl bookkeeping: validators per page (ETag/Last-Modified/hash)
+    and the pending frontier, so an interrupted crawl resumes where it stopped.
+    A fetched page stays flagged for indexing until `mark_indexed()` is called after
+    its chunks are synced, so a failed conversion or a crash before the sync never
+    lets it be reported unchanged.
+    """
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT,
+                content_hash TEXT, status INTEGER, fetched_at REAL,
+                indexed INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS frontier (
+                url TEXT PRIMARY KEY, depth INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS visited (url TEXT PRIMARY KEY);
+        """)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(pages)")}
+        if "indexed" not in columns:
+            # State from before the flag existed: every known page is indexed once more
+            self.conn.execute(
+                "ALTER TABLE pages ADD COLUMN indexed INTEGER NOT NULL DEFAULT 0"
+            )
+
+    def has_pending(self) -> bool:
+        return (
+            self.conn.execute("SELECT 1 FROM frontier LIMIT 1").fetchone() is not None
+        )
+
+    def pending(self) -> List[Tuple[str, int]]:
+        return self.conn.execute("SELECT url, depth FROM frontier").fetchall()
+
+    def visited(self) -> Set[str]:
+        return {row[0] for row in self.conn.execute("SELECT url FROM visited")}
+
+    def enqueue(self, url: str, depth: int) -> None:
+        self.conn.execute(
+            "INSERT OR IGNORE INTO frontier(url, depth) VALUES (?, ?)", (url, depth)
+        )
+
+    def mark_done(self, url: str) -> None:
+        self.conn.execute("BEGIN")
+        self.conn.execute("DELETE FROM frontier WHERE url = ?", (url,))
+        self.conn.execute("INSERT OR IGNORE INTO visited(url) VALUES (?)", (url,))
+        self.conn.execute("COMMIT")
+
+    def validators(self, url: str) -> Dict[str, str | None]:
+        row = self.conn.execute(
+            "SELECT etag, last_modified, content_hash, indexed "
+            "FROM pages WHERE url = ?",
+            (url,)
+        ).fetchone()
+        if row is None:
+            return {
+                "etag": None,
+                "last_modified": None,
+                "content_hash": None,
+                "indexed": False
+            }
+        return {
+            "etag": row[0],
+            "last_modified": row[1],
+            "content_hash": row[2],
+            "indexed": bool(row[3])
+        }
+
+    def record(
+        self,
+        url: str,
+        status: int,
+        etag: str | None = None,
+        last_modified: str | None = None,
+        content_hash: str | None = None,
+        changed: bool = False
+    ) -> None:
+        """
+        Stores the page's validators; a `changed` page needs indexing again.
+        """
+        self.conn.execute(
+            "INSERT INTO pages(url, etag, last_modified, content_hash, status, "
+            "fetched_at, indexed) "
+            "VALUES (?, ?, ?, ?, ?, ?, 0) ON CONFLICT(url) DO UPDATE SET "
+            "etag = COALESCE(excluded.etag, pages.etag), "
+            "last_modified = COALESCE(excluded.last_modified, pages.last_modified), "
+            "content_hash = COALESCE(excluded.content_hash, pages.content_hash), "
+            "status = excluded.status, fetched_at = excluded.fetched_at, "
+            "indexed = CASE WHEN ? THEN 0 ELSE pages.indexed END",
+            (url, etag, last_modified, content_hash, status, time.time(), changed)
+        )
+
+    def mark_indexed(self, url: str) -> None:
+        self.conn.execute("UPDATE pages SET indexed = 1 WHERE url = ?", (url,))
+
+    def unindexed(self) -> List[str]:
+        return [
+            row[0]
+            for row in self.conn.execute("SELECT url FROM pages WHERE indexed = 0")
+        ]
+
+    def forget(self, url: str) -> None:
+        self.conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+
+    def finish_run(self) -> None:
+        self.conn.execute("BEGIN")
+        self.conn.execute("DELETE FROM frontier")
+        self.conn.execute("DELETE FROM visited")
+        self.conn.execute("COMMIT")
+
+    def close(self) -> None:
+        self.conn.close()
+
+class SiteCrawler:
+    """
+    Concurrent same-domain crawler seeded from the start URL and the site's sitemap.
+
+    - Bounded concurrency (`concurrency` in-flight requests) with a per-host minimum
+      delay.
+    - Conditional GETs (If-None-Match / If-Modified-Since); 304s and identical bodies
+      are reported as unchanged, so only changed pages need to be converted and
+      embedded. Pages not yet marked indexed (see CrawlState) are reported changed
+      until they are.
+    - Fetched HTML is cached on disk (input for Docling, and link source for 304
+      pages).
+    """
+    def __init__(
+        self,
+        start_url: str,
+        state_path: str,
+        cache_dir: str,
+        max_pages: int = 200,
+        max_depth: int = 5,
+        concurrency: int = 8,
+        per_host_delay: float = 0.5,
+        timeout: float = 20.0,
+        client: httpx.AsyncClient | None = None
+    ):
+        self.start_url = urldefrag(start_url)[0]
+        self.host = urlparse(self.start_url).netloc
+        self.state = CrawlState(state_path)
+        self.cache_dir = cache_dir
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.concurrency = concurrency
+        self.per_host_delay = per_host_delay
+        self.timeout = timeout
+        self._client = client
+        self._host_next_slot: Dict[str, float] = {}
+        self._host_lock = asyncio.Lock()
+        self._robots: RobotFileParser | None = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def cache_path(self, url: str) -> str:
+        return os.path.join(
+            self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".html"
+        )
+
+    async def crawl(self) -> Dict[str, List[str]]:
+        """
+        Crawls the site. Returns {"changed": [...], "unchanged": [...], "removed":
+        [...], "failed": [...]}.
+        """
+        owns_client = self._client is None
+        client = self._client or httpx.AsyncClient(
+            timeout=self.timeout,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(max_connections=self.concurrency)
+        )
+        result: Dict[str, List[str]] = {
+            "changed": [],
+            "unchanged": [],
+            "removed": [],
+            "failed": []
+        }
+        try:
+            await self._load_robots(client)
+            if self.state.has_pending():
+                logger.info("Resuming interrupted crawl.")
+            else:
+                self.state.enqueue(self.start_url, 0)
+                for url in await self._sitemap_urls(client):
+                    self.state.enqueue(url, 1)
+                # Pages whose last ingestion never completed, even if no longer linked
+                for url in self.state.unindexed():
+                    self.state.enqueue(url, 1)
+
+            seen = self.state.visited()
+            queue: asyncio.Queue = asyncio.Queue()
+            for url, depth in self.state.pending():
+                seen.add(url)
+                queue.put_nowait((url, depth))
+            budget = {"left": max(self.max_pages - len(self.state.visited()), 0)}
+
+            async def worker() -> None:
+                while True:
+                    url, depth = await queue.get()
+                    try:
+                        if budget["left"] <= 0:
+                            continue
+                        budget["left"] -= 1
+                        try:
+                            outcome, links = await self._visit(client, url)
+                        except Exception:
+                            # A dead worker would leave queue.join() waiting forever
+                            logger.exception(f"Crawling {url} failed")
+                            outcome, links = "failed", []
+                        result[outcome].append(url)
+                        try:
+                            if depth < self.max_depth:
+                                for link in links:
+                                    if link not in seen:
+                                        seen.add(link)
+                                        self.state.enqueue(link, depth + 1)
+                                        queue.put_nowait((link, depth + 1))
+                            self.state.mark_done(url)
+                        except Exception:
+                            # Left pending; a resumed crawl visits it again
+                            logger.exception(
+                                f"Could not record crawl progress for {url}"
+                            )
+                    finally:
+                        queue.task_done()
+
+            workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+            try:
+                await queue.join()
+            finally:
+                for w in workers:
+                    w.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+            # Only a completed crawl clears the frontier; a crash leaves it to resume
+            self.state.finish_run()
+        finally:
+            if owns_client:
+                await client.aclose()
+        logger.info(
+            "Crawl finished: " + ", ".join(f"{len(v)} {k}" for k, v in result.items())
+        )
+        return result
+
+    async def _visit(
+        self, client: httpx.AsyncClient, url: str
+    ) -> Tuple[str, List[str]]:
+        validators = self.state.validators(url)
+        cached = os.path.exists(self.cache_path(url))
+        headers = {}
+        # A 304 is only useful when the cached body can still be (re)indexed from disk
+        if validators["indexed"] or cached:
+            if validators["etag"]:
+                headers["If-None-Match"] = validators["etag"]
+            if validators["last_modified"]:
+                headers["If-Modified-Since"] = validators["last_modified"]
+
+        await self._throttle(url)
+        try:
+            response = await client.get(url, headers=headers)
+        except httpx.HTTPError as e:
+            logger.warning(f"Fetch failed for {url}: {e}")
+            return "failed", []
+
+        if response.status_code == 304:
+            self.state.record(url, 304)
+            outcome = "unchanged" if validators["indexed"] else "changed"
+            return outcome, self._links_from_cache(url)
+        if response.status_code in (404, 410):
+            # Forgotten by the caller once its chunks are removed
+            return "removed", []
+        if response.status_code >= 400:
+            logger.warning(f"Fetch failed for {url}: HTTP {response.status_code}")
+            return "failed", []
+        if "html" not in response.headers.get("content-type", "text/html"):
+            return "failed", []
+
+        body = response.content
+        content_hash = hashlib.sha256(body).hexdigest()
+        links = self._extract_links(str(response.url), response.text)
+        if content_hash == validators["content_hash"] and cached:
+            self.state.record(
+                url,
+                response.status_code,
+                etag=response.headers.get("etag"),
+                last_modified=response.headers.get("last-modified")
+            )
+            return ("unchanged" if validators["indexed"] else "changed"), links
+        with open(self.cache_path(url), "wb") as f:
+            f.write(body)
+        # Validators are stored with the body they describe, flagged for indexing
+        self.state.record(
+            url,
+            response.status_code,
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+            content_hash=content_hash,
+            changed=True
+        )
+        return "changed", links
+
+    async def _throttle(self, url: str) -> None:
+        """
+        Per-host politeness: reserve the next free slot for the host and sleep until it.
+        """
+        host = urlparse(url).netloc
+        async with self._host_lock:
+            now = time.monotonic()
+            slot = max(now, self._host_next_slot.get(host, now))
+            self._host_next_slot[host] = slot + self.per_host_delay
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def _links_from_cache(self, url: str) -> List[str]:
+        try:
+            with open(self.cache_path(url), encoding="utf-8", errors="ignore") as f:
+                return self._extract_links(url, f.read())
+        except FileNotFoundError:
+            return []
+
+    def _extract_links(self, base_url: str, html: str) -> List[str]:
+        parser = _LinkExtractor()
+        try:
+            parser.feed(html)
+        except Exception:
+            return []
+        links = []
+        for href in parser.links:
+            link = self._normalize(urljoin(base_url, href))
+            if link:
+                links.append(link)
+        return list(dict.fromkeys(links))
+
+    def _normalize(self, url: str) -> str | None:
+        url = urldefrag(url)[0]
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or parsed.netloc != self.host:
+            return None
+        if parsed.path.lower().endswith(SKIPPED_EXTENSIONS):
+            return None
+        if self._robots is not None and not self._robots.can_fetch(USER_AGENT, url):
+            return None
+        return url
+
+    async def _load_robots(self, client: httpx.AsyncClient) -> None:
+        robots_url = urljoin(self.start_url, "/robots.txt")
+        await self._throttle(robots_url)
+        try:
+            response = await client.get(robots_url)
+        except httpx.HTTPError:
+            return
+        if response.status_code == 200:
+            self._robots = RobotFileParser()
+            self._robots.parse(response.text.splitlines())
+
+    async def _sitemap_urls(self, client: httpx.AsyncClient) -> List[str]:
+        """
+        Collects page URLs from robots.txt sitemaps (or /sitemap.xml), following sitemap
+        indexes.
+        """
+        pending = list(self._robots.site_maps() or []) if self._robots else []
+        if not pending:
+            pending = [urljoin(self.start_url, "/sitemap.xml")]
+        urls: List[str] = []
+        fetched: Set[str] = set()
+        while pending and len(urls) < self.max_pages:
+            sitemap_url = pending.pop()
+            if sitemap_url in fetched:
+                continue
+            fetched.add(sitemap_url)
+            await self._throttle(sitemap_url)
+            try:
+                response = await client.get(sitemap_url)
+                if response.status_code != 200:
+                    continue
+                root = ET.fromstring(response.content)
+            except (httpx.HTTPError, ET.ParseError):
+                continue
+            for loc in root.iter():
+                if not loc.tag.endswith("loc") or not loc.text:
+                    continue
+                if root.tag.endswith("sitemapindex"):
+                    pending.append(loc.text.strip())
+                else:
+                    link = self._normalize(loc.text.strip())
+                    if link:
+                        urls.append(link)
+        return urls
@@ -0,0 +1,187 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+from langchain_core.embeddings import Embeddings
+from agent.core.config import get_settings
+from agent.core.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+def embedding_key(model: str, text: str) -> str:
+    """
+    Content address of an embedding: sha256 over (model, text).
+    """
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    Persistent SQLite store of embedding vectors with LRU eviction and hit/miss
+    counters.
+    """
+    def __init__(self, path: str, max_entries: int = 200_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON "
+            "embeddings(last_used)"
+        )
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, k) for k in found]
+                )
+            hits = sum(1 for k in keys if k in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        rows = [(k, array("f", v).tobytes(), now) for k, v in items.items()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings(key, vector, last_used) "
+                "VALUES (?, ?, ?)",
+                rows
+            )
+            self._size += self._conn.total_changes - before
+            self._conn.execute("COMMIT")
+            if self._size > self.max_entries:
+                self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        # Trim to 90% so eviction is amortized over many inserts
+        excess = self._size - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self._size -= excess
+        self.evictions += excess
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that only calls the provider for texts it has never embedded.
+    """
+    def __init__(self, underlying: Embeddings, model: str, cache: EmbeddingCache):
+        self.underlying = underlying
+        self.model = model
+        self.cache = cache
+
+    def _split(
+        self, texts: List[str]
+    ) -> Tuple[List[str], Dict[str, List[float]], List[str]]:
+        keys = [embedding_key(self.model, t) for t in texts]
+        cached = self.cache.get_many(keys)
+        missing = list(dict.fromkeys(t for t, k in zip(texts, keys) if k not in cached))
+        CACHE_REQUESTS.inc(len(texts) - len(missing), cache="embedding", result="hit")
+        CACHE_REQUESTS.inc(len(missing), cache="embedding", result="miss")
+        return keys, cached, missing
+
+    def _merge(
+        self,
+        keys: List[str],
+        cached: Dict[str, List[float]],
+        missing: List[str],
+        vectors: List[List[float]]
+    ) -> List[List[float]]:
+        fresh = {embedding_key(self.model, t): v for t, v in zip(missing, vectors)}
+        self.cache.put_many(fresh)
+        cached.update(fresh)
+        return [cached[k] for k in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, cached, missing = self._split(texts)
+        vectors = self.underlying.embed_documents(missing) if missing else []
+        return self._merge(keys, cached, missing, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, cached, missing = self._split(texts)
+        vectors = await self.underlying.aembed_documents(missing) if missing else []
+        return self._merge(keys, cached, missing, vectors)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+@lru_cache
+def get_embeddings() -> Embeddings:
+    """
+    Returns the process-wide embedding client shared by ingestion and retrieval.
+    Requests go through the pooled, scheduled HTTP clients of the LLM registry.
+    """
+    from langchain_openai import OpenAIEmbeddings
+    from agent.core.llm import get_client_registry
+
+    settings = get_settings()
+    pool = get_client_registry().pool(settings.EMBEDDING_MODEL)
+    embeddings = OpenAIEmbeddings(
+        model=settings.EMBEDDING_MODEL,
+        openai_api_key=settings.OPENAI_API_KEY,
+        base_url=pool.base_url,
+        max_retries=pool.max_retries,
+        http_client=pool.http_client,
+        http_async_client=pool.http_async_client
+    )
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return embeddings
+    cache = EmbeddingCache(
+        settings.embedding_cache_path, settings.EMBEDDING_CACHE_MAX_ENTRIES
+    )
+    return CachedEmbeddings(embeddings, settings.EMBEDDING_MODEL, cache)
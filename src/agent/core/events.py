@@ -0,0 +1,28 @@
+from typing import Any, Dict, Literal
+from pydantic import BaseModel, Field
+
+class AgentEvent(BaseModel):
+    """
+    Event emitted by MonteAzulAgent.stream_run.
+
+    - progress: a graph node finished (`node`, human-readable `text`)
+    - token:    a chunk of the final answer as it is generated (already PII-redacted)
+    - reset:    the answer tokens streamed so far are void; clients clear them
+    - answer:   the complete, redacted final answer (always the last event of a turn)
+    """
+    type: Literal["progress", "token", "reset", "answer"]
+    text: str = ""
+    node: str | None = None
+    data: Dict[str, Any] = Field(default_factory=dict)
+
+def progress_event(node: str, text: str) -> AgentEvent:
+    return AgentEvent(type="progress", node=node, text=text)
+
+def token_event(text: str, node: str = "responder") -> AgentEvent:
+    return AgentEvent(type="token", node=node, text=text)
+
+def reset_event(node: str = "responder") -> AgentEvent:
+    return AgentEvent(type="reset", node=node)
+
+def answer_event(text: str, **data: Any) -> AgentEvent:
+    return AgentEvent(type="answer", text=text, data=data)
@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+
+@dataclass(frozen=True)
+class ScoredHit:
+    """
+    A fused retrieval result.
+
+    `score` is the weighted mean of each retriever's normalized score (0..1, higher is
+    better) and is what `min_score` cutoffs apply to; `rank_score` is the weighted RRF
+    value used for ordering. Per-retriever normalized scores are None when the chunk
+    was not returned by that retriever.
+    """
+    chunk_id: str
+    score: float
+    rank_score: float
+    dense_score: float | None
+    sparse_score: float | None
+    document: Document | None = None
+
+class FusionEngine:
+    """
+    Weighted Reciprocal Rank Fusion over NumPy arrays of chunk IDs and scores.
+
+    Each input list is (ids, scores) in rank order. Dense scores are expected to be
+    similarities in [0, 1] and are used as-is; other lists are min-max normalized per
+    query. Duplicate IDs across lists are merged.
+    """
+    def __init__(
+        self,
+        weights: Sequence[float] = (0.6, 0.4),
+        rrf_c: int = 60,
+        k: int = 5,
+        min_score: float = 0.0,
+        absolute: Sequence[bool] = (True, False)
+    ):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.rrf_c = rrf_c
+        self.k = k
+        self.min_score = min_score
+        self.absolute = tuple(absolute)
+
+    def _normalize(self, scores: np.ndarray, absolute: bool) -> np.ndarray:
+        if absolute:
+            return np.clip(scores, 0.0, 1.0)
+        if scores.size == 0:
+            return scores
+        low, high = scores.min(), scores.max()
+        if high <= low:
+            return np.ones_like(scores)
+        return (scores - low) / (high - low)
+
+    def fuse(
+        self,
+        ranked: Sequence[Tuple[Sequence[str], Sequence[float]]],
+        k: int | None = None,
+        min_score: float | None = None
+    ) -> List[ScoredHit]:
+        k = self.k if k is None else k
+        min_score = self.min_score if min_score is None else min_score
+        id_parts, list_parts, rank_parts, norm_parts = [], [], [], []
+        for list_idx, (ids, scores) in enumerate(ranked):
+            ids = np.asarray(ids, dtype=object)
+            if ids.size == 0:
+                continue
+            id_parts.append(ids)
+            list_parts.append(np.full(ids.size, list_idx))
+            rank_parts.append(np.arange(1, ids.size + 1))
+            norm_parts.append(
+                self._normalize(
+                    np.asarray(scores, dtype=np.float64), self.absolute[list_idx]
+                )
+            )
+        if not id_parts:
+            return []
+
+        all_ids = np.concatenate(id_parts)
+        lists = np.concatenate(list_parts)
+        ranks = np.concatenate(rank_parts)
+        norms = np.concatenate(norm_parts)
+        unique_ids, inverse = np.unique(all_ids.astype(str), return_inverse=True)
+        weights = self.weights[lists]
+
+        rank_score = np.bincount(
+            inverse, weights=weights / (ranks + self.rrf_c), minlength=unique_ids.size
+        )
+        score = (
+            np.bincount(inverse, weights=weights * norms, minlength=unique_ids.size)
+            / self.weights.sum()
+        )
+        per_list = np.full((len(ranked), unique_ids.size), np.nan)
+        per_list[lists, inverse] = norms
+
+        keep = np.flatnonzero(score >= min_score)
+        order = keep[np.lexsort((-score[keep], -rank_score[keep]))][:k]
+        return [
+            ScoredHit(
+                chunk_id=str(unique_ids[i]),
+                score=float(score[i]),
+                rank_score=float(rank_score[i]),
+                dense_score=None if np.isnan(per_list[0, i]) else float(per_list[0, i]),
+                sparse_score=(
+                    None
+                    if len(ranked) < 2 or np.isnan(per_list[1, i])
+                    else float(per_list[1, i])
+                )
+            )
+            for i in order
+        ]
@@ -0,0 +1,80 @@
+import logging
+from typing import List, Sequence, Tuple
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from agent.core.context_packing import count_tokens
+from agent.core.prompts import HISTORY_SUMMARY_PROMPT
+
+logger = logging.getLogger(__name__)
+
+def message_tokens(message: BaseMessage) -> int:
+    content = (
+        message.content if isinstance(message.content, str) else str(message.content)
+    )
+    # ~4 tokens of per-message framing in the chat format
+    return count_tokens(content) + 4
+
+class HistoryCompactor:
+    """
+    Bounds the conversation history a thread carries from turn to turn.
+
+    Once the history exceeds `trigger_tokens`, every turn except the last `keep_turns`
+    (a turn starts at a user message) is folded into a rolling summary. The
+    responder then sees the summary plus a short verbatim window, so prompt size,
+    state size and checkpoint writes stop growing with the conversation.
+    """
+    def __init__(
+        self, keep_turns: int = 3, trigger_tokens: int = 2000, summary_tokens: int = 300
+    ):
+        self.keep_turns = max(1, keep_turns)
+        self.trigger_tokens = trigger_tokens
+        self.summary_tokens = summary_tokens
+
+    def split(
+        self, messages: Sequence[BaseMessage]
+    ) -> Tuple[List[BaseMessage], List[BaseMessage]] | None:
+        """
+        Returns (folded, kept) when the history should be compacted, else None.
+        """
+        turn_starts = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+        if len(turn_starts) <= self.keep_turns:
+            return None
+        if sum(message_tokens(m) for m in messages) <= self.trigger_tokens:
+            return None
+        cut = turn_starts[-self.keep_turns]
+        return list(messages[:cut]), list(messages[cut:])
+
+    async def summarize(
+        self, llm: BaseChatModel, previous: str | None, folded: Sequence[BaseMessage]
+    ) -> str:
+        """
+        Folds `folded` into the previous summary with one (small model) LLM call.
+        """
+        transcript = "\n".join(
+            f"{'User' if isinstance(m, HumanMessage) else 'Assistant'}: {m.content}"
+            for m in folded
+        )
+        response = await llm.ainvoke(
+            [
+                SystemMessage(
+                    content=HISTORY_SUMMARY_PROMPT.format(
+                        max_tokens=self.summary_tokens
+                    )
+                ),
+                HumanMessage(
+                    content=(
+                        f"Current summary:\n{previous or '(none)'}\n\n"
+                        f"New messages:\n{transcript}"
+                    )
+                )
+            ]
+        )
+        return response.content.strip()
+
+def summary_message(summary: str | None) -> List[SystemMessage]:
+    """
+    The rolling summary as a prompt message (empty when there is none).
+    """
+    if not summary:
+        return []
+    return [SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")]
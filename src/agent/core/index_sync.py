@@ -0,0 +1,89 @@
+import hashlib
+import logging
+from typing import TYPE_CHECKING, Dict, List
+from langchain_core.documents import Document
+from agent.core.sparse_index import SparseIndex
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+logger = logging.getLogger(__name__)
+
+def chunk_id(source: str, content: str) -> str:
+    """
+    Deterministic chunk ID: hash of the source URL plus hash of the chunk text.
+    Identical text on the same page maps to the same ID, so re-ingestion is idempotent.
+    """
+    source_hash = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()[:32]
+    return f"{source_hash}-{content_hash}"
+
+def prepare_chunks(docs: List[Document]) -> List[Document]:
+    """
+    The chunking step shared by every ingestion path. Docling DOC_CHUNKS are already
+    layout-aware chunks, so they are only stripped of metadata Chroma cannot store.
+    Chunk IDs hash the content: paths that chunked differently would delete each
+    other's chunks on every sync.
+    """
+    from langchain_community.vectorstores.utils import filter_complex_metadata
+    return filter_complex_metadata(docs)
+
+def sync_source(
+    vector_store: "Chroma",
+    sparse_index: SparseIndex,
+    source: str,
+    docs: List[Document],
+    batch_size: int = 256
+) -> Dict[str, int]:
+    """
+    Makes the stored chunks of `source` match `docs`.
+
+    Only new or changed chunks are embedded and written; chunks that disappeared from
+    the page are deleted afterwards, so the live index is never empty mid-update.
+    """
+    wanted: Dict[str, Document] = {}
+    for doc in docs:
+        doc.metadata["source"] = source
+        wanted.setdefault(chunk_id(source, doc.page_content), doc)
+
+    stored = vector_store.get(where={"source": source}, include=[])
+    existing = set(stored["ids"])
+
+    to_add = [cid for cid in wanted if cid not in existing]
+    to_delete = [cid for cid in existing if cid not in wanted]
+
+    for start in range(0, len(to_add), batch_size):
+        batch_ids = to_add[start:start + batch_size]
+        batch_docs = [wanted[cid] for cid in batch_ids]
+        vector_store.add_documents(batch_docs, ids=batch_ids)
+        sparse_index.add(batch_ids, [doc.page_content for doc in batch_docs])
+
+    for start in range(0, len(to_delete), batch_size):
+        batch_ids = to_delete[start:start + batch_size]
+        vector_store.delete(ids=batch_ids)
+        sparse_index.delete(batch_ids)
+
+    report = {
+        "added": len(to_add),
+        "deleted": len(to_delete),
+        "unchanged": len(wanted) - len(to_add)
+    }
+    logger.info(f"Synced {source}: {report}")
+    return report
+
+def remove_source(
+    vector_store: "Chroma",
+    sparse_index: SparseIndex,
+    source: str,
+    batch_size: int = 256
+) -> int:
+    """
+    Deletes every stored chunk of `source` (e.g. a page that now returns 404).
+    """
+    ids = vector_store.get(where={"source": source}, include=[])["ids"]
+    for start in range(0, len(ids), batch_size):
+        batch_ids = ids[start:start + batch_size]
+        vector_store.delete(ids=batch_ids)
+        sparse_index.delete(batch_ids)
+    logger.info(f"Removed {len(ids)} chunks of {source}")
+    return len(ids)
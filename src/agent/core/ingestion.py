@@ -1,13 +1,14 @@
+import asyncio
 import logging
 import os
-from typing import List
-from langchain_docling import DoclingLoader
-from langchain_docling.loader import ExportType
-from langchain_openai import OpenAIEmbeddings
+from typing import Dict, List
 from langchain_chroma import Chroma
-from langchain_community.vectorstores.utils import filter_complex_metadata
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from agent.core.config import get_settings
+from agent.core.conversion import EXPORT_DOC_CHUNKS, get_conversion_service
+from agent.core.embeddings import get_embeddings
+from agent.core.sparse_index import SparseIndex
+from agent.core.crawler import SiteCrawler
+from agent.core.index_sync import prepare_chunks, remove_source, sync_source
 
 logger = logging.getLogger(__name__)
 
@@ -17,11 +18,9 @@ class WebsiteIndexer:
     """
     def __init__(self):
         self.settings = get_settings()
-        self.embeddings = OpenAIEmbeddings(
-            model=self.settings.EMBEDDING_MODEL,
-            openai_api_key=self.settings.OPENAI_API_KEY
-        )
+        self.embeddings = get_embeddings()
         self.vector_store = None
+        self.sparse_index = SparseIndex(self.settings.bm25_index_path)
 
     def _get_vector_store(self):
         """
@@ -35,38 +34,124 @@ class WebsiteIndexer:
             )
         return self.vector_store
 
-    def index_website(self, url: str = None):
+    def index_website(self, url: str = None) -> Dict[str, int]:
         """
-        Scrapes the website and indexes the content.
+        Scrapes the website and syncs its chunks into the index.
+        Returns counts of added, deleted and unchanged chunks.
         """
         if url is None:
             url = self.settings.WEBSITE_URL
 
         logger.info(f"Starting ingestion for: {url}")
         
-        # 1. Load documents using Docling
-        # We use ExportType.DOC_CHUNKS to get pre-chunked documents with layout awareness
-        loader = DoclingLoader(
-            file_path=[url],
-            export_type=ExportType.DOC_CHUNKS
-        )
-        
-        docs = loader.load()
+        # 1. Load documents using the shared Docling conversion pool
+        # We use DOC_CHUNKS to get pre-chunked documents with layout awareness
+        docs = get_conversion_service().convert(url, EXPORT_DOC_CHUNKS)
         logger.info(f"Loaded {len(docs)} chunks from Docling.")
 
         if not docs:
+            # Leave stored chunks alone: an empty load is more likely a fetch error
+            # than an empty page
             logger.warning("No documents loaded from the URL.")
-            return
+            return {"added": 0, "deleted": 0, "unchanged": 0}
 
-        # 2. Add to Vector Store
+        # 2. Sync into the Vector Store
         # ChromaDB handles persistence automatically when a persist_directory is provided
         vector_store = self._get_vector_store()
         
-        # Filter metadata for ChromaDB compatibility
-        filtered_docs = filter_complex_metadata(docs)
-        vector_store.add_documents(filtered_docs)
+        # Filter metadata for ChromaDB (shared with the agent's auto-ingest)
+        filtered_docs = prepare_chunks(docs)
+        report = sync_source(vector_store, self.sparse_index, url, filtered_docs)
         
-        logger.info(f"Successfully indexed {len(filtered_docs)} chunks into {self.settings.CHROMA_PATH}")
+        logger.info(
+            f"Successfully indexed {url} into {self.settings.CHROMA_PATH}: {report}"
+        )
+        cache = getattr(self.embeddings, "cache", None)
+        if cache is not None:
+            logger.info(f"Embedding cache: {cache.stats()}")
+        return report
+
+    async def crawl_website(
+        self,
+        url: str = None,
+        max_pages: int | None = None,
+        concurrency: int | None = None
+    ) -> Dict[str, int]:
+        """
+        Crawls the whole site (sitemap + same-domain links) and syncs only pages that
+        changed.
+        """
+        if url is None:
+            url = self.settings.WEBSITE_URL
+
+        crawler = SiteCrawler(
+            start_url=url,
+            state_path=self.settings.crawl_state_path,
+            cache_dir=self.settings.crawl_cache_dir,
+            max_pages=max_pages or self.settings.CRAWL_MAX_PAGES,
+            concurrency=concurrency or self.settings.CRAWL_CONCURRENCY,
+            per_host_delay=self.settings.CRAWL_DELAY_SECONDS
+        )
+        try:
+            crawl = await crawler.crawl()
+            totals = await self._sync_crawl(crawler, crawl)
+        finally:
+            crawler.state.close()
+
+        logger.info(f"Crawl ingestion finished: {totals}")
+        return totals
+
+    async def _sync_crawl(
+        self, crawler: SiteCrawler, crawl: Dict[str, List[str]]
+    ) -> Dict[str, int]:
+        """
+        Converts and syncs the changed pages, removes the gone ones. A page is marked
+        indexed only after its sync, so failures are retried by the next crawl.
+        """
+        # Convert all changed pages in parallel on the warm worker pool
+        service = get_conversion_service()
+        conversions = await asyncio.gather(
+            *[
+                service.aconvert(crawler.cache_path(page_url), EXPORT_DOC_CHUNKS)
+                for page_url in crawl["changed"]
+            ],
+            return_exceptions=True
+        )
+
+        vector_store = self._get_vector_store()
+        totals = {
+            "pages_changed": len(crawl["changed"]),
+            "pages_unchanged": len(crawl["unchanged"]),
+            "pages_failed": len(crawl["failed"]),
+            "added": 0,
+            "deleted": 0,
+            "unchanged": 0
+        }
+
+        for page_url, docs in zip(crawl["changed"], conversions):
+            if isinstance(docs, BaseException):
+                logger.warning(f"Docling conversion failed for {page_url}: {docs}")
+                totals["pages_failed"] += 1
+                continue
+            if not docs:
+                # The page converts to nothing now: drop what it used to contribute
+                totals["deleted"] += remove_source(
+                    vector_store, self.sparse_index, page_url
+                )
+            else:
+                report = sync_source(
+                    vector_store, self.sparse_index, page_url, prepare_chunks(docs)
+                )
+                for key in ("added", "deleted", "unchanged"):
+                    totals[key] += report[key]
+            crawler.state.mark_indexed(page_url)
+
+        for page_url in crawl["removed"]:
+            totals["deleted"] += remove_source(
+                vector_store, self.sparse_index, page_url
+            )
+            crawler.state.forget(page_url)
+        return totals
 
     def clear_index(self):
         """
@@ -75,4 +160,5 @@ class WebsiteIndexer:
         vector_store = self._get_vector_store()
         vector_store.delete_collection()
         self.vector_store = None
+        self.sparse_index.clear()
         logger.info("Cleared the vector store collection.")
@@ -1,14 +1,497 @@
-from langchain_openai import ChatOpenAI
+import asyncio
+import logging
+import math
+import threading
+import time
+import weakref
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterator, Tuple
+import httpx
 from agent.core.config import get_settings
+from agent.core.metrics import REGISTRY, GaugeSample, MetricsCallbackHandler
+from agent.core.tracing import TracingCallbackHandler
+from agent.core.scheduler import (
+    LLMScheduler,
+    SchedulerCallbackHandler,
+    SchedulerOverloaded,
+    current_call,
+    get_scheduler,
+    retry_after_seconds
+)
 
-def get_llm(model_name: str = "gpt-4o") -> ChatOpenAI:
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger(__name__)
+
+# Settings field holding the model of each graph node
+NODE_MODEL_SETTINGS = {
+    "reflector": "REFLECTOR_MODEL",
+    "critic": "CRITIC_MODEL",
+    "responder": "RESPONDER_MODEL",
+    "compactor": "COMPACTOR_MODEL",
+}
+
+class PoolMetrics:
     """
-    Returns a configured instance of the OpenAI Chat model.
+    Usage counters of one (model, endpoint) pool.
+    """
+    def __init__(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.waiting = 0
+        self.wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def queued(self) -> None:
+        with self._lock:
+            self.waiting += 1
+
+    def dequeued(self, seconds: float) -> None:
+        with self._lock:
+            self.waiting -= 1
+            self.wait_seconds += seconds
+
+    def started(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finished(self, error: bool = False) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if error:
+                self.errors += 1
+
+def _slot_releaser(
+    release_slot: Callable[[], None], metrics: PoolMetrics, error: bool
+) -> Callable[[], None]:
     """
-    settings = get_settings()
-    return ChatOpenAI(
-        model=model_name,
-        openai_api_key=settings.OPENAI_API_KEY,
-        temperature=0,
-        max_retries=3
+    Idempotent callback returning a concurrency slot (close may be called twice).
+    """
+    released = False
+    def release() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            release_slot()
+            metrics.finished(error=error)
+    return release
+
+class _SlotStream(httpx.SyncByteStream):
+    """
+    Response body wrapper that gives the concurrency slot back once the body is
+    consumed or closed, so streamed completions hold their slot until the last token.
+    """
+    def __init__(
+        self, stream: httpx.SyncByteStream, release: Callable[[], None]
+    ) -> None:
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+class _AsyncSlotStream(httpx.AsyncByteStream):
+    def __init__(
+        self, stream: httpx.AsyncByteStream, release: Callable[[], None]
+    ) -> None:
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+def _prompt_estimate(request: httpx.Request) -> float:
+    """
+    Rough token count of a request (~4 bytes per token of the JSON body), charged to
+    the scheduler's per-minute budget before the usage is known.
+    """
+    try:
+        return len(request.content) / 4
+    except httpx.RequestNotRead:
+        return 0.0
+
+def _overloaded_response(
+    request: httpx.Request, error: SchedulerOverloaded
+) -> httpx.Response:
+    """
+    A 429 the OpenAI SDK surfaces as RateLimitError without retrying: the call was
+    never sent, and retrying it would only join the queue that just shed it.
+    """
+    return httpx.Response(
+        429,
+        headers={
+            "retry-after": str(math.ceil(error.retry_after)),
+            "x-should-retry": "false"
+        },
+        json={
+            "error": {
+                "message": str(error),
+                "type": "scheduler_overloaded",
+                "code": error.reason
+            }
+        },
+        request=request
     )
+
+def _report_response(scheduler: LLMScheduler | None, response: httpx.Response) -> None:
+    if scheduler is not None:
+        scheduler.record_response(
+            response.status_code, retry_after_seconds(response.headers)
+        )
+
+class _LimitedTransport(httpx.BaseTransport):
+    def __init__(
+        self,
+        limits: httpx.Limits,
+        max_concurrency: int,
+        metrics: PoolMetrics,
+        scheduler: LLMScheduler | None = None
+    ):
+        self._transport = httpx.HTTPTransport(limits=limits)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._metrics = metrics
+        self._scheduler = scheduler
+
+    def _release(self) -> None:
+        self._slots.release()
+        if self._scheduler is not None:
+            self._scheduler.release()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self._scheduler is not None:
+            try:
+                self._scheduler.acquire_sync(*current_call(), _prompt_estimate(request))
+            except SchedulerOverloaded as e:
+                return _overloaded_response(request, e)
+        start = time.perf_counter()
+        self._metrics.queued()
+        try:
+            self._slots.acquire()
+        except BaseException:
+            if self._scheduler is not None:
+                self._scheduler.release()
+            raise
+        finally:
+            self._metrics.dequeued(time.perf_counter() - start)
+        self._metrics.started()
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            self._release()
+            self._metrics.finished(error=True)
+            raise
+        _report_response(self._scheduler, response)
+        release = _slot_releaser(
+            self._release, self._metrics, response.status_code >= 500
+        )
+        response.stream = _SlotStream(response.stream, release)
+        return response
+
+    def connections(self) -> Tuple[int, int]:
+        return _pool_connections(self._transport)
+
+    def close(self) -> None:
+        self._transport.close()
+
+# Per event loop: its httpcore pool and in-flight semaphore
+_LoopState = Tuple[httpx.AsyncHTTPTransport, asyncio.Semaphore]
+
+class _LimitedAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    Async counterpart of _LimitedTransport. httpcore pools and asyncio semaphores are
+    bound to an event loop, so each loop gets its own (normally there is only one).
+    The scheduler is process-wide and shared by all loops and threads.
+    """
+    def __init__(
+        self,
+        limits: httpx.Limits,
+        max_concurrency: int,
+        metrics: PoolMetrics,
+        scheduler: LLMScheduler | None = None
+    ):
+        self._limits = limits
+        self._max_concurrency = max_concurrency
+        self._metrics = metrics
+        self._scheduler = scheduler
+        self._per_loop: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, _LoopState
+        ] = weakref.WeakKeyDictionary()
+
+    def _for_loop(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        entry = self._per_loop.get(loop)
+        if entry is None:
+            entry = (
+                httpx.AsyncHTTPTransport(limits=self._limits),
+                asyncio.Semaphore(self._max_concurrency)
+            )
+            self._per_loop[loop] = entry
+        return entry
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        transport, slots = self._for_loop()
+        scheduler = self._scheduler
+        if scheduler is not None:
+            # Global priority/fairness first, then the per-model slot
+            try:
+                await scheduler.acquire(*current_call(), _prompt_estimate(request))
+            except SchedulerOverloaded as e:
+                return _overloaded_response(request, e)
+
+        def release_slots() -> None:
+            slots.release()
+            if scheduler is not None:
+                scheduler.release()
+
+        start = time.perf_counter()
+        self._metrics.queued()
+        try:
+            await slots.acquire()
+        except BaseException:
+            if scheduler is not None:
+                scheduler.release()
+            raise
+        finally:
+            self._metrics.dequeued(time.perf_counter() - start)
+        self._metrics.started()
+        try:
+            response = await transport.handle_async_request(request)
+        except BaseException:
+            release_slots()
+            self._metrics.finished(error=True)
+            raise
+        _report_response(scheduler, response)
+        release = _slot_releaser(
+            release_slots, self._metrics, response.status_code >= 500
+        )
+        response.stream = _AsyncSlotStream(response.stream, release)
+        return response
+
+    def connections(self) -> Tuple[int, int]:
+        total, idle = 0, 0
+        for transport, _ in list(self._per_loop.values()):
+            t, i = _pool_connections(transport)
+            total, idle = total + t, idle + i
+        return total, idle
+
+    async def aclose(self) -> None:
+        entry = self._per_loop.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[0].aclose()
+
+def _pool_connections(
+    transport: httpx.BaseTransport | httpx.AsyncBaseTransport
+) -> Tuple[int, int]:
+    """
+    (open, idle) connections of an httpx transport's underlying httpcore pool.
+    """
+    connections = getattr(getattr(transport, "_pool", None), "connections", None) or []
+    idle = sum(1 for conn in connections if conn.is_idle())
+    return len(connections), idle
+
+class ModelPool:
+    """
+    One keep-alive HTTP connection pool (sync and async) for a (model, endpoint) pair,
+    with a concurrency limit and usage metrics. Requests pass the process-wide
+    LLMScheduler (priority, fairness, global budgets) before taking a slot.
+    """
+    def __init__(
+        self, model: str, base_url: str | None, max_concurrency: int, max_retries: int
+    ):
+        settings = get_settings()
+        self.model = model
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = httpx.Timeout(
+            settings.LLM_READ_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT
+        )
+        limits = httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE
+        )
+        self.metrics = PoolMetrics()
+        scheduler = get_scheduler() if settings.LLM_SCHEDULER_ENABLED else None
+        self._sync_transport = _LimitedTransport(
+            limits, max_concurrency, self.metrics, scheduler
+        )
+        self._async_transport = _LimitedAsyncTransport(
+            limits, max_concurrency, self.metrics, scheduler
+        )
+        self.http_client = httpx.Client(
+            transport=self._sync_transport, timeout=self.timeout
+        )
+        self.http_async_client = httpx.AsyncClient(
+            transport=self._async_transport, timeout=self.timeout
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        sync_open, sync_idle = self._sync_transport.connections()
+        async_open, async_idle = self._async_transport.connections()
+        return {
+            "model": self.model,
+            "base_url": self.base_url,
+            "max_concurrency": self.max_concurrency,
+            "requests": self.metrics.requests,
+            "errors": self.metrics.errors,
+            "in_flight": self.metrics.in_flight,
+            "peak_in_flight": self.metrics.peak_in_flight,
+            "waiting": self.metrics.waiting,
+            "wait_seconds": round(self.metrics.wait_seconds, 4),
+            "connections_open": sync_open + async_open,
+            "connections_idle": sync_idle + async_idle
+        }
+
+    async def aclose(self) -> None:
+        await self.http_async_client.aclose()
+        self.http_client.close()
+
+class LLMClientRegistry:
+    """
+    Hands out ChatOpenAI clients that share one ModelPool per (model, endpoint), so
+    every node call and every concurrent user reuses the same warm connections.
+    """
+    def __init__(self) -> None:
+        self._pools: Dict[Tuple[str, str | None], ModelPool] = {}
+        self._models: Dict[Tuple[str, str | None, float], "ChatOpenAI"] = {}
+        self._lock = threading.Lock()
+
+    def pool(self, model: str, base_url: str | None = None) -> ModelPool:
+        settings = get_settings()
+        base_url = base_url or settings.OPENAI_BASE_URL
+        key = (model, base_url)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = ModelPool(
+                    model,
+                    base_url,
+                    max_concurrency=settings.LLM_MODEL_CONCURRENCY.get(
+                        model, settings.LLM_MAX_CONCURRENCY
+                    ),
+                    max_retries=settings.LLM_MODEL_MAX_RETRIES.get(
+                        model, settings.LLM_MAX_RETRIES
+                    )
+                )
+                self._pools[key] = pool
+                logger.info(
+                    f"Opened LLM connection pool for {model} "
+                    f"({base_url or 'api.openai.com'})"
+                )
+            return pool
+
+    def get(
+        self, model: str, base_url: str | None = None, temperature: float = 0
+    ) -> "ChatOpenAI":
+        from langchain_openai import ChatOpenAI
+
+        pool = self.pool(model, base_url)
+        key = (model, pool.base_url, temperature)
+        with self._lock:
+            llm = self._models.get(key)
+            if llm is None:
+                settings = get_settings()
+                llm = ChatOpenAI(
+                    model=model,
+                    openai_api_key=settings.OPENAI_API_KEY,
+                    base_url=pool.base_url,
+                    temperature=temperature,
+                    max_retries=pool.max_retries,
+                    timeout=pool.timeout,
+                    http_client=pool.http_client,
+                    http_async_client=pool.http_async_client,
+                    # Token usage is also reported for streamed completions
+                    stream_usage=True,
+                    callbacks=self._callbacks(model)
+                )
+                self._models[key] = llm
+            return llm
+
+    @staticmethod
+    def _callbacks(model: str) -> list:
+        settings = get_settings()
+        callbacks = [
+            MetricsCallbackHandler(model, settings.LLM_PRICES_PER_MTOKEN),
+            TracingCallbackHandler(model)
+        ]
+        if settings.LLM_SCHEDULER_ENABLED:
+            callbacks.append(SchedulerCallbackHandler(get_scheduler()))
+        return callbacks
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            pools = list(self._pools.values())
+        return {f"{p.model}@{p.base_url or 'openai'}": p.stats() for p in pools}
+
+    def collect_metrics(self) -> Iterator[GaugeSample]:
+        """
+        Pool gauges for the metrics endpoint.
+        """
+        gauges = (
+            ("in_flight", "agent_llm_pool_in_flight", "LLM requests in flight"),
+            (
+                "waiting",
+                "agent_llm_pool_waiting",
+                "LLM requests waiting for a concurrency slot"
+            ),
+            ("connections_open", "agent_llm_pool_connections", "Open HTTP connections"),
+            (
+                "connections_idle",
+                "agent_llm_pool_idle_connections",
+                "Idle keep-alive connections"
+            )
+        )
+        for stats in self.stats().values():
+            labels = {
+                "model": stats["model"],
+                "endpoint": stats["base_url"] or "openai"
+            }
+            for key, name, help in gauges:
+                yield name, help, labels, stats[key]
+
+    async def aclose(self) -> None:
+        """
+        Closes every pool; clients requested afterwards get fresh pools.
+        """
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+            self._models.clear()
+        for pool in pools:
+            await pool.aclose()
+
+@lru_cache
+def get_client_registry() -> LLMClientRegistry:
+    registry = LLMClientRegistry()
+    REGISTRY.add_collector(registry.collect_metrics)
+    return registry
+
+def get_llm(model_name: str = "gpt-4o") -> "ChatOpenAI":
+    """
+    Returns the shared, pooled OpenAI Chat model client for `model_name`.
+    """
+    return get_client_registry().get(model_name)
+
+def get_llm_for_node(node: str) -> "ChatOpenAI":
+    """
+    Returns the client for a graph node, using the model configured in Settings.
+    """
+    return get_llm(getattr(get_settings(), NODE_MODEL_SETTINGS[node]))
@@ -0,0 +1,407 @@
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets (seconds): sub-millisecond retrieval stages up to long LLM calls
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 10, 20)
+
+# USD per 1M (input, output) tokens; override/extend with Settings.LLM_PRICES_PER_MTOKEN
+DEFAULT_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, key)} {value:g}"
+            for key, value in items
+        ]
+
+class Histogram(_Metric):
+    """
+    Cumulative-bucket histogram; observe() is a bisect plus three additions, all
+    under a lock.
+    """
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self, **labels: Any) -> Dict[str, Any]:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            if series is None:
+                return {"count": 0, "sum": 0.0, "buckets": {}}
+            counts, total, count = list(series[0]), series[1], series[2]
+        return {
+            "count": count,
+            "sum": total,
+            "buckets": dict(zip(self.buckets + (float("inf"),), counts))
+        }
+
+    def quantile(self, q: float, **labels: Any) -> float | None:
+        """
+        Upper bucket bound containing the q-quantile (what Prometheus would estimate).
+        """
+        snap = self.snapshot(**labels)
+        if not snap["count"]:
+            return None
+        target, seen = q * snap["count"], 0
+        for bound, count in snap["buckets"].items():
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(
+                (key, (list(s[0]), s[1], s[2])) for key, s in self._series.items()
+            )
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_labels = _labels(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total:g}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+# (name, help, {labels}, value) as yielded by gauge collectors
+GaugeSample = Tuple[str, str, Dict[str, Any], float]
+
+class MetricsRegistry:
+    """
+    Process-wide metrics plus gauge collectors (callables returning
+    [(name, help, {labels}, value)]) sampled at scrape time, e.g. pool usage.
+    """
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[GaugeSample]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[GaugeSample]]) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        gauges: Dict[str, Tuple[str, List[str]]] = {}
+        for collector in collectors:
+            try:
+                samples = list(collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+                continue
+            for name, help, labels, value in samples:
+                entry = gauges.setdefault(name, (help, []))
+                entry[1].append(
+                    f"{name}{_labels(list(labels), list(labels.values()))} {value:g}"
+                )
+        for name, (help, samples) in gauges.items():
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} gauge", *samples])
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+NODE_DURATION = REGISTRY.histogram(
+    "agent_node_duration_seconds", "Graph node execution time", ["node"]
+)
+NODE_ERRORS = REGISTRY.counter(
+    "agent_node_errors_total", "Graph node executions that raised", ["node"]
+)
+LLM_DURATION = REGISTRY.histogram(
+    "agent_llm_duration_seconds", "LLM call latency (until the last token)", ["model"]
+)
+LLM_CALLS = REGISTRY.counter(
+    "agent_llm_calls_total", "LLM calls by outcome", ["model", "status"]
+)
+LLM_TOKENS = REGISTRY.counter(
+    "agent_llm_tokens_total", "LLM tokens by direction", ["model", "kind"]
+)
+LLM_COST = REGISTRY.counter(
+    "agent_llm_cost_usd_total", "Estimated LLM spend in USD", ["model"]
+)
+RETRIEVAL_DURATION = REGISTRY.histogram(
+    "agent_retrieval_duration_seconds", "Retrieval time per stage", ["stage"]
+)
+RETRIEVAL_RESULTS = REGISTRY.histogram(
+    "agent_retrieval_results", "Fused hits returned per query", buckets=COUNT_BUCKETS
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "agent_cache_requests_total",
+    "Cache lookups by cache and result",
+    ["cache", "result"]
+)
+TURN_DURATION = REGISTRY.histogram(
+    "agent_turn_duration_seconds", "End-to-end turn time", ["path"]
+)
+TURN_ITERATIONS = REGISTRY.histogram(
+    "agent_turn_iterations", "Research iterations per turn", buckets=COUNT_BUCKETS
+)
+TURN_COST = REGISTRY.histogram(
+    "agent_turn_cost_usd",
+    "Estimated LLM spend per turn",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+FALLBACKS = REGISTRY.counter("agent_fallbacks_total", "Degraded-mode events", ["kind"])
+REJECTIONS = REGISTRY.counter(
+    "agent_rejections_total",
+    "Turns refused by rate limiting or admission control",
+    ["reason"]
+)
+SPECULATIVE_DRAFTS = REGISTRY.counter(
+    "agent_speculative_drafts_total",
+    "Responder drafts started alongside the critic, by outcome",
+    ["outcome"]
+)
+SPECULATIVE_WASTE_TOKENS = REGISTRY.counter(
+    "agent_speculative_wasted_tokens_total",
+    "Estimated tokens spent on discarded drafts",
+    ["kind"]
+)
+SPECULATIVE_WASTE_COST = REGISTRY.counter(
+    "agent_speculative_wasted_cost_usd_total",
+    "Estimated spend on discarded drafts in USD"
+)
+SPECULATIVE_SAVED = REGISTRY.histogram(
+    "agent_speculative_saved_seconds",
+    "Critic latency taken off the critical path by committed drafts"
+)
+
+# --- Per-turn usage (tokens/cost of the current turn, for session accounting) ---
+
+_turn_usage: contextvars.ContextVar[Dict[str, float] | None] = contextvars.ContextVar(
+    "turn_usage", default=None
+)
+
+@contextmanager
+def track_turn_usage() -> Iterator[Dict[str, float]]:
+    """
+    Collects token/cost totals of LLM calls made inside the block (same async context).
+    """
+    usage = {
+        "prompt_tokens": 0.0,
+        "completion_tokens": 0.0,
+        "cost_usd": 0.0,
+        "llm_calls": 0.0
+    }
+    token = _turn_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        try:
+            _turn_usage.reset(token)
+        except ValueError:
+            # An async generator finalized from another context; nothing left to restore
+            pass
+
+def estimate_cost(
+    model: str,
+    prompt_tokens: float,
+    completion_tokens: float,
+    prices: Dict[str, Sequence[float]] | None = None
+) -> float:
+    table = {**DEFAULT_PRICES, **(prices or {})}
+    # Dated snapshots ("gpt-4o-2024-08-06") price like their family
+    price = table.get(model) or next(
+        (
+            p
+            for name, p in sorted(table.items(), key=lambda kv: -len(kv[0]))
+            if model.startswith(name)
+        ),
+        None
+    )
+    if price is None:
+        return 0.0
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+def record_usage(
+    model: str,
+    prompt_tokens: float,
+    completion_tokens: float,
+    prices: Dict[str, Sequence[float]] | None = None
+) -> None:
+    cost = estimate_cost(model, prompt_tokens, completion_tokens, prices)
+    LLM_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model, kind="completion")
+    LLM_COST.inc(cost, model=model)
+    usage = _turn_usage.get()
+    if usage is not None:
+        usage["prompt_tokens"] += prompt_tokens
+        usage["completion_tokens"] += completion_tokens
+        usage["cost_usd"] += cost
+        usage["llm_calls"] += 1
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback recording latency, outcome, token usage and cost per LLM call.
+    Attached to every client handed out by the LLM registry.
+    """
+    def __init__(self, model: str, prices: Dict[str, Sequence[float]] | None = None):
+        self.model = model
+        self.prices = prices
+        self._starts: Dict[UUID, float] = {}
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        *,
+        run_id: UUID,
+        **kwargs: Any
+    ) -> None:
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_start(
+        self,
+        serialized: Dict[str, Any],
+        prompts: List[str],
+        *,
+        run_id: UUID,
+        **kwargs: Any
+    ) -> None:
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            LLM_DURATION.observe(time.perf_counter() - start, model=self.model)
+        LLM_CALLS.inc(model=self.model, status="ok")
+        prompt_tokens, completion_tokens = self._usage(response)
+        record_usage(self.model, prompt_tokens, completion_tokens, self.prices)
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._starts.pop(run_id, None)
+        LLM_CALLS.inc(model=self.model, status="error")
+
+    @staticmethod
+    def _usage(response: LLMResult) -> Tuple[float, float]:
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(
+                    getattr(generation, "message", None), "usage_metadata", None
+                )
+                if usage:
+                    return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = token_usage.get("prompt_tokens", 0)
+        return prompt_tokens, token_usage.get("completion_tokens", 0)
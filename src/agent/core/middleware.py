@@ -1,11 +1,14 @@
 import logging
 import time
 import json
-import re
 from datetime import datetime
-from typing import Dict, Any, Callable, Awaitable, List
+from typing import Dict, Any, Callable, Awaitable
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 from agent.core.state import AgentState
+from agent.core.metrics import NODE_DURATION, NODE_ERRORS
+from agent.core.tracing import current_span, current_trace, span
+from agent.core.scheduler import call_context
+from agent.core.redaction import StreamingRedactor, default_redactor
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -19,20 +22,32 @@ class ObservabilityMiddleware:
     @staticmethod
     def log_node_execution(node_name: str):
         """
-        Decorator for nodes to log their execution and timing.
+        Decorator for nodes to log their execution, record its duration
+        (monotonic clock) in the agent_node_duration_seconds histogram and trace
+        it as a `node.<name>` span of the current request. LLM calls made by the node
+        are scheduled with the node's priority.
         """
         def decorator(func: Callable[[AgentState], Awaitable[Dict[str, Any]]]):
             async def wrapper(state: AgentState) -> Dict[str, Any]:
-                start_time = time.time()
+                start_time = time.perf_counter()
                 logger.info(f"[NODE START] {node_name} - Thread: {state.get('thread_id', 'unknown')}")
                 
                 try:
-                    result = await func(state)
-                    duration = time.time() - start_time
+                    with (
+                        span(f"node.{node_name}", iteration=state.get("iterations", 0)),
+                        call_context(node=node_name)
+                    ):
+                        result = await func(state)
+                    duration = time.perf_counter() - start_time
+                    NODE_DURATION.observe(duration, node=node_name)
                     logger.info(f"[NODE END] {node_name} completed in {duration:.2f}s")
                     
                     return result
                 except Exception as e:
+                    NODE_DURATION.observe(
+                        time.perf_counter() - start_time, node=node_name
+                    )
+                    NODE_ERRORS.inc(node=node_name)
                     logger.error(f"[NODE ERROR] {node_name} failed: {str(e)}")
                     raise e
             return wrapper
@@ -41,44 +56,37 @@ class ObservabilityMiddleware:
     @staticmethod
     def log_event(event_type: str, details: Dict[str, Any]):
         """
-        Logs a generic event for analytics.
+        Logs a generic event for analytics. Inside a traced request the entry carries
+        the trace_id and is also recorded as an event on the current span.
         """
         log_entry = {
             "timestamp": datetime.utcnow().isoformat(),
             "event": event_type,
             "details": details
         }
+        trace = current_trace()
+        if trace is not None:
+            log_entry["trace_id"] = trace.trace_id
+            current_span().add_event(event_type, details)
         logger.info(f"[EVENT] {json.dumps(log_entry)}")
 
 class GuardrailMiddleware:
     """
     Handles security, privacy (PII), and usage limits.
     """
-    PII_PATTERNS = {
-        "email": r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+",
-        "phone": r"\+?\d{10,15}",
-        "credit_card": r"\b(?:\d[ -]*?){13,16}\b"
-    }
-
     @staticmethod
     def redact_pii(text: str) -> str:
         """
-        Redacts PII from the given text.
+        Redacts PII from the given text (single linear scan, see PIIRedactor).
         """
-        redacted_text = text
-        for pii_type, pattern in GuardrailMiddleware.PII_PATTERNS.items():
-            redacted_text = re.sub(pattern, f"[REDACTED_{pii_type.upper()}]", redacted_text)
-        return redacted_text
+        return default_redactor.redact(text)
 
     @staticmethod
-    def check_rate_limit(thread_id: str, history: List[Any], limit: int = 20) -> bool:
+    def stream_redactor() -> StreamingRedactor:
         """
-        Simple rate limit check based on history size.
+        Returns a redactor for incrementally generated text (see StreamingRedactor).
         """
-        if len(history) > limit:
-            logger.warning(f"[GUARDRAIL] Rate limit exceeded for thread: {thread_id}")
-            return False
-        return True
+        return default_redactor.stream()
 
     @staticmethod
     def apply_input_guardrails(query: str) -> str:
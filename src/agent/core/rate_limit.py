@@ -0,0 +1,416 @@
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, Iterator, List, Tuple
+from agent.core.config import get_settings
+from agent.core.metrics import FALLBACKS, REGISTRY, GaugeSample
+
+if TYPE_CHECKING:
+    from psycopg_pool import AsyncConnectionPool
+
+logger = logging.getLogger(__name__)
+
+class AdmissionRejected(Exception):
+    """
+    A turn was refused before doing any work. `message` is safe to show to the user.
+    """
+    reason = "rejected"
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+class RateLimitExceeded(AdmissionRejected):
+    def __init__(self, scope: str, kind: str, retry_after: float):
+        self.reason = f"{scope}_{kind}"
+        if kind == "requests":
+            problem = "You are sending messages too quickly."
+        else:
+            subject = "conversation" if scope == "session" else "client"
+            problem = f"This {subject} has reached its usage limit."
+        super().__init__(
+            f"{problem} Please try again in {max(1, math.ceil(retry_after))} seconds.",
+            retry_after
+        )
+
+class Overloaded(AdmissionRejected):
+    reason = "overloaded"
+
+    def __init__(self, retry_after: float):
+        super().__init__(
+            "The assistant is busy with other conversations. Please try again in "
+            f"{max(1, math.ceil(retry_after))} seconds.",
+            retry_after
+        )
+
+# --- Token bucket stores ---
+#
+# Every store implements one atomic primitive, take(): refill the bucket for the time
+# elapsed, then, if at least `require` tokens are available, subtract `cost`.
+#   request admission:  require=1, cost=1
+#   LLM token budget:   require=1, cost=0 before the turn (the bucket is not in debt),
+#                       require=-inf, cost=<tokens used> after it (may go negative)
+
+@dataclass(frozen=True)
+class TakeResult:
+    granted: bool
+    tokens: float       # tokens left after the call
+    retry_after: float  # seconds until `require` tokens are available (0 when granted)
+
+def _retry_after(available: float, require: float, rate: float) -> float:
+    return max(0.0, (require - available) / rate) if rate > 0 else math.inf
+
+class MemoryBucketStore:
+    """
+    In-process buckets (single replica). Least recently used buckets beyond
+    `max_keys` are dropped, which at worst refills them early.
+    """
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, Tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(
+        self, key: str, cost: float, require: float, capacity: float, rate: float
+    ) -> TakeResult:
+        return self.take_sync(key, cost, require, capacity, rate)
+
+    def take_sync(
+        self, key: str, cost: float, require: float, capacity: float, rate: float
+    ) -> TakeResult:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            available = min(capacity, tokens + (now - updated) * rate)
+            granted = available >= require
+            left = available - cost if granted else available
+            self._buckets[key] = (left, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return TakeResult(
+            granted, left, 0.0 if granted else _retry_after(available, require, rate)
+        )
+
+class SQLiteBucketStore:
+    """
+    Buckets shared by the worker processes/replicas on one host or volume: a SQLite
+    file (WAL) updated inside BEGIN IMMEDIATE, so concurrent takes serialize.
+    """
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=5.0
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits "
+            "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    async def take(
+        self, key: str, cost: float, require: float, capacity: float, rate: float
+    ) -> TakeResult:
+        return await asyncio.to_thread(
+            self.take_sync, key, cost, require, capacity, rate
+        )
+
+    def take_sync(
+        self, key: str, cost: float, require: float, capacity: float, rate: float
+    ) -> TakeResult:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute(
+                    "SELECT tokens, updated_at FROM rate_limits WHERE key = ?", (key,)
+                ).fetchone()
+                tokens, updated = row if row else (capacity, now)
+                available = min(capacity, tokens + max(0.0, now - updated) * rate)
+                granted = available >= require
+                left = available - cost if granted else available
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO rate_limits(key, tokens, updated_at) "
+                    "VALUES (?, ?, ?)",
+                    (key, left, now)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return TakeResult(
+            granted, left, 0.0 if granted else _retry_after(available, require, rate)
+        )
+
+# Refilled balance of an existing row, on the database clock so replicas agree
+_PG_AVAILABLE = (
+    "LEAST(%(capacity)s, "
+    "b.tokens + %(rate)s * EXTRACT(EPOCH FROM now() - b.updated_at)::float8)"
+)
+
+class PostgresBucketStore:
+    """
+    Buckets shared by every replica, stored in Postgres. A take is a single UPSERT
+    (one round trip, row-locked), issued on the agent's shared connection pool.
+    """
+    SETUP_SQL = (
+        "CREATE TABLE IF NOT EXISTS agent_rate_limits ("
+        "key TEXT PRIMARY KEY, tokens DOUBLE PRECISION NOT NULL, "
+        "updated_at TIMESTAMPTZ NOT NULL, granted BOOLEAN NOT NULL)"
+    )
+    TAKE_SQL = (
+        "INSERT INTO agent_rate_limits AS b (key, tokens, updated_at, granted) "
+        "VALUES (%(key)s, "
+        "CASE WHEN %(capacity)s >= %(require)s "
+        "THEN %(capacity)s - %(cost)s ELSE %(capacity)s END, "
+        "now(), %(capacity)s >= %(require)s) "
+        "ON CONFLICT (key) DO UPDATE SET "
+        f"tokens = CASE WHEN {_PG_AVAILABLE} >= %(require)s "
+        f"THEN {_PG_AVAILABLE} - %(cost)s ELSE {_PG_AVAILABLE} END, "
+        f"granted = {_PG_AVAILABLE} >= %(require)s, "
+        "updated_at = now() "
+        "RETURNING tokens, granted"
+    )
+
+    def __init__(self, pool: "AsyncConnectionPool"):
+        self.pool = pool
+
+    async def setup(self) -> None:
+        async with self.pool.connection() as conn:
+            await conn.execute(self.SETUP_SQL)
+
+    async def take(
+        self, key: str, cost: float, require: float, capacity: float, rate: float
+    ) -> TakeResult:
+        params = {
+            "key": key,
+            "cost": float(cost),
+            "require": float(require),
+            "capacity": float(capacity),
+            "rate": float(rate)
+        }
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(self.TAKE_SQL, params)
+            row = await cursor.fetchone()
+        tokens, granted = (
+            (row["tokens"], row["granted"]) if isinstance(row, dict) else row
+        )
+        # When refused the balance is unchanged, so it is the refilled amount
+        return TakeResult(
+            granted, tokens, 0.0 if granted else _retry_after(tokens, require, rate)
+        )
+
+# --- Rate limiter ---
+
+BucketStore = MemoryBucketStore | SQLiteBucketStore | PostgresBucketStore
+
+@dataclass(frozen=True)
+class BucketLimit:
+    scope: str         # "session" | "client"
+    kind: str          # "requests" | "tokens"
+    per_minute: float  # refill rate; the bucket holds one minute of budget
+
+    @property
+    def capacity(self) -> float:
+        return self.per_minute
+
+    @property
+    def rate(self) -> float:
+        return self.per_minute / 60.0
+
+class RateLimiter:
+    """
+    Per-session (thread_id) and per-client token buckets for requests and LLM tokens.
+
+    Requests are charged up front. LLM tokens are only known after the turn, so they
+    are charged afterwards and may push the bucket into debt; a turn is admitted only
+    while its token buckets are not in debt. With the Postgres backend, takes fall
+    back to the in-process store while the database is unavailable.
+    """
+    def __init__(
+        self, limits: Iterable[BucketLimit], store: BucketStore | None = None
+    ):
+        self.limits = [limit for limit in limits if limit.per_minute > 0]
+        self.memory = MemoryBucketStore()
+        self.store: BucketStore = store or self.memory
+
+    async def attach_postgres(self, pool: "AsyncConnectionPool") -> None:
+        store = PostgresBucketStore(pool)
+        try:
+            await store.setup()
+        except Exception as e:
+            logger.warning(
+                f"Postgres rate-limit store unavailable ({e}); using in-process buckets"
+            )
+            return
+        self.store = store
+
+    def detach_postgres(self) -> None:
+        if isinstance(self.store, PostgresBucketStore):
+            self.store = self.memory
+
+    async def _take(
+        self, key: str, cost: float, require: float, limit: BucketLimit
+    ) -> TakeResult:
+        try:
+            return await self.store.take(key, cost, require, limit.capacity, limit.rate)
+        except Exception as e:
+            if self.store is self.memory:
+                raise
+            # Fail over rather than fail closed: a database hiccup must not
+            # reject every turn
+            FALLBACKS.inc(kind="rate_limit_memory")
+            logger.warning(f"Rate-limit store failed ({e}); using in-process buckets")
+            return self.memory.take_sync(key, cost, require, limit.capacity, limit.rate)
+
+    def _keyed(
+        self, thread_id: str | None, client_id: str | None
+    ) -> Iterator[Tuple[BucketLimit, str]]:
+        """
+        (limit, bucket key) pairs; a scope without an identifier is not limited.
+        """
+        for limit in self.limits:
+            subject = thread_id if limit.scope == "session" else client_id
+            if subject is not None:
+                yield limit, f"{limit.scope}:{subject}:{limit.kind}"
+
+    async def check(self, thread_id: str | None, client_id: str | None) -> None:
+        """
+        Charges one request and verifies token budgets. Raises RateLimitExceeded.
+        """
+        for limit, key in self._keyed(thread_id, client_id):
+            if limit.kind == "requests":
+                result = await self._take(key, 1, 1, limit)
+            else:
+                result = await self._take(key, 0, 1, limit)
+            if not result.granted:
+                raise RateLimitExceeded(limit.scope, limit.kind, result.retry_after)
+
+    async def record_tokens(
+        self, thread_id: str | None, client_id: str | None, tokens: float
+    ) -> None:
+        """
+        Charges the LLM tokens a finished turn used.
+        """
+        if tokens <= 0:
+            return
+        for limit, key in self._keyed(thread_id, client_id):
+            if limit.kind == "tokens":
+                await self._take(key, tokens, -math.inf, limit)
+
+# --- Admission control ---
+
+class AdmissionController:
+    """
+    Caps concurrently running turns in this process. Beyond `max_in_flight`, turns
+    wait in a FIFO queue for up to `queue_timeout` seconds; when `max_queue` turns are
+    already waiting, new ones are shed immediately.
+    """
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._in_flight = 0
+        self._waiters: deque = deque()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for w in self._waiters if not w.done())
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self) -> None:
+        """
+        Takes a slot, waiting in line if needed. Raises Overloaded when shed.
+        """
+        if self.max_in_flight <= 0 or (
+            self._in_flight < self.max_in_flight and not self.queued
+        ):
+            self._in_flight += 1
+            return
+        if self.queued >= self.max_queue:
+            raise Overloaded(retry_after=self.queue_timeout or 1.0)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled: pass it on
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        if not waiter.done():
+            waiter.cancel()
+            raise Overloaded(retry_after=self.queue_timeout or 1.0)
+        # A releasing turn handed its slot over (in_flight unchanged)
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    def collect_metrics(self) -> List[GaugeSample]:
+        return [
+            ("agent_turns_in_flight", "Turns currently running", {}, self._in_flight),
+            ("agent_turns_queued", "Turns waiting for admission", {}, self.queued),
+        ]
+
+@lru_cache
+def get_rate_limiter() -> RateLimiter:
+    """
+    Returns the process-wide rate limiter configured by the RATE_LIMIT_* settings.
+    """
+    settings = get_settings()
+    limits = [
+        BucketLimit("session", "requests", settings.RATE_LIMIT_SESSION_RPM),
+        BucketLimit("session", "tokens", settings.RATE_LIMIT_SESSION_TPM),
+        BucketLimit("client", "requests", settings.RATE_LIMIT_CLIENT_RPM),
+        BucketLimit("client", "tokens", settings.RATE_LIMIT_CLIENT_TPM),
+    ]
+    store = None
+    if settings.RATE_LIMIT_BACKEND == "sqlite":
+        store = SQLiteBucketStore(settings.rate_limit_sqlite_path)
+    elif settings.RATE_LIMIT_BACKEND not in ("memory", "postgres"):
+        logger.warning(
+            f"Unknown RATE_LIMIT_BACKEND {settings.RATE_LIMIT_BACKEND!r}; "
+            "using in-process buckets"
+        )
+    # "postgres" starts in-process and switches once the agent's pool is attached
+    return RateLimiter(limits, store)
+
+@lru_cache
+def get_admission_controller() -> AdmissionController:
+    settings = get_settings()
+    controller = AdmissionController(
+        max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+        max_queue=settings.ADMISSION_MAX_QUEUE,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT
+    )
+    REGISTRY.add_collector(controller.collect_metrics)
+    return controller
@@ -0,0 +1,200 @@
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+
+# Emails are located from their "@" (str.find, C speed) and expanded in both directions:
+# at most LOCAL_PART_MAX characters to the left, one anchored match to the right.
+_EMAIL_DOMAIN = re.compile(r"[A-Za-z0-9\-]+(?:\.[A-Za-z0-9\-]+)+")
+_LOCAL_PART_CHARS = frozenset(
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.+-"
+)
+LOCAL_PART_MAX = 64
+# Numeric runs worth classifying: digit groups joined by single spaces/hyphens, starting
+# at a group of 4+ digits (every card and phone contains one). The leading character
+# class lets the regex engine skip everything else without entering the pattern.
+_NUMBER = re.compile(r"[0-9]{4,}(?:[ \-][0-9]+)*")
+_DIGIT_GROUP = re.compile(r"[0-9]+")
+
+CARD_DIGITS = (13, 19)
+PHONE_DIGITS = (10, 15)
+
+# A stream can be cut right after a character no match can contain, or after a space
+# that cannot join two digit groups. Searched on the reversed tail, where the first
+# match is the last cut point: in reverse, "preceded by a digit" reads as a lookahead.
+_REVERSED_CUT = re.compile(r"[^A-Za-z0-9_.+\-@ ]| (?![0-9])|(?<=[^0-9]) ")
+
+@dataclass(frozen=True)
+class PIIMatch:
+    kind: str   # "email" | "credit_card" | "phone" | "number"
+    start: int
+    end: int
+
+class PIIRedactor:
+    """
+    Single-pass PII detector/redactor for emails, payment card numbers and phone
+    numbers.
+
+    Emails are found from their "@" and numeric runs with one regex whose matches can
+    only start at a run of four digits, so the text is scanned once, in linear time,
+    mostly inside the regex engine. Numeric runs are then classified: 13-19 digits,
+    contiguous or in card-style groups, that pass the Luhn check are cards (so price
+    tables and ID lists are left alone); standalone groups of 10-15 digits (optionally
+    "+"-prefixed) are phones, and longer unbroken runs that are not cards are masked
+    as numbers.
+    """
+    def scan(self, text: str) -> List[PIIMatch]:
+        emails = self._emails(text)
+        matches: List[PIIMatch] = []
+        e = 0
+        for m in _NUMBER.finditer(text):
+            for match in self._classify_number(text, m.start(), m.end()):
+                # Digits inside an email ("600123456@x.com") belong to the email
+                while e < len(emails) and emails[e].end <= match.start:
+                    matches.append(emails[e])
+                    e += 1
+                if e < len(emails) and emails[e].start < match.end:
+                    continue
+                matches.append(match)
+        matches.extend(emails[e:])
+        return matches
+
+    @staticmethod
+    def _emails(text: str) -> List[PIIMatch]:
+        found: List[PIIMatch] = []
+        at = text.find("@")
+        while at != -1:
+            domain = _EMAIL_DOMAIN.match(text, at + 1)
+            start, floor = at, max(at - LOCAL_PART_MAX, found[-1].end if found else 0)
+            while start > floor and text[start - 1] in _LOCAL_PART_CHARS:
+                start -= 1
+            if domain is not None and start < at:
+                found.append(PIIMatch("email", start, domain.end()))
+                at = text.find("@", domain.end())
+            else:
+                at = text.find("@", at + 1)
+        return found
+
+    def redact(self, text: str) -> str:
+        matches = self.scan(text)
+        if not matches:
+            return text
+        parts, last = [], 0
+        for match in matches:
+            parts.append(text[last:match.start])
+            parts.append(f"[REDACTED_{match.kind.upper()}]")
+            last = match.end
+        parts.append(text[last:])
+        return "".join(parts)
+
+    def stream(self) -> "StreamingRedactor":
+        return StreamingRedactor(self)
+
+    @staticmethod
+    def _classify_number(text: str, start: int, end: int) -> List[PIIMatch]:
+        if end - start < PHONE_DIGITS[0]:
+            # Prices, years, short codes: too few digits for either kind
+            return []
+        groups: List[Tuple[int, int]] = [
+            (g.start(), g.end()) for g in _DIGIT_GROUP.finditer(text, start, end)
+        ]
+        plus = start > 0 and text[start - 1] == "+"
+        found: List[PIIMatch] = []
+        i = 0
+        while i < len(groups):
+            # Longest Luhn-valid card starting at this group
+            # (at most 19 digits, so O(1) per group)
+            card_end, j = None, i
+            length = 0
+            sums = [0, 0]  # Luhn sums for an even / odd total length, updated per digit
+            while (
+                j < len(groups)
+                and length + groups[j][1] - groups[j][0] <= CARD_DIGITS[1]
+            ):
+                if j > i and not _card_grouping(groups[i], groups[j]):
+                    break
+                for ch in text[groups[j][0]:groups[j][1]]:
+                    d = ord(ch) - 48
+                    doubled = d * 2 - 9 if d > 4 else d * 2
+                    # Counted from the left, digit k is doubled iff k and the total
+                    # length differ in parity
+                    sums[0] += doubled if length % 2 == 0 else d
+                    sums[1] += d if length % 2 == 0 else doubled
+                    length += 1
+                if length >= CARD_DIGITS[0] and sums[length % 2] % 10 == 0:
+                    card_end = j
+                j += 1
+            if card_end is not None:
+                found.append(PIIMatch("credit_card", groups[i][0], groups[card_end][1]))
+                i = card_end + 1
+                continue
+            g_start, g_end = groups[i]
+            if PHONE_DIGITS[0] <= g_end - g_start <= PHONE_DIGITS[1]:
+                found.append(
+                    PIIMatch(
+                        "phone", g_start - 1 if (i == 0 and plus) else g_start, g_end
+                    )
+                )
+            elif g_end - g_start > PHONE_DIGITS[1]:
+                # Too long for a phone, not a valid card: still an account-like number
+                found.append(PIIMatch("number", g_start, g_end))
+            i += 1
+        return found
+
+def _card_grouping(first: Tuple[int, int], group: Tuple[int, int]) -> bool:
+    """
+    Printed card numbers are grouped 4-4-4-4(-3), 4-6-5 or 4-6-4: a spaced candidate
+    must open with four digits and continue in groups of three to six.
+    """
+    return first[1] - first[0] == 4 and 3 <= group[1] - group[0] <= 6
+
+class StreamingRedactor:
+    """
+    Redacts PII from a token stream incrementally.
+
+    Text is released up to the last position no match can span: right after a character
+    that cannot occur in any match, or after a space that does not sit between two
+    digits (numbers may contain single spaces). Only the unfinished trailing token is
+    held back, so output lags the model by about one word. A token longer than
+    MAX_HOLDBACK is released anyway.
+    """
+    MAX_HOLDBACK = 256
+
+    def __init__(self, redactor: PIIRedactor | None = None):
+        self.redactor = redactor or default_redactor
+        self._buffer = ""  # held-back tail: known to hold no safe cut
+
+    def feed(self, text: str) -> str:
+        buf = self._buffer + text
+        n = len(buf)
+        cut = self._safe_cut(buf, n - len(text))
+        released, self._buffer = buf[:cut], buf[cut:]
+        if not released:
+            return ""
+        # Cuts never split a match, so a chunk without "@" or a 4-digit run is clean
+        if "@" not in released and _NUMBER.search(released) is None:
+            return released
+        return self.redactor.redact(released)
+
+    def flush(self) -> str:
+        released, self._buffer = self._buffer, ""
+        return self.redactor.redact(released)
+
+    def _safe_cut(self, buf: str, checked: int) -> int:
+        """
+        Last safe cut in `buf`, whose first `checked` chars already held none.
+        """
+        n = len(buf)
+        floor = n - self.MAX_HOLDBACK if n > self.MAX_HOLDBACK else 0
+        # Only new text needs checking, plus the previous last char
+        # (its successor was unknown)
+        low = checked - 1 if checked - 1 > floor else floor
+        # One extra char of context on the left: whether a space follows a digit
+        m = _REVERSED_CUT.search(buf[low - 1 if low else 0:][::-1])
+        if m is None or m.start() >= n - low:
+            return floor
+        return n - m.start()
+
+default_redactor = PIIRedactor()
+
+def redact_pii(text: str) -> str:
+    return default_redactor.redact(text)
@@ -0,0 +1,71 @@
+import logging
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    """
+    Minimal circuit breaker for an unreliable dependency (e.g. the Postgres
+    checkpointer).
+
+    CLOSED    -> calls go through; consecutive failures are counted.
+    OPEN      -> calls are short-circuited until `reset_timeout` seconds have passed.
+    HALF_OPEN -> a single trial call is allowed; success closes, failure re-opens.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def state(self) -> str:
+        if (
+            self._state == self.OPEN
+            and self._clock() - self._opened_at >= self.reset_timeout
+        ):
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def allow_request(self) -> bool:
+        """
+        Returns True if the protected dependency may be called right now.
+        """
+        state = self.state
+        if state == self.HALF_OPEN:
+            # Only one trial call at a time: re-open until the trial reports back.
+            self._state = self.OPEN
+            self._opened_at = self._clock()
+            return True
+        return state == self.CLOSED
+
+    def record_success(self) -> None:
+        if self._state != self.CLOSED:
+            logger.info(f"[BREAKER] {self.name} closed")
+        self._state = self.CLOSED
+        self._failures = 0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._failures >= self.failure_threshold or self._state != self.CLOSED:
+            if self._state != self.OPEN:
+                logger.warning(
+                    f"[BREAKER] {self.name} opened after {self._failures} failure(s); "
+                    f"retrying in {self.reset_timeout:.0f}s"
+                )
+            self._state = self.OPEN
+            self._opened_at = self._clock()
@@ -1,87 +1,371 @@
+import asyncio
 import logging
-from typing import List
+import time
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Dict, Iterator, List, Tuple
+import numpy as np
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.retrievers import BM25Retriever
-from langchain_classic.retrievers import EnsembleRetriever
 from langchain_core.documents import Document
+from agent.core.cache import SQLiteCache, TTLCache, TieredCache
 from agent.core.config import get_settings
+from agent.core.conversion import EXPORT_DOC_CHUNKS, get_conversion_service
+from agent.core.embeddings import get_embeddings
+from agent.core.fusion import FusionEngine, ScoredHit
+from agent.core.metrics import CACHE_REQUESTS, RETRIEVAL_DURATION, RETRIEVAL_RESULTS
+from agent.core.sparse_index import SparseIndex, ensure_synced
+from agent.core.index_sync import prepare_chunks, sync_source
+from agent.core.tracing import span
+from agent.core.text_analysis import normalize_query
 
 logger = logging.getLogger(__name__)
 
+# ([(chunk ids, similarities)] per query, {chunk id: Document})
+_DenseResults = Tuple[List[Tuple[List[str], np.ndarray]], Dict[str, Document]]
+
+@contextmanager
+def _stage(name: str) -> Iterator[None]:
+    """
+    Times a retrieval stage in the stage histogram and as a span of the current trace.
+    """
+    with span(f"retrieval.{name}"), RETRIEVAL_DURATION.time(stage=name):
+        yield
+
 class RAGRetriever:
     """
-    Handles hybrid retrieval using ChromaDB (semantic) and BM25 (keyword).
+    Handles hybrid retrieval using ChromaDB (semantic) and BM25 (keyword),
+    fused into scored hits by the FusionEngine.
     """
     def __init__(self):
         self.settings = get_settings()
-        self.embeddings = OpenAIEmbeddings(
-            model=self.settings.EMBEDDING_MODEL,
-            openai_api_key=self.settings.OPENAI_API_KEY
-        )
+        self.embeddings = get_embeddings()
         self.vector_store = Chroma(
             collection_name=self.settings.COLLECTION_NAME,
             embedding_function=self.embeddings,
             persist_directory=self.settings.CHROMA_PATH
         )
-        self.ensemble_retriever = self._build_ensemble_retriever()
+        self.sparse_index = ensure_synced(
+            SparseIndex(self.settings.bm25_index_path), self.vector_store
+        )
+        self.fusion = FusionEngine(
+            weights=(
+                self.settings.RETRIEVAL_DENSE_WEIGHT,
+                self.settings.RETRIEVAL_SPARSE_WEIGHT
+            ),
+            k=self.settings.RETRIEVAL_K,
+            min_score=self.settings.RETRIEVAL_MIN_SCORE
+        )
+        self.candidates_k = self.settings.RETRIEVAL_CANDIDATES_K
+        self._distance_space = (self.vector_store._collection.metadata or {}).get(
+            "hnsw:space", "l2"
+        )
+        if not self.sparse_index.num_docs:
+            logger.warning("No documents found in ChromaDB. Ingestion required.")
+        self.cache = self._build_cache()
+        self._cached_version = self.index_version
+        # Chunk IDs are content hashes, so a cached chunk can never go stale
+        self.chunks = TTLCache(
+            self.settings.CHUNK_CACHE_MAX_ENTRIES, ttl_seconds=float("inf")
+        )
 
-    async def ingest_url(self, url: str):
+    async def ingest_url(self, url: str) -> Dict[str, int]:
         """
-        Scrapes a URL using Docling and adds it to ChromaDB.
+        Scrapes a URL using Docling and syncs its chunks into ChromaDB.
         """
-        from langchain_docling import DoclingLoader
-        from langchain_text_splitters import RecursiveCharacterTextSplitter
-        
         logger.info(f"Ingesting URL using Docling: {url}")
-        loader = DoclingLoader(file_path=[url])
-        docs = loader.load()
-        
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        splits = text_splitter.split_documents(docs)
-        
-        # Docling provides complex metadata that ChromaDB doesn't support.
-        # We filter out nested dictionaries to prevent errors.
-        from langchain_community.vectorstores.utils import filter_complex_metadata
-        safe_splits = filter_complex_metadata(splits)
-        
-        # Add to vector store
-        self.vector_store.add_documents(safe_splits)
+        with span("docling.convert", url=url):
+            docs = await get_conversion_service().aconvert(url, EXPORT_DOC_CHUNKS)
+        if not docs:
+            # Same rule as WebsiteIndexer: an empty load is more likely a fetch error
+            logger.warning(f"No documents loaded from {url}")
+            return {"added": 0, "deleted": 0, "unchanged": 0}
+
+        # Chunked exactly like ingest_data.py, so the two paths agree on chunk IDs
+        safe_splits = prepare_chunks(docs)
+
+        # Upsert new/changed chunks and drop stale ones (vector store and keyword index)
+        with span("index.sync", url=url, chunks=len(safe_splits)):
+            report = sync_source(self.vector_store, self.sparse_index, url, safe_splits)
         logger.info(f"Successfully ingested {len(safe_splits)} chunks from {url}")
+        return report
 
-    def _build_ensemble_retriever(self):
-        """
-        Builds an EnsembleRetriever combining Chroma and BM25.
-        """
-        # 1. Setup Chroma retriever
-        chroma_retriever = self.vector_store.as_retriever(
-            search_kwargs={"k": 5}
+    def _build_cache(self) -> TieredCache | None:
+        if not self.settings.RETRIEVAL_CACHE_ENABLED:
+            return None
+        shared = None
+        if self.settings.RETRIEVAL_CACHE_SHARED_PATH:
+            shared = SQLiteCache(
+                self.settings.RETRIEVAL_CACHE_SHARED_PATH,
+                ttl_seconds=self.settings.RETRIEVAL_CACHE_TTL_SECONDS
+            )
+        return TieredCache(
+            TTLCache(
+                self.settings.RETRIEVAL_CACHE_MAX_ENTRIES,
+                self.settings.RETRIEVAL_CACHE_TTL_SECONDS
+            ),
+            shared,
+            encode=lambda docs: [
+                {"id": d.id, "page_content": d.page_content, "metadata": d.metadata}
+                for d in docs
+            ],
+            decode=lambda rows: [Document(**row) for row in rows]
         )
 
-        all_docs = self.vector_store.get()
-        if not all_docs or not all_docs['documents']:
-            logger.warning("No documents found in ChromaDB. Ingestion required.")
-            # We return a placeholder or just the chroma_retriever which will return empty
-            return chroma_retriever
+    @property
+    def index_version(self) -> int:
+        """
+        Monotonic index generation; bumped by every ingestion commit (in any process).
+        """
+        self.sparse_index.refresh()
+        return self.sparse_index.generation
 
-        documents = [
-            Document(page_content=content, metadata=meta)
-            for content, meta in zip(all_docs['documents'], all_docs['metadatas'])
-        ]
-        
-        bm25_retriever = BM25Retriever.from_documents(documents)
-        bm25_retriever.k = 5
-
-        # 3. Create Ensemble Retriever
-        ensemble = EnsembleRetriever(
-            retrievers=[chroma_retriever, bm25_retriever],
-            weights=[0.6, 0.4]
-        )
-        return ensemble
+    def _cache_key(self, query: str, k: int = 5) -> str:
+        version = self.index_version
+        if version != self._cached_version:
+            # Index changed: entries of the old version can never be hit again
+            self.cache.clear_local()
+            self._cached_version = version
+        return f"{self.settings.COLLECTION_NAME}:{version}:{k}:{normalize_query(query)}"
 
     def retrieve(self, query: str) -> List[Document]:
         """
         Retrieves relevant documents for a given query.
+        Each document carries its chunk ID and fused `score` in metadata.
         """
+        with span("retrieval.retrieve", queries=1):
+            docs = self._retrieve(query)
+            self._remember([docs])
+            return docs
+
+    def _retrieve(self, query: str) -> List[Document]:
+        start = time.perf_counter()
+        key = self._cache_key(query, self.fusion.k) if self.cache is not None else None
+        cached = self.cache.get(key) if key is not None else None
+        if key is not None:
+            CACHE_REQUESTS.inc(
+                cache="retrieval", result="hit" if cached is not None else "miss"
+            )
+        if cached is not None:
+            logger.info(f"Retrieval cache hit for query: {query}")
+            return list(cached)
+
         logger.info(f"Retrieving for query: {query}")
-        return self.ensemble_retriever.invoke(query)
+        with _stage("embed"):
+            vector = self.embeddings.embed_query(query)
+        hits = self._fuse_and_resolve(
+            self._dense_search_many([vector]),
+            self._sparse_search_many([query])
+        )[0]
+        docs = self._to_documents(hits)
+        if key is not None:
+            self.cache.set(key, docs)
+        RETRIEVAL_DURATION.observe(time.perf_counter() - start, stage="total")
+        return docs
+
+    async def aretrieve_many(
+        self, queries: List[str], k: int | None = None
+    ) -> List[List[Document]]:
+        """
+        Retrieves documents for several queries at once.
+
+        Cache misses are embedded in a single batched request, searched with one
+        multi-vector Chroma query and scored against BM25 in one pass, then fused
+        per query.
+        """
+        with span("retrieval.aretrieve_many", queries=len(queries)) as current:
+            results, misses = await self._aretrieve_many(queries, k)
+            if current is not None:
+                current.set(cache_misses=misses)
+            # Callers keep chunk references and resolve the text through aget_chunks()
+            self._remember(results)
+            return results
+
+    async def _aretrieve_many(
+        self, queries: List[str], k: int | None
+    ) -> Tuple[List[List[Document]], int]:
+        start = time.perf_counter()
+        k = self.fusion.k if k is None else k
+        results: List[List[Document] | None] = [None] * len(queries)
+        keys = (
+            [self._cache_key(q, k) for q in queries]
+            if self.cache is not None
+            else [None] * len(queries)
+        )
+        misses: List[int] = []
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key) if key is not None else None
+            if cached is not None:
+                results[i] = list(cached)
+            else:
+                misses.append(i)
+        if self.cache is not None:
+            CACHE_REQUESTS.inc(
+                len(queries) - len(misses), cache="retrieval", result="hit"
+            )
+            CACHE_REQUESTS.inc(len(misses), cache="retrieval", result="miss")
+        if not misses:
+            return results, 0
+
+        miss_queries = [queries[i] for i in misses]
+        logger.info(f"Retrieving for {len(miss_queries)} queries: {miss_queries}")
+        for i, hits in zip(misses, await self.aretrieve_scored_many(miss_queries, k)):
+            docs = self._to_documents(hits)
+            results[i] = docs
+            if keys[i] is not None:
+                self.cache.set(keys[i], docs)
+        RETRIEVAL_DURATION.observe(time.perf_counter() - start, stage="total")
+        return results, len(misses)
+
+    def _remember(self, results: List[List[Document]]) -> None:
+        for docs in results:
+            for doc in docs:
+                if doc.id is not None:
+                    self.chunks.set(doc.id, doc)
+
+    async def aget_chunks(self, chunk_ids: List[str]) -> Dict[str, Document]:
+        """
+        Resolves chunk IDs to their documents: recently retrieved chunks from memory,
+        the rest with one Chroma read. Chunks deleted since retrieval are left out.
+        """
+        found: Dict[str, Document] = {}
+        missing: List[str] = []
+        for chunk_id in dict.fromkeys(chunk_ids):
+            doc = self.chunks.get(chunk_id)
+            if doc is not None:
+                found[chunk_id] = doc
+            else:
+                missing.append(chunk_id)
+        if missing:
+            with span("retrieval.get_chunks", chunks=len(missing)):
+                stored = await asyncio.to_thread(
+                    self.vector_store.get,
+                    ids=missing,
+                    include=["documents", "metadatas"]
+                )
+            for chunk_id, content, meta in zip(
+                stored["ids"], stored["documents"], stored["metadatas"]
+            ):
+                doc = Document(id=chunk_id, page_content=content, metadata=meta or {})
+                self.chunks.set(chunk_id, doc)
+                found[chunk_id] = doc
+        return found
+
+    async def aretrieve_scored_many(
+        self, queries: List[str], k: int | None = None
+    ) -> List[List[ScoredHit]]:
+        """
+        Uncached batched retrieval returning scored hits (with documents attached).
+        """
+        with _stage("embed"):
+            vectors = await self.embeddings.aembed_documents(queries)
+        dense, sparse = await asyncio.gather(
+            asyncio.to_thread(self._dense_search_many, vectors),
+            asyncio.to_thread(self._sparse_search_many, queries)
+        )
+        return await asyncio.to_thread(self._fuse_and_resolve, dense, sparse, k)
+
+    def _dense_search_many(self, vectors: List[List[float]]) -> _DenseResults:
+        """
+        One multi-vector Chroma query. Returns ([(ids, similarities)] per query,
+        {id: Document}).
+        """
+        if not vectors:
+            return [], {}
+        with _stage("dense"):
+            response = self.vector_store._collection.query(
+                query_embeddings=vectors,
+                n_results=self.candidates_k,
+                include=["documents", "metadatas", "distances"]
+            )
+        ranked, docs = [], {}
+        for ids, contents, metas, distances in zip(
+            response["ids"],
+            response["documents"],
+            response["metadatas"],
+            response["distances"]
+        ):
+            ranked.append(
+                (ids, self._to_similarity(np.asarray(distances, dtype=np.float64)))
+            )
+            for chunk_id, content, meta in zip(ids, contents, metas):
+                docs[chunk_id] = Document(
+                    id=chunk_id, page_content=content, metadata=meta or {}
+                )
+        return ranked, docs
+
+    def _sparse_search_many(self, queries: List[str]) -> List[List[Tuple[str, float]]]:
+        with _stage("sparse"):
+            return self.sparse_index.search_many(queries, self.candidates_k)
+
+    def _to_similarity(self, distances: np.ndarray) -> np.ndarray:
+        if self._distance_space == "cosine":
+            return 1.0 - distances
+        if self._distance_space == "ip":
+            return -distances
+        # Squared L2 between unit vectors (OpenAI embeddings are normalized):
+        # d = 2 - 2cos
+        return 1.0 - distances / 2.0
+
+    def _fuse_and_resolve(
+        self,
+        dense: _DenseResults,
+        sparse: List[List[Tuple[str, float]]],
+        k: int | None = None
+    ) -> List[List[ScoredHit]]:
+        with _stage("fusion"):
+            resolved = self._fuse(dense, sparse, k)
+        for hits in resolved:
+            RETRIEVAL_RESULTS.observe(len(hits))
+        return resolved
+
+    def _fuse(
+        self,
+        dense: _DenseResults,
+        sparse: List[List[Tuple[str, float]]],
+        k: int | None = None
+    ) -> List[List[ScoredHit]]:
+        ranked_dense, docs = dense
+        fused = [
+            self.fusion.fuse(
+                [
+                    dense_hits,
+                    (
+                        [cid for cid, _ in sparse_hits],
+                        [score for _, score in sparse_hits]
+                    )
+                ],
+                k=k
+            )
+            for dense_hits, sparse_hits in zip(ranked_dense, sparse)
+        ]
+        # Keyword-only hits: fetch their text in one Chroma read
+        missing = list(
+            dict.fromkeys(
+                h.chunk_id for hits in fused for h in hits if h.chunk_id not in docs
+            )
+        )
+        if missing:
+            stored = self.vector_store.get(
+                ids=missing, include=["documents", "metadatas"]
+            )
+            for chunk_id, content, meta in zip(
+                stored["ids"], stored["documents"], stored["metadatas"]
+            ):
+                docs[chunk_id] = Document(
+                    id=chunk_id, page_content=content, metadata=meta or {}
+                )
+        return [
+            [replace(h, document=docs[h.chunk_id]) for h in hits if h.chunk_id in docs]
+            for hits in fused
+        ]
+
+    @staticmethod
+    def _to_documents(hits: List[ScoredHit]) -> List[Document]:
+        return [
+            Document(
+                id=h.chunk_id,
+                page_content=h.document.page_content,
+                metadata={**h.document.metadata, "score": round(h.score, 4)}
+            )
+            for h in hits
+        ]
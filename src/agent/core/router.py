@@ -0,0 +1,132 @@
+import re
+from typing import NamedTuple
+from agent.core.text_analysis import detect_language, normalize_query
+
+# Phrases are matched on normalize_query() output (lowercase, no accents/punctuation).
+_PATTERNS = {
+    "thanks": [
+        r"(muchas |mil )?gracias( totales)?",
+        r"te agradezco",
+        r"muy amable",
+        r"thanks?( you)?( so much| a lot)?",
+        r"thank u",
+        r"thx",
+        r"much appreciated",
+        r"appreciate it"
+    ],
+    "farewell": [
+        r"adios",
+        r"chao",
+        r"chau",
+        r"hasta (luego|pronto|manana|la proxima)",
+        r"nos vemos",
+        r"bye",
+        r"goodbye",
+        r"see you( later| soon)?",
+        r"good night",
+        r"buenas noches y adios"
+    ],
+    "greeting": [
+        r"hola+",
+        r"buen(os|as) (dias|tardes|noches)",
+        r"buen dia",
+        r"saludos",
+        r"que tal",
+        r"hey+",
+        r"hi+",
+        r"hello+",
+        r"good (morning|afternoon|evening)",
+        r"howdy",
+        r"greetings"
+    ],
+    "small_talk": [
+        r"como (estas|esta usted|te va|va todo)",
+        r"que (haces|cuentas)",
+        r"quien eres",
+        r"how are (you|u)( doing)?",
+        r"how is it going",
+        r"hows it going",
+        r"whats up",
+        r"who are you"
+    ],
+    # A bare "ok" or "great" usually answers the previous reply: acknowledged neutrally
+    "acknowledgement": [
+        r"ok(ay)?",
+        r"vale",
+        r"perfecto",
+        r"genial",
+        r"excelente",
+        r"great",
+        r"cool",
+        r"nice",
+        r"entendido",
+        r"de acuerdo",
+        r"got it"
+    ],
+}
+# Filler allowed around trivial phrases ("hola amigo", "ok gracias bot")
+_FILLER = (
+    r"(y|e|and|muy|bien|very|well|so|pues|entonces|amigo|amiga|friend|bot|asistente"
+    r"|there|todo|all|good|senor|senora|a|ti|you|usted)"
+)
+
+_ROUTE_PRIORITY = ("thanks", "farewell", "small_talk", "greeting", "acknowledgement")
+
+_TRIVIAL_WORDS = "|".join(p for patterns in _PATTERNS.values() for p in patterns)
+_TRIVIAL_RE = re.compile(r"^(?:(?:" + _TRIVIAL_WORDS + r"|" + _FILLER + r")(?: |$))+$")
+_KIND_RES = {
+    kind: re.compile(r"(?:^| )(?:" + "|".join(patterns) + r")(?: |$)")
+    for kind, patterns in _PATTERNS.items()
+}
+
+REPLIES = {
+    "greeting": {
+        "es": "¡Hola! ¿En qué puedo ayudarte hoy?",
+        "en": "Hi! How can I help you today?",
+    },
+    "thanks": {
+        "es": "¡Con gusto! ¿Hay algo más en lo que pueda ayudarte?",
+        "en": "You're welcome! Is there anything else I can help you with?",
+    },
+    "farewell": {
+        "es": "¡Hasta pronto! Aquí estaré si necesitas algo más sobre Monte Azul.",
+        "en": "Goodbye! I'm here if you need anything else about Monte Azul.",
+    },
+    "small_talk": {
+        "es": (
+            "¡Muy bien, gracias! Soy el asistente de Monte Azul. "
+            "¿En qué puedo ayudarte?"
+        ),
+        "en": "Doing well, thanks! I'm the Monte Azul assistant. How can I help you?",
+    },
+    "acknowledgement": {
+        "es": "¿Hay algo más en lo que pueda ayudarte?",
+        "en": "Is there anything else I can help you with?",
+    },
+}
+
+class TurnRoute(NamedTuple):
+    # greeting/thanks/farewell/small_talk/acknowledgement, or None for a question
+    kind: str | None
+    language: str  # "es" or "en"
+
+    @property
+    def is_trivial(self) -> bool:
+        return self.kind is not None
+
+def classify_turn(query: str) -> TurnRoute:
+    """
+    Deterministic classifier: a turn is trivial only if it consists entirely of
+    greeting/thanks/farewell/small-talk phrases ("hola, ¿qué es Prado?" is a question).
+    """
+    text = normalize_query(query)
+    language = detect_language(query)
+    if not text or len(text) > 80 or not _TRIVIAL_RE.match(text):
+        return TurnRoute(None, language)
+    for kind in _ROUTE_PRIORITY:
+        if _KIND_RES[kind].search(text):
+            return TurnRoute(kind, language)
+    return TurnRoute(None, language)
+
+def quick_reply(route: TurnRoute) -> str:
+    return REPLIES[route.kind][route.language]
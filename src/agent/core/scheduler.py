@@ -0,0 +1,456 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, Iterator, List, Mapping, Tuple
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from agent.core.config import get_settings
+from agent.core.metrics import REGISTRY, GaugeSample, MetricsCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first. Responder output is what the user is waiting on; research calls
+# (reflector, critic, query embeddings) only delay it; calls made outside any turn
+# (ingestion) can wait behind both.
+INTERACTIVE, RESEARCH, BACKGROUND = 0, 1, 2
+PRIORITY_NAMES = ("interactive", "research", "background")
+NODE_PRIORITIES = {"responder": INTERACTIVE, "quick_responder": INTERACTIVE}
+
+SCHEDULER_WAIT = REGISTRY.histogram(
+    "agent_llm_scheduler_wait_seconds",
+    "Time LLM/embedding calls waited for the scheduler",
+    ["priority"]
+)
+SCHEDULER_SHED = REGISTRY.counter(
+    "agent_llm_scheduler_shed_total",
+    "Calls refused by the scheduler (queue full or wait timeout)",
+    ["priority"]
+)
+PROVIDER_THROTTLES = REGISTRY.counter(
+    "agent_llm_provider_throttles_total", "429 responses from the provider"
+)
+
+class SchedulerOverloaded(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"LLM scheduler overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+# --- Call context ---
+
+_call_context: contextvars.ContextVar[Tuple[str | None, str | None]] = (
+    contextvars.ContextVar("llm_call_context", default=(None, None))
+)
+
+@contextmanager
+def call_context(
+    thread_id: str | None = None, node: str | None = None
+) -> Iterator[None]:
+    """
+    Tags LLM/embedding calls made inside the block (same async context, or threads
+    started with a copied context) with the turn's thread and the calling node.
+    """
+    current_thread, current_node = _call_context.get()
+    token = _call_context.set((thread_id or current_thread, node or current_node))
+    try:
+        yield
+    finally:
+        try:
+            _call_context.reset(token)
+        except ValueError:
+            # An async generator finalized from another context; nothing left to restore
+            pass
+
+def current_call() -> Tuple[int, str]:
+    """
+    (priority, tenant) of a call made in the current context.
+    """
+    thread_id, node = _call_context.get()
+    if thread_id is None:
+        return BACKGROUND, "background"
+    return NODE_PRIORITIES.get(node, RESEARCH), thread_id
+
+# --- Scheduler ---
+
+class _Waiter:
+    """
+    A queued call. Woken from any thread: async waiters through their loop,
+    sync waiters (threads) through an Event.
+    """
+    __slots__ = (
+        "priority",
+        "tenant",
+        "cost",
+        "enqueued",
+        "granted",
+        "cancelled",
+        "_loop",
+        "_future",
+        "_event"
+    )
+
+    def __init__(self, priority: int, tenant: str, cost: float, is_async: bool):
+        self.priority = priority
+        self.tenant = tenant
+        self.cost = cost
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+        if is_async:
+            self._loop = asyncio.get_running_loop()
+            self._future = self._loop.create_future()
+            self._event = None
+        else:
+            self._loop = self._future = None
+            self._event = threading.Event()
+
+    def wake(self) -> None:
+        self.granted = True
+        if self._event is not None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(_resolve, self._future)
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+class LLMScheduler:
+    """
+    Central admission point for every LLM and embedding HTTP request of the process.
+
+    - Global concurrency: at most `max_concurrency` provider requests in flight (all
+      models). The effective limit adapts AIMD-style: halved when the provider answers
+      429, regrown by about one slot per `limit` successful calls.
+    - Tokens per minute: a token bucket charged with each request's prompt estimate
+      when it is dispatched and with completion tokens when usage is reported.
+    - Priority: interactive calls (responder) are dispatched before research calls,
+      and those before background work. After `starvation_limit` consecutive grants
+      that bypassed a waiting lower class, one lower-priority call is let through.
+    - Fairness: within a priority, queued calls are served round-robin across
+      thread_ids, so one busy conversation cannot monopolize capacity.
+    - Backpressure: a 429 pauses all dispatching for the provider's retry-after, so
+      client retries queue here instead of hitting the provider again. Calls beyond
+      `max_queue`, or waiting longer than `queue_timeout`, are refused.
+    """
+    def __init__(
+        self,
+        max_concurrency: int,
+        tokens_per_minute: float = 0,
+        max_queue: int = 256,
+        queue_timeout: float = 30.0,
+        starvation_limit: int = 8,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.starvation_limit = starvation_limit
+        self._clock = clock
+        self._limit = float(max_concurrency)
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = clock()
+        self._paused_until = 0.0
+        self._queues: List["OrderedDict[str, Deque[_Waiter]]"] = [
+            OrderedDict() for _ in PRIORITY_NAMES
+        ]
+        self._queued = 0
+        self._in_flight = 0
+        self._bypassed = 0
+        self._throttles = 0
+        self._timer: threading.Timer | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return max(1, int(self._limit))
+
+    # Acquire / release
+
+    async def acquire(self, priority: int, tenant: str, cost: float = 0.0) -> None:
+        """
+        Waits for a dispatch slot. Raises SchedulerOverloaded when shed.
+        """
+        waiter = self._enqueue(priority, tenant, cost, is_async=True)
+        if not waiter.granted:
+            try:
+                await asyncio.wait({waiter._future}, timeout=self.queue_timeout)
+            except BaseException:
+                # Cancelled: a slot granted in the meantime goes back
+                if not self._abandon(waiter):
+                    self.release()
+                raise
+            if not waiter.granted and self._abandon(waiter):
+                self._shed(priority, "timeout")
+        self._waited(waiter)
+
+    def acquire_sync(self, priority: int, tenant: str, cost: float = 0.0) -> None:
+        waiter = self._enqueue(priority, tenant, cost, is_async=False)
+        if (
+            not waiter.granted
+            and not waiter._event.wait(self.queue_timeout)
+            and self._abandon(waiter)
+        ):
+            self._shed(priority, "timeout")
+        self._waited(waiter)
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._dispatch_locked()
+
+    def _enqueue(
+        self, priority: int, tenant: str, cost: float, is_async: bool
+    ) -> _Waiter:
+        waiter = _Waiter(priority, tenant, cost, is_async)
+        with self._lock:
+            if self._queued >= self.max_queue:
+                shed = True
+            else:
+                shed = False
+                self._queues[priority].setdefault(tenant, deque()).append(waiter)
+                self._queued += 1
+                self._dispatch_locked()
+        if shed:
+            self._shed(priority, "queue_full")
+        return waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """
+        Withdraws a waiter that gave up. Returns False if it was granted meanwhile,
+        in which case the caller owns the slot.
+        """
+        with self._lock:
+            if waiter.granted:
+                return False
+            waiter.cancelled = True
+            self._queued -= 1
+            return True
+
+    def _shed(self, priority: int, reason: str) -> None:
+        SCHEDULER_SHED.inc(priority=PRIORITY_NAMES[priority])
+        raise SchedulerOverloaded(
+            reason, retry_after=max(1.0, self._paused_until - self._clock())
+        )
+
+    @staticmethod
+    def _waited(waiter: _Waiter) -> None:
+        SCHEDULER_WAIT.observe(
+            time.monotonic() - waiter.enqueued, priority=PRIORITY_NAMES[waiter.priority]
+        )
+
+    # Provider feedback
+
+    def record_response(
+        self, status_code: int, retry_after: float | None = None
+    ) -> None:
+        """
+        Feeds a provider response status back into the concurrency limit.
+        """
+        with self._lock:
+            if status_code == 429:
+                self._throttled_locked(retry_after)
+            elif status_code < 500 and self._limit < self.max_concurrency:
+                self._limit = min(self.max_concurrency, self._limit + 1 / self._limit)
+
+    def charge(self, tokens: float) -> None:
+        """
+        Debits tokens reported after the fact (completion tokens). May go into debt.
+        """
+        if self.tokens_per_minute > 0 and tokens > 0:
+            with self._lock:
+                self._refill_locked(self._clock())
+                self._tokens -= tokens
+
+    def _throttled_locked(self, retry_after: float | None) -> None:
+        PROVIDER_THROTTLES.inc()
+        self._throttles += 1
+        now = self._clock()
+        # One decrease per throttling episode, not one per concurrent 429
+        if now >= self._paused_until:
+            self._limit = max(1.0, self._limit / 2)
+            logger.warning(
+                f"[SCHEDULER] Provider throttled; concurrency limit now {self.limit}"
+            )
+        self._paused_until = max(
+            self._paused_until, now + min(60.0, retry_after if retry_after else 1.0)
+        )
+
+    # Dispatching
+
+    def _refill_locked(self, now: float) -> None:
+        if self.tokens_per_minute > 0:
+            self._tokens = min(
+                self.tokens_per_minute,
+                self._tokens
+                + (now - self._refilled_at) * self.tokens_per_minute / 60.0
+            )
+        self._refilled_at = now
+
+    def _dispatch_locked(self) -> None:
+        now = self._clock()
+        self._refill_locked(now)
+        while self._queued and self._in_flight < self.limit:
+            if now < self._paused_until:
+                self._wake_at(self._paused_until - now)
+                return
+            waiting = [p for p in range(len(self._queues)) if self._head(p) is not None]
+            priority = self._next_priority(waiting)
+            tenant, waiter = self._head(priority)
+            if self.tokens_per_minute > 0:
+                # Requests larger than the whole bucket only wait for a full bucket
+                need = min(waiter.cost, self.tokens_per_minute)
+                if self._tokens < need:
+                    self._wake_at((need - self._tokens) * 60.0 / self.tokens_per_minute)
+                    return
+                self._tokens -= waiter.cost
+            self._pop(priority, tenant)
+            self._in_flight += 1
+            # Count grants that jumped ahead of a waiting lower class
+            self._bypassed = (
+                self._bypassed + 1 if priority == waiting[0] and len(waiting) > 1 else 0
+            )
+            waiter.wake()
+
+    def _next_priority(self, waiting: List[int]) -> int:
+        if len(waiting) > 1 and self._bypassed >= self.starvation_limit:
+            return waiting[1]
+        return waiting[0]
+
+    def _head(self, priority: int) -> Tuple[str, _Waiter] | None:
+        """
+        First live waiter of a priority class (round-robin order), dropping
+        abandoned waiters on the way.
+        """
+        queues = self._queues[priority]
+        while queues:
+            tenant, waiters = next(iter(queues.items()))
+            while waiters and waiters[0].cancelled:
+                waiters.popleft()
+            if waiters:
+                return tenant, waiters[0]
+            del queues[tenant]
+        return None
+
+    def _pop(self, priority: int, tenant: str) -> None:
+        queues = self._queues[priority]
+        waiters = queues[tenant]
+        waiters.popleft()
+        self._queued -= 1
+        if waiters:
+            # The tenant goes to the back of the line
+            queues.move_to_end(tenant)
+        else:
+            del queues[tenant]
+
+    def _wake_at(self, delay: float) -> None:
+        # Nothing in flight may release soon, so a timer re-runs dispatching
+        if self._timer is None or not self._timer.is_alive():
+            self._timer = threading.Timer(max(0.001, delay), self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._dispatch_locked()
+
+    # Introspection
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = {
+                PRIORITY_NAMES[p]: sum(
+                    1 for waiters in queue.values() for w in waiters if not w.cancelled
+                )
+                for p, queue in enumerate(self._queues)
+            }
+            return {
+                "limit": self.limit,
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self._in_flight,
+                "queued": queued,
+                "tokens_available": (
+                    round(self._tokens, 1) if self.tokens_per_minute > 0 else None
+                ),
+                "paused_seconds": round(
+                    max(0.0, self._paused_until - self._clock()), 3
+                ),
+                "throttles": self._throttles
+            }
+
+    def collect_metrics(self) -> Iterator[GaugeSample]:
+        stats = self.stats()
+        yield (
+            "agent_llm_scheduler_limit",
+            "Current adaptive concurrency limit",
+            {},
+            stats["limit"]
+        )
+        yield (
+            "agent_llm_scheduler_in_flight",
+            "Provider requests dispatched and not finished",
+            {},
+            stats["in_flight"]
+        )
+        for priority, count in stats["queued"].items():
+            yield (
+                "agent_llm_scheduler_queued",
+                "Calls waiting for dispatch",
+                {"priority": priority},
+                count
+            )
+        if stats["tokens_available"] is not None:
+            yield (
+                "agent_llm_scheduler_tokens_available",
+                "Tokens left in the per-minute budget",
+                {},
+                stats["tokens_available"]
+            )
+
+class SchedulerCallbackHandler(BaseCallbackHandler):
+    """
+    Charges completion tokens to the scheduler's per-minute budget once an LLM call
+    reports its usage (prompt tokens are estimated when the request is dispatched).
+    """
+    def __init__(self, scheduler: LLMScheduler):
+        self.scheduler = scheduler
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        _, completion_tokens = MetricsCallbackHandler._usage(response)
+        self.scheduler.charge(completion_tokens)
+
+def retry_after_seconds(headers: Mapping[str, str]) -> float | None:
+    """
+    Parses OpenAI's retry-after-ms / retry-after headers.
+    """
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                continue
+    return None
+
+@lru_cache
+def get_scheduler() -> LLMScheduler:
+    """
+    Returns the process-wide scheduler configured by the LLM_SCHEDULER_* settings.
+    """
+    settings = get_settings()
+    scheduler = LLMScheduler(
+        max_concurrency=settings.LLM_SCHEDULER_MAX_CONCURRENCY,
+        tokens_per_minute=settings.LLM_SCHEDULER_TPM,
+        max_queue=settings.LLM_SCHEDULER_MAX_QUEUE,
+        queue_timeout=settings.LLM_SCHEDULER_QUEUE_TIMEOUT
+    )
+    REGISTRY.add_collector(scheduler.collect_metrics)
+    return scheduler
@@ -0,0 +1,524 @@
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Sequence, Tuple
+import numpy as np
+from agent.core.text_analysis import SpanishAnalyzer
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # Windows: writers are only serialized in-process
+    fcntl = None
+
+MANIFEST = "manifest.json"
+VOCAB = "vocab.json"
+LOCK = "write.lock"
+# Chroma IDs are stored as fixed-width bytes; longer IDs are rejected, never truncated
+MAX_ID_BYTES = 128
+ID_DTYPE = f"S{MAX_ID_BYTES}"
+
+def _atomic_write_json(path: str, payload: Dict) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)
+
+def _atomic_save_npy(path: str, array: np.ndarray) -> None:
+    tmp = f"{path}.tmp.npy"
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+def _encode_ids(ids: Sequence[str]) -> List[bytes]:
+    encoded = [i.encode("utf-8") for i in ids]
+    for raw in encoded:
+        if len(raw) > MAX_ID_BYTES:
+            raise ValueError(
+                f"Document ID longer than {MAX_ID_BYTES} bytes: {raw[:40]!r}..."
+            )
+    return encoded
+
+class _Segment:
+    """
+    Immutable, term-major postings for a batch of documents (memory-mapped from disk).
+
+    term_ptr[t]:term_ptr[t + 1] slices doc_idx/tf for global term id t. Deletions are
+    tracked in a separate `live` mask so segment files are never rewritten.
+    """
+    def __init__(self, root: str, name: str, live_file: str):
+        self.name = name
+        self.live_file = live_file
+        seg_dir = os.path.join(root, name)
+        self.term_ptr = np.load(os.path.join(seg_dir, "term_ptr.npy"), mmap_mode="r")
+        self.doc_idx = np.load(os.path.join(seg_dir, "doc_idx.npy"), mmap_mode="r")
+        self.tf = np.load(os.path.join(seg_dir, "tf.npy"), mmap_mode="r")
+        self.doc_len = np.load(os.path.join(seg_dir, "doc_len.npy"), mmap_mode="r")
+        self.ids = np.load(os.path.join(seg_dir, "ids.npy"), mmap_mode="r")
+        self.live = np.load(os.path.join(root, live_file), mmap_mode="r")
+
+    @property
+    def size(self) -> int:
+        return int(self.doc_len.shape[0])
+
+    def postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        if term_id + 1 >= self.term_ptr.shape[0]:
+            return self.doc_idx[:0], self.tf[:0]
+        start, end = int(self.term_ptr[term_id]), int(self.term_ptr[term_id + 1])
+        return self.doc_idx[start:end], self.tf[start:end]
+
+class SparseIndex:
+    """
+    Persistent BM25 inverted index kept in sync with the Chroma collection.
+
+    Documents are keyed by their Chroma IDs. Each `add` writes a new immutable segment
+    (no re-tokenization of existing documents); `delete` flips bits in a live mask.
+    Segments are merged once there are more than `max_segments`. Arrays are
+    memory-mapped, so opening the index costs the same regardless of corpus size.
+    Writers (e.g. ingest_data.py next to a serving process) are serialized by a file
+    lock and start from the latest manifest. The manifest records the analyzer
+    signature; `analyzer_matches` is False when the index was built with a different
+    analyzer (e.g. another stemmer) and must be rebuilt.
+    """
+    def __init__(
+        self,
+        path: str,
+        analyzer: SpanishAnalyzer | None = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+        max_segments: int = 8
+    ):
+        self.path = path
+        self.analyzer = analyzer or SpanishAnalyzer()
+        self.k1 = k1
+        self.b = b
+        self.max_segments = max_segments
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+        self._manifest_mtime = None
+        self._segments: List[_Segment] = []
+        self._vocab: Dict[str, int] = {}
+        self._manifest: Dict = {}
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """
+        Holds the write lock across threads and processes. The outermost holder
+        reloads the index, so it never commits over another process's generation.
+        """
+        with self._lock:
+            if self._lock_depth == 0:
+                self._lock_file = open(os.path.join(self.path, LOCK), "a+b")
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    self._load()
+                except BaseException:
+                    self._release_file_lock()
+                    raise
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    self._release_file_lock()
+
+    def _release_file_lock(self) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+        self._lock_file.close()
+        self._lock_file = None
+
+    # --- Loading ---
+
+    def _load(self) -> None:
+        manifest_path = os.path.join(self.path, MANIFEST)
+        if not os.path.exists(manifest_path):
+            self._manifest = {
+                "generation": 0,
+                "segments": [],
+                "num_docs": 0,
+                "total_len": 0,
+                "analyzer": self.analyzer.signature
+            }
+            self._segments = []
+            self._vocab = {}
+            self._manifest_mtime = None
+            return
+        with open(manifest_path, encoding="utf-8") as f:
+            self._manifest = json.load(f)
+        with open(os.path.join(self.path, VOCAB), encoding="utf-8") as f:
+            self._vocab = json.load(f)
+        self._segments = [
+            _Segment(self.path, seg["name"], seg["live"])
+            for seg in self._manifest["segments"]
+        ]
+        self._manifest_mtime = os.stat(manifest_path).st_mtime_ns
+
+    def refresh(self) -> None:
+        """
+        Reloads the index if another process (e.g. ingest_data.py) committed a new
+        generation.
+        """
+        manifest_path = os.path.join(self.path, MANIFEST)
+        try:
+            mtime = os.stat(manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._manifest_mtime:
+            with self._lock:
+                self._load()
+
+    @property
+    def num_docs(self) -> int:
+        return int(self._manifest.get("num_docs", 0))
+
+    @property
+    def analyzer_matches(self) -> bool:
+        return self._manifest.get("analyzer") == self.analyzer.signature
+
+    @property
+    def generation(self) -> int:
+        return int(self._manifest.get("generation", 0))
+
+    # --- Writing ---
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        """
+        Indexes (or re-indexes) documents. Existing IDs are replaced; an ID repeated
+        within the batch keeps its last text.
+        """
+        if not ids:
+            return
+        last = {doc_id: pos for pos, doc_id in enumerate(ids)}
+        if len(last) < len(ids):
+            keep = sorted(last.values())
+            ids, texts = [ids[p] for p in keep], [texts[p] for p in keep]
+        encoded_ids = _encode_ids(ids)
+        with self._exclusive():
+            self._delete_locked(ids)
+
+            rows_terms, rows_tfs, doc_len = [], [], []
+            for text in texts:
+                tokens = self.analyzer.analyze(text)
+                counts: Dict[int, int] = {}
+                for token in tokens:
+                    term_id = self._vocab.setdefault(token, len(self._vocab))
+                    counts[term_id] = counts.get(term_id, 0) + 1
+                rows_terms.append(
+                    np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+                )
+                rows_tfs.append(
+                    np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+                )
+                doc_len.append(len(tokens))
+
+            lengths = np.array([len(r) for r in rows_terms], dtype=np.int64)
+            terms = np.concatenate(rows_terms) if rows_terms else np.empty(0, np.int64)
+            tfs = np.concatenate(rows_tfs) if rows_tfs else np.empty(0, np.float32)
+            docs = np.repeat(np.arange(len(ids), dtype=np.int32), lengths)
+            live = np.ones(len(ids), dtype=bool)
+            self._write_segment(
+                terms,
+                docs,
+                tfs,
+                np.asarray(doc_len, dtype=np.int32),
+                np.asarray(encoded_ids, dtype=ID_DTYPE),
+                live
+            )
+            self._manifest["num_docs"] += len(ids)
+            self._manifest["total_len"] += int(sum(doc_len))
+            self._commit()
+            if len(self._segments) > self.max_segments:
+                self.merge()
+
+    def delete(self, ids: Iterable[str]) -> None:
+        """
+        Removes documents by Chroma ID.
+        """
+        ids = list(ids)
+        if not ids:
+            return
+        with self._exclusive():
+            if self._delete_locked(ids):
+                self._commit()
+
+    def clear(self) -> None:
+        with self._exclusive():
+            generation = self.generation
+            self._segments = []
+            self._vocab = {}
+            self._manifest = {
+                "generation": generation,
+                "segments": [],
+                "num_docs": 0,
+                "total_len": 0,
+                "analyzer": self.analyzer.signature
+            }
+            self._commit()
+
+    def merge(self) -> None:
+        """
+        Compacts all segments into one, dropping deleted documents.
+        """
+        with self._exclusive():
+            terms_parts, docs_parts, tf_parts, len_parts, id_parts = [], [], [], [], []
+            offset = 0
+            for seg in self._segments:
+                live = np.asarray(seg.live)
+                remap = np.cumsum(live, dtype=np.int64) - 1 + offset
+                term_of_posting = np.repeat(
+                    np.arange(seg.term_ptr.shape[0] - 1, dtype=np.int64),
+                    np.diff(seg.term_ptr)
+                )
+                keep = live[seg.doc_idx]
+                terms_parts.append(term_of_posting[keep])
+                docs_parts.append(remap[np.asarray(seg.doc_idx)[keep]].astype(np.int32))
+                tf_parts.append(np.asarray(seg.tf)[keep])
+                len_parts.append(np.asarray(seg.doc_len)[live])
+                id_parts.append(np.asarray(seg.ids)[live])
+                offset += int(live.sum())
+            old = [seg.name for seg in self._segments]
+            self._segments = []
+            self._manifest["segments"] = []
+            if offset:
+                self._write_segment(
+                    np.concatenate(terms_parts),
+                    np.concatenate(docs_parts),
+                    np.concatenate(tf_parts),
+                    np.concatenate(len_parts),
+                    np.concatenate(id_parts),
+                    np.ones(offset, dtype=bool)
+                )
+            self._commit()
+            logger.info(f"Merged {len(old)} BM25 segments into {len(self._segments)}")
+
+    def _delete_locked(self, ids: Sequence[str]) -> bool:
+        # An over-long ID was never indexed; truncating it could match another document
+        targets = np.asarray(
+            [
+                raw
+                for raw in (i.encode("utf-8") for i in ids)
+                if len(raw) <= MAX_ID_BYTES
+            ],
+            dtype=ID_DTYPE
+        )
+        changed = False
+        for pos, seg in enumerate(self._segments):
+            hit = np.isin(seg.ids, targets) & seg.live
+            if not hit.any():
+                continue
+            live = np.array(seg.live, copy=True)
+            live[hit] = False
+            self._manifest["num_docs"] -= int(hit.sum())
+            self._manifest["total_len"] -= int(np.asarray(seg.doc_len)[hit].sum())
+            live_file = f"{seg.name}.live.{self.generation + 1}.npy"
+            _atomic_save_npy(os.path.join(self.path, live_file), live)
+            self._manifest["segments"][pos]["live"] = live_file
+            self._segments[pos] = _Segment(self.path, seg.name, live_file)
+            changed = True
+        return changed
+
+    def _write_segment(
+        self,
+        terms: np.ndarray,
+        docs: np.ndarray,
+        tfs: np.ndarray,
+        doc_len: np.ndarray,
+        ids: np.ndarray,
+        live: np.ndarray
+    ) -> None:
+        # Sort postings term-major so each term is one contiguous slice
+        order = np.lexsort((docs, terms))
+        terms, docs, tfs = terms[order], docs[order], tfs[order]
+        counts = (
+            np.bincount(terms, minlength=len(self._vocab))
+            if terms.size
+            else np.zeros(len(self._vocab), np.int64)
+        )
+        term_ptr = np.zeros(len(self._vocab) + 1, dtype=np.int64)
+        np.cumsum(counts, out=term_ptr[1:])
+
+        name = f"seg_{self.generation + 1:06d}_{len(self._segments)}"
+        seg_dir = os.path.join(self.path, name)
+        os.makedirs(seg_dir, exist_ok=True)
+        np.save(os.path.join(seg_dir, "term_ptr.npy"), term_ptr)
+        np.save(os.path.join(seg_dir, "doc_idx.npy"), docs.astype(np.int32))
+        np.save(os.path.join(seg_dir, "tf.npy"), tfs.astype(np.float32))
+        np.save(os.path.join(seg_dir, "doc_len.npy"), doc_len.astype(np.int32))
+        np.save(os.path.join(seg_dir, "ids.npy"), ids.astype(ID_DTYPE))
+        live_file = f"{name}.live.{self.generation + 1}.npy"
+        _atomic_save_npy(os.path.join(self.path, live_file), live)
+        self._manifest["segments"].append({"name": name, "live": live_file})
+        self._segments.append(_Segment(self.path, name, live_file))
+
+    def _commit(self) -> None:
+        """
+        Publishes the new generation: vocab first, then the manifest swap readers watch.
+        """
+        self._manifest["generation"] = self.generation + 1
+        _atomic_write_json(os.path.join(self.path, VOCAB), self._vocab)
+        manifest_path = os.path.join(self.path, MANIFEST)
+        _atomic_write_json(manifest_path, self._manifest)
+        self._manifest_mtime = os.stat(manifest_path).st_mtime_ns
+        self._remove_unreferenced()
+
+    def _remove_unreferenced(self) -> None:
+        referenced = set()
+        for seg in self._manifest["segments"]:
+            referenced.update((seg["name"], seg["live"]))
+        for entry in os.listdir(self.path):
+            if (
+                entry in (MANIFEST, VOCAB, LOCK)
+                or entry in referenced
+                or entry.endswith(".tmp")
+            ):
+                continue
+            full = os.path.join(self.path, entry)
+            try:
+                if os.path.isdir(full):
+                    for f in os.listdir(full):
+                        os.remove(os.path.join(full, f))
+                    os.rmdir(full)
+                else:
+                    os.remove(full)
+            except OSError:
+                # Still mapped by a reader (open files are locked); retried next commit
+                pass
+
+    # --- Scoring ---
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Returns the top-k (chroma_id, bm25_score) pairs for the query.
+        """
+        return self.search_many([query], k)[0]
+
+    def search_many(
+        self, queries: Sequence[str], k: int = 5
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Scores several queries in one pass over the postings.
+        """
+        self.refresh()
+        with self._lock:
+            segments, vocab, manifest = (
+                list(self._segments),
+                self._vocab,
+                dict(self._manifest)
+            )
+        num_docs = manifest.get("num_docs", 0)
+        if not segments or not num_docs:
+            return [[] for _ in queries]
+        avgdl = max(manifest["total_len"] / num_docs, 1e-9)
+
+        query_terms = []
+        for q in queries:
+            ids = {vocab[t] for t in self.analyzer.analyze(q) if t in vocab}
+            query_terms.append(sorted(ids))
+        all_terms = sorted({t for terms in query_terms for t in terms})
+        if not all_terms:
+            return [[] for _ in queries]
+
+        # Document frequency summed over segments
+        # (deleted docs count until the next merge)
+        df = np.zeros(len(all_terms), dtype=np.float64)
+        for seg in segments:
+            for j, t in enumerate(all_terms):
+                if t + 1 < seg.term_ptr.shape[0]:
+                    df[j] += seg.term_ptr[t + 1] - seg.term_ptr[t]
+        idf = dict(zip(all_terms, np.log1p((num_docs - df + 0.5) / (df + 0.5))))
+
+        sizes = [seg.size for seg in segments]
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        total = int(offsets[-1])
+        live = np.concatenate([np.asarray(seg.live) for seg in segments])
+
+        results = []
+        for terms in query_terms:
+            if not terms:
+                results.append([])
+                continue
+            doc_parts, weight_parts = [], []
+            for s, seg in enumerate(segments):
+                for t in terms:
+                    docs, tf = seg.postings(t)
+                    if docs.shape[0] == 0:
+                        continue
+                    dl = np.asarray(seg.doc_len)[docs]
+                    denom = tf + self.k1 * (1.0 - self.b + self.b * dl / avgdl)
+                    doc_parts.append(np.asarray(docs, dtype=np.int64) + offsets[s])
+                    weight_parts.append(idf[t] * tf * (self.k1 + 1.0) / denom)
+            if not doc_parts:
+                results.append([])
+                continue
+            scores = np.bincount(
+                np.concatenate(doc_parts),
+                weights=np.concatenate(weight_parts),
+                minlength=total
+            )
+            scores[~live] = 0.0
+            top = self._top_k(scores, k)
+            results.append(
+                [
+                    (self._id_at(segments, offsets, int(i)), float(scores[i]))
+                    for i in top
+                ]
+            )
+        return results
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        candidates = np.flatnonzero(scores > 0)
+        if candidates.size > k:
+            candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    @staticmethod
+    def _id_at(segments: List[_Segment], offsets: np.ndarray, global_idx: int) -> str:
+        s = int(np.searchsorted(offsets, global_idx, side="right") - 1)
+        return bytes(segments[s].ids[global_idx - offsets[s]]).decode("utf-8")
+
+def ensure_synced(
+    index: SparseIndex, vector_store: "Chroma", batch_size: int = 1000
+) -> SparseIndex:
+    """
+    Rebuilds the sparse index from the Chroma collection when their document counts
+    disagree (first run, or a collection written by an older version of the indexer)
+    or the index was built with a different analyzer.
+    """
+    stored = vector_store._collection.count()
+    if stored == index.num_docs and index.analyzer_matches:
+        return index
+    if not index.analyzer_matches:
+        logger.info(
+            f"BM25 index built with analyzer {index._manifest.get('analyzer')!r}, "
+            f"now {index.analyzer.signature!r}. Rebuilding..."
+        )
+    else:
+        logger.info(
+            "BM25 index out of sync "
+            f"({index.num_docs} vs {stored} chunks). Rebuilding..."
+        )
+    index.clear()
+    max_segments, index.max_segments = index.max_segments, float("inf")
+    try:
+        for offset in range(0, stored, batch_size):
+            page = vector_store.get(
+                limit=batch_size, offset=offset, include=["documents"]
+            )
+            index.add(page["ids"], [doc or "" for doc in page["documents"]])
+    finally:
+        index.max_segments = max_segments
+    index.merge()
+    return index
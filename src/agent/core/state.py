@@ -1,6 +1,16 @@
-import operator
 from typing import Annotated, TypedDict, List, Any, Dict, Set
 from langchain_core.messages import BaseMessage
+from langgraph.graph.message import add_messages
+
+def add_research(
+    existing: List[Dict[str, Any]] | None, new: List[Dict[str, Any]] | None
+) -> List[Dict[str, Any]]:
+    """
+    Appends the researcher's new references; None resets the list for a new turn.
+    """
+    if new is None:
+        return []
+    return (existing or []) + new
 
 class AgentState(TypedDict):
     """
@@ -10,6 +20,7 @@ class AgentState(TypedDict):
     query: str
     
     # Internal flow control
+    route: str | None          # Fast-path kind (greeting/thanks/...), None for research
     plan: List[str]            # Steps to be executed
     completed_steps: List[str] # Audit trail of what's already done
     reflection: str           # LLM's self-critique/reflection
@@ -17,8 +28,9 @@ class AgentState(TypedDict):
     is_sufficient: bool = False # Flag for iterative research completion
     
     # Data aggregation
-    # research stores a list of dictionaries (e.g., {"url": "...", "content": "..."})
-    research: List[Dict[str, Any]] 
+    # research stores compact chunk references ({"chunk_id", "score", "query", "url"});
+    # nodes resolve the text from the index only when they need it
+    research: Annotated[List[Dict[str, Any]], add_research]
     # track visited URLs to avoid redundant scraping or loops
     visited_urls: Set[str]
     
@@ -26,8 +38,14 @@ class AgentState(TypedDict):
     answer: str | None
     
     # Standard LangGraph messages
-    # Annotated with operator.add ensures that new messages are appended
-    messages: Annotated[List[BaseMessage], operator.add]
+    # add_messages appends new messages and honors RemoveMessage, so the compactor
+    # can drop turns it has folded into `summary`
+    messages: Annotated[List[BaseMessage], add_messages]
+
+    # Rolling summary of the turns no longer kept verbatim in `messages`
+    summary: str | None
+    # True when this turn folded history (its old checkpoints can be pruned)
+    compacted: bool
     
     # Error stores any error messages encountered during execution
     error: str | None
@@ -0,0 +1,124 @@
+import hashlib
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Iterable, List
+
+# Spanish stopwords (accent-folded) plus the most frequent English ones, since
+# users ask in both languages and the site mixes them in navigation text.
+STOPWORDS = frozenset(
+    """
+a al algo algunas algunos ante antes como con contra cual cuales cuando de del desde
+donde durante e el ella ellas ellos en entre era eran es esa esas ese eso esos esta
+estaba estan estar estas este esto estos fue fueron ha han hasta hay la las le les lo
+los mas me mi mis muy nada ni no nos nosotros o os otra otras otro otros para pero poco
+por porque que quien quienes se sea ser si sin sobre son su sus tambien te tiene tienen
+todo todos tu tus un una unas uno unos usted ustedes y ya yo
+an and are as at be by for from has have how i in is it its of on or that the their
+this to was what when where which who why will with you your
+""".split()
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def fold_accents(text: str) -> str:
+    """
+    Lowercases and strips diacritics ("Corporación" -> "corporacion", "año" -> "ano").
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+try:
+    import snowballstemmer
+
+    _snowball = snowballstemmer.stemmer("spanish")
+
+    def _stem(token: str) -> str:
+        return _snowball.stemWord(token)
+    STEMMER = "snowball-spanish"
+except ImportError:  # pragma: no cover
+    # A declared dependency; fall back to the light stemmer if it is missing
+    _snowball = None
+    STEMMER = "light-spanish"
+
+    # Light Spanish stemmer (plural + common derivational suffixes), applied to
+    # accent-folded tokens. Longest suffixes first.
+    _SUFFIXES = (
+        "amientos", "imientos", "aciones", "uciones", "amiento", "imiento",
+        "mente", "acion", "ucion", "idades", "idad", "ables", "ibles", "able",
+        "ible", "istas", "ista", "osos", "osas", "oso", "osa", "ales",
+        "es", "as", "os", "s", "a", "o", "e",
+    )
+
+    def _stem(token: str) -> str:
+        for suffix in _SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+                return token[: -len(suffix)]
+        return token
+
+@lru_cache(maxsize=65536)
+def stem(token: str) -> str:
+    """
+    Stems an accent-folded token (Snowball Spanish if installed, light stemmer
+    otherwise).
+    """
+    return _stem(token)
+
+class SpanishAnalyzer:
+    """
+    Tokenizer for keyword search: lowercase, accent folding, stopword removal and
+    stemming.
+    """
+    def __init__(self, stopwords: Iterable[str] = STOPWORDS, min_token_length: int = 2):
+        self.stopwords = frozenset(stopwords)
+        self.min_token_length = min_token_length
+
+    @property
+    def signature(self) -> str:
+        """
+        Identifies the token stream this analyzer produces; an index built with a
+        different signature has incompatible terms.
+        """
+        stopwords = hashlib.sha1(
+            " ".join(sorted(self.stopwords)).encode("utf-8")
+        ).hexdigest()[:12]
+        return f"{STEMMER}/min{self.min_token_length}/stop-{stopwords}"
+
+    def analyze(self, text: str) -> List[str]:
+        return [
+            stem(token)
+            for token in _TOKEN_RE.findall(fold_accents(text))
+            if len(token) >= self.min_token_length and token not in self.stopwords
+        ]
+
+def normalize_query(text: str) -> str:
+    """
+    Canonical form of a query for cache keys: folded case/accents, punctuation and
+    extra whitespace removed ("¿Qué es  Prado?" -> "que es prado").
+    """
+    return " ".join(_TOKEN_RE.findall(fold_accents(text)))
+
+_SPANISH_MARKERS = frozenset(
+    "que como donde cuando cual quien quienes es son el la los las "
+    "un una del al por para con hola gracias servicios contacto "
+    "proyecto empresa tiene ofrece adios chao buenos buenas dias "
+    "tardes noches vale genial perfecto excelente entendido acuerdo".split()
+)
+_ENGLISH_MARKERS = frozenset(
+    "what how where when which who is are the a an of for with to "
+    "hi hello thanks services contact project company does offer "
+    "hey bye goodbye good morning afternoon evening thank you "
+    "thanks great cool nice got".split()
+)
+
+def detect_language(text: str) -> str:
+    """
+    Cheap Spanish/English detector ("es" or "en"); defaults to Spanish, the site's
+    language.
+    """
+    if any(ch in text for ch in "¿¡ñÑáéíóúÁÉÍÓÚ"):
+        return "es"
+    tokens = _TOKEN_RE.findall(text.lower())
+    es = sum(1 for t in tokens if t in _SPANISH_MARKERS)
+    en = sum(1 for t in tokens if t in _ENGLISH_MARKERS)
+    return "en" if en > es else "es"
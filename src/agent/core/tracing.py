@@ -0,0 +1,668 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Tuple
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableConfig
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+from langgraph.checkpoint.base import BaseCheckpointSaver, CheckpointTuple
+from agent.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Spans are timed with the monotonic clock and exported as Unix times via this anchor
+_EPOCH_OFFSET_NS = time.time_ns() - time.perf_counter_ns()
+
+# OTLP SpanKind
+_SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+def _lane() -> str:
+    """
+    Timeline row of the caller: the OS thread plus the asyncio task, so concurrent
+    tasks (gather, to_thread) get separate rows instead of overlapping on one.
+    """
+    thread = threading.current_thread().name
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return f"{thread} / {task.get_name()}" if task is not None else thread
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start_ns: int
+    kind: str = "internal"
+    lane: str = ""
+    end_ns: int | None = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    events: List[Tuple[int, str, Dict[str, Any]]] = field(default_factory=list)
+    error: str | None = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, attributes: Dict[str, Any] | None = None) -> None:
+        self.events.append((time.perf_counter_ns(), name, attributes or {}))
+
+    def end(self, error: BaseException | None = None) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.perf_counter_ns()
+        if isinstance(error, asyncio.CancelledError):
+            self.error = "cancelled"
+        elif error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+class Trace:
+    """
+    Spans of one request (agent turn). The first span is the root.
+    """
+    def __init__(self, name: str, thread_id: str):
+        self.name = name
+        self.thread_id = thread_id
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Span] = []
+        self.profile_path: str | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    def start_span(
+        self, name: str, parent: Span | None, kind: str = "internal", **attributes: Any
+    ) -> Span:
+        span = Span(
+            name=name,
+            trace_id=self.trace_id,
+            span_id=f"{random.getrandbits(64):016x}",
+            parent_id=parent.span_id if parent is not None else None,
+            start_ns=time.perf_counter_ns(),
+            kind=kind,
+            lane=_lane(),
+            attributes=attributes
+        )
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def summary(self, slowest: int = 5) -> Dict[str, Any]:
+        with self._lock:
+            spans = list(self.spans)
+        root = spans[0]
+        children = sorted(spans[1:], key=lambda s: -s.duration_ms)[:slowest]
+        return {
+            "trace_id": self.trace_id,
+            "thread_id": self.thread_id,
+            "name": self.name,
+            "start": (root.start_ns + _EPOCH_OFFSET_NS) / 1e9,
+            "duration_ms": round(root.duration_ms, 3),
+            "spans": len(spans),
+            "error": root.error,
+            "attributes": root.attributes,
+            "slowest": [
+                {"name": s.name, "duration_ms": round(s.duration_ms, 3)}
+                for s in children
+            ],
+            "profile": self.profile_path
+        }
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """
+        Chrome trace event format (chrome://tracing, Perfetto, speedscope).
+        """
+        with self._lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        lanes: Dict[str, int] = {}
+        events: List[Dict[str, Any]] = []
+        for span in spans:
+            tid = lanes.setdefault(span.lane, len(lanes) + 1)
+            end_ns = span.end_ns if span.end_ns is not None else time.perf_counter_ns()
+            args = dict(span.attributes)
+            if span.error:
+                args["error"] = span.error
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.kind,
+                    "ph": "X",
+                    "pid": pid,
+                    "tid": tid,
+                    "ts": (span.start_ns + _EPOCH_OFFSET_NS) / 1000,
+                    "dur": (end_ns - span.start_ns) / 1000,
+                    "args": args
+                }
+            )
+            for ts, name, attributes in span.events:
+                events.append(
+                    {
+                        "name": name,
+                        "cat": "event",
+                        "ph": "i",
+                        "s": "t",
+                        "pid": pid,
+                        "tid": tid,
+                        "ts": (ts + _EPOCH_OFFSET_NS) / 1000,
+                        "args": attributes
+                    }
+                )
+        for lane, tid in lanes.items():
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": lane}
+                }
+            )
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"trace_id": self.trace_id, "thread_id": self.thread_id}
+        }
+
+    def to_otlp(self, service_name: str = "monte-azul-agent") -> Dict[str, Any]:
+        """
+        OTLP/JSON ExportTraceServiceRequest, as accepted by an OTLP/HTTP collector.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        otlp_spans = []
+        for span in spans:
+            end_ns = span.end_ns if span.end_ns is not None else time.perf_counter_ns()
+            otlp = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": _SPAN_KINDS.get(span.kind, 1),
+                "startTimeUnixNano": str(span.start_ns + _EPOCH_OFFSET_NS),
+                "endTimeUnixNano": str(end_ns + _EPOCH_OFFSET_NS),
+                "attributes": _otlp_attributes(
+                    {**span.attributes, "thread.lane": span.lane}
+                ),
+                "events": [
+                    {
+                        "timeUnixNano": str(ts + _EPOCH_OFFSET_NS),
+                        "name": name,
+                        "attributes": _otlp_attributes(attributes)
+                    }
+                    for ts, name, attributes in span.events
+                ],
+                "status": (
+                    {"code": 2, "message": span.error} if span.error else {"code": 1}
+                )
+            }
+            if span.parent_id:
+                otlp["parentSpanId"] = span.parent_id
+            otlp_spans.append(otlp)
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": _otlp_attributes(
+                            {"service.name": service_name, "process.pid": os.getpid()}
+                        )
+                    },
+                    "scopeSpans": [{"scope": {"name": __name__}, "spans": otlp_spans}]
+                }
+            ]
+        }
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {"key": key, "value": _otlp_value(value)}
+        for key, value in attributes.items()
+        if value is not None
+    ]
+
+class TraceStore:
+    """
+    Most recent traces, kept in memory for the /traces endpoint.
+    """
+    def __init__(self, max_traces: int):
+        self._traces: deque = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace) -> None:
+        with self._lock:
+            self._traces.append(trace)
+
+    def get(self, trace_id: str) -> Trace | None:
+        with self._lock:
+            return next((t for t in self._traces if t.trace_id == trace_id), None)
+
+    def recent(self, limit: int = 50, thread_id: str | None = None) -> List[Trace]:
+        with self._lock:
+            traces = [
+                t
+                for t in reversed(self._traces)
+                if thread_id is None or t.thread_id == thread_id
+            ]
+        return traces[:limit]
+
+# --- Request context ---
+
+_current_trace: contextvars.ContextVar[Trace | None] = contextvars.ContextVar(
+    "trace", default=None
+)
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar(
+    "span", default=None
+)
+_store: TraceStore | None = None
+_export_executor: ThreadPoolExecutor | None = None
+_setup_lock = threading.Lock()
+
+def get_trace_store() -> TraceStore:
+    global _store
+    if _store is None:
+        with _setup_lock:
+            if _store is None:
+                _store = TraceStore(get_settings().TRACE_BUFFER_SIZE)
+    return _store
+
+def current_trace() -> Trace | None:
+    return _current_trace.get()
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+def _reset(var: contextvars.ContextVar, token: contextvars.Token) -> None:
+    try:
+        var.reset(token)
+    except ValueError:
+        # An async generator finalized from another context; nothing left to restore
+        pass
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes: Any) -> Iterator[Span | None]:
+    """
+    Child span of the current one for the duration of the block. Outside a traced
+    request this is a no-op yielding None. Context propagates into asyncio tasks and
+    asyncio.to_thread, so work fanned out from the block nests under it.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    current = trace.start_span(name, _current_span.get(), kind=kind, **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(e)
+        raise
+    finally:
+        current.end()
+        _reset(_current_span, token)
+
+def start_span(name: str, kind: str = "internal", **attributes: Any) -> Span | None:
+    """
+    Span under the current one that the caller ends explicitly (callbacks whose start
+    and end arrive as separate calls). It does not become the current span.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    return trace.start_span(name, _current_span.get(), kind=kind, **attributes)
+
+@contextmanager
+def trace_request(
+    name: str, thread_id: str, **attributes: Any
+) -> Iterator[Trace | None]:
+    """
+    Root span of one request. On exit the trace is kept in the in-memory store and
+    exported (Chrome-trace file and/or OTLP collector) off the caller's thread.
+    A PROFILE_SAMPLE_RATE fraction of requests also runs the sampling profiler.
+    """
+    settings = get_settings()
+    if not settings.TRACING_ENABLED or _current_trace.get() is not None:
+        yield _current_trace.get()
+        return
+    trace = Trace(name, thread_id)
+    root = trace.start_span(
+        name, None, kind="server", thread_id=thread_id, **attributes
+    )
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(root)
+    session = None
+    if (
+        settings.PROFILE_SAMPLE_RATE > 0
+        and random.random() < settings.PROFILE_SAMPLE_RATE
+    ):
+        session = get_profiler().start(settings.PROFILE_INTERVAL_MS / 1000)
+    try:
+        yield trace
+    except BaseException as e:
+        root.end(e)
+        raise
+    finally:
+        root.end()
+        _reset(_current_span, span_token)
+        _reset(_current_trace, trace_token)
+        if session is not None:
+            get_profiler().stop(session)
+            trace.profile_path = profile_path(
+                settings.PROFILE_DIR, thread_id, trace.trace_id
+            )
+            root.set(profile_samples=session.samples)
+        get_trace_store().add(trace)
+        _export(trace, session)
+
+def _export(trace: Trace, session: "ProfileSession | None") -> None:
+    settings = get_settings()
+    if not (
+        settings.TRACE_EXPORT_DIR or settings.TRACE_OTLP_ENDPOINT or session is not None
+    ):
+        return
+    global _export_executor
+    if _export_executor is None:
+        with _setup_lock:
+            if _export_executor is None:
+                _export_executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="trace-export"
+                )
+    _export_executor.submit(_write_exports, trace, session)
+
+def _write_exports(trace: Trace, session: "ProfileSession | None") -> None:
+    settings = get_settings()
+    try:
+        if session is not None:
+            session.write(trace.profile_path)
+        if settings.TRACE_EXPORT_DIR:
+            os.makedirs(settings.TRACE_EXPORT_DIR, exist_ok=True)
+            path = os.path.join(settings.TRACE_EXPORT_DIR, f"{trace.trace_id}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(trace.to_chrome(), f, default=str)
+        if settings.TRACE_OTLP_ENDPOINT:
+            import httpx
+            httpx.post(
+                settings.TRACE_OTLP_ENDPOINT, json=trace.to_otlp(), timeout=5.0
+            ).raise_for_status()
+    except Exception as e:
+        logger.warning(f"Trace export failed for {trace.trace_id}: {e}")
+
+# --- LLM and checkpointer instrumentation ---
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback turning each LLM call into a client span with model, token
+    usage and time to first token. Runs inline so it sees the caller's trace context.
+    """
+    run_inline = True
+
+    def __init__(self, model: str):
+        self.model = model
+        self._spans: Dict[UUID, Span] = {}
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        *,
+        run_id: UUID,
+        **kwargs: Any
+    ) -> None:
+        self._start(run_id, messages=sum(len(batch) for batch in messages))
+
+    def on_llm_start(
+        self,
+        serialized: Dict[str, Any],
+        prompts: List[str],
+        *,
+        run_id: UUID,
+        **kwargs: Any
+    ) -> None:
+        self._start(run_id, prompts=len(prompts))
+
+    def _start(self, run_id: UUID, **attributes: Any) -> None:
+        current = start_span("llm.call", kind="client", model=self.model, **attributes)
+        if current is not None:
+            self._spans[run_id] = current
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        current = self._spans.get(run_id)
+        if current is not None and "first_token_ms" not in current.attributes:
+            current.set(first_token_ms=round(current.duration_ms, 3))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        current = self._spans.pop(run_id, None)
+        if current is None:
+            return
+        from agent.core.metrics import MetricsCallbackHandler
+        prompt_tokens, completion_tokens = MetricsCallbackHandler._usage(response)
+        current.set(
+            prompt_tokens=int(prompt_tokens), completion_tokens=int(completion_tokens)
+        )
+        current.end()
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        current = self._spans.pop(run_id, None)
+        if current is not None:
+            current.end(error)
+
+class TracedCheckpointer(BaseCheckpointSaver):
+    """
+    Checkpointer proxy recording a client span around every async checkpoint read
+    and write of the wrapped saver (Postgres round trips, SQLite commits, in-memory
+    copies).
+    """
+    def __init__(self, inner: BaseCheckpointSaver):
+        # No super().__init__(): the serializer is the wrapped saver's
+        self.inner = inner
+
+    @property
+    def serde(self) -> Any:
+        return self.inner.serde
+
+    @property
+    def config_specs(self) -> list:
+        return self.inner.config_specs
+
+    def get_next_version(self, current: Any, channel: Any) -> Any:
+        return self.inner.get_next_version(current, channel)
+
+    def with_allowlist(self, extra_allowlist: Any) -> BaseCheckpointSaver:
+        inner = self.inner.with_allowlist(extra_allowlist)
+        return self if inner is self.inner else TracedCheckpointer(inner)
+
+    async def alist(
+        self, config: RunnableConfig | None, **kwargs: Any
+    ) -> AsyncIterator[CheckpointTuple]:
+        with span("checkpoint.alist", kind="client", saver=type(self.inner).__name__):
+            async for item in self.inner.alist(config, **kwargs):
+                yield item
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+def _traced_async(name: str) -> Callable[..., Awaitable[Any]]:
+    async def method(self: TracedCheckpointer, *args: Any, **kwargs: Any) -> Any:
+        with span(f"checkpoint.{name}", kind="client", saver=type(self.inner).__name__):
+            return await getattr(self.inner, name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+def _delegate(name: str) -> Callable[..., Any]:
+    def method(self: TracedCheckpointer, *args: Any, **kwargs: Any) -> Any:
+        return getattr(self.inner, name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+for _name in (
+    "aget",
+    "aget_tuple",
+    "aput",
+    "aput_writes",
+    "adelete_thread",
+    "adelete_for_runs",
+    "acopy_thread",
+    "aprune",
+    "aget_delta_channel_history"
+):
+    setattr(TracedCheckpointer, _name, _traced_async(_name))
+for _name in (
+    "get",
+    "get_tuple",
+    "list",
+    "put",
+    "put_writes",
+    "delete_thread",
+    "delete_for_runs",
+    "copy_thread",
+    "prune",
+    "get_delta_channel_history"
+):
+    setattr(TracedCheckpointer, _name, _delegate(_name))
+
+# --- Sampling profiler ---
+
+# Leaf frames of threads that are waiting rather than running Python code
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("process.py", "_wait_for_updates"),
+}
+
+def profile_path(profile_dir: str, thread_id: str, trace_id: str) -> str:
+    safe_thread = re.sub(r"[^A-Za-z0-9_.-]", "_", thread_id)[:128] or "default"
+    return os.path.join(profile_dir, safe_thread, f"{trace_id}.folded")
+
+class ProfileSession:
+    """
+    Stack samples collected while one request was in flight.
+    """
+    def __init__(self) -> None:
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def write(self, path: str) -> None:
+        """
+        Folded-stack format ("thread;frame;frame count" per line), readable by
+        flamegraph.pl, speedscope and inferno.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+class SamplingProfiler:
+    """
+    Statistical profiler over sys._current_frames(). While at least one profiled
+    request is in flight, a daemon thread snapshots the Python stack of every thread
+    each interval; threads parked in an idle wait (event loop select, executor queue)
+    are skipped so the profile shows where CPU time went. Samples are attributed to
+    every profiled request in flight at that moment, so concurrent profiled requests
+    share samples.
+    """
+    def __init__(self) -> None:
+        self._sessions: List[ProfileSession] = []
+        self._interval = 0.005
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def start(self, interval: float) -> ProfileSession:
+        session = ProfileSession()
+        with self._lock:
+            self._sessions.append(session)
+            self._interval = (
+                min(self._interval, interval) if self._thread is not None else interval
+            )
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="sampling-profiler", daemon=True
+                )
+                self._thread.start()
+        return session
+
+    def stop(self, session: ProfileSession) -> None:
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+                sessions = list(self._sessions)
+                interval = self._interval
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = self._fold(frame, names.get(ident, str(ident)))
+                if stack is None:
+                    continue
+                for session in sessions:
+                    session.stacks[stack] += 1
+                    session.samples += 1
+            time.sleep(interval)
+
+    @staticmethod
+    def _fold(frame: FrameType, thread_name: str) -> str | None:
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+            return None
+        frames = []
+        current: FrameType | None = frame
+        while current is not None:
+            code = current.f_code
+            name = getattr(code, "co_qualname", code.co_name)
+            frames.append(f"{os.path.basename(code.co_filename)}:{name}")
+            current = current.f_back
+        frames.append(thread_name)
+        return ";".join(reversed(frames)).replace(" ", "_")
+
+_profiler: SamplingProfiler | None = None
+
+def get_profiler() -> SamplingProfiler:
+    global _profiler
+    if _profiler is None:
+        with _setup_lock:
+            if _profiler is None:
+                _profiler = SamplingProfiler()
+    return _profiler
@@ -1,133 +1,876 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from psycopg import Error as PsycopgError
+from psycopg.rows import dict_row
 from psycopg_pool import AsyncConnectionPool
 from agent.core.state import AgentState
-from agent.graph.nodes.research_nodes import reflector, researcher, critic, responder
+from agent.graph.nodes.research_nodes import (
+    router,
+    quick_responder,
+    reflector,
+    researcher,
+    critic,
+    speculative_critic,
+    responder,
+    compactor,
+    get_retriever,
+    MAX_RESEARCH_ITERATIONS,
+    SPECULATIVE_TAG
+)
 from agent.core.middleware import (
-    ObservabilityMiddleware, 
+    ObservabilityMiddleware,
     GuardrailMiddleware,
-    EVENT_SESSION_START, 
+    EVENT_SESSION_START,
     EVENT_SESSION_END
 )
+from agent.core.resilience import CircuitBreaker
+from agent.core.checkpointers import (
+    bounded_memory_saver,
+    open_sqlite_saver,
+    supports_pruning
+)
+from agent.core.answer_cache import SemanticAnswerCache
+from agent.core.embeddings import get_embeddings
+from agent.core.text_analysis import detect_language
+from agent.core.router import classify_turn
+from agent.core.events import (
+    AgentEvent,
+    answer_event,
+    progress_event,
+    reset_event,
+    token_event
+)
 from agent.core.config import get_settings
-from typing import Dict, Any
+from agent.core.context_packing import count_tokens
+from agent.core.metrics import (
+    CACHE_REQUESTS,
+    FALLBACKS,
+    REJECTIONS,
+    TURN_COST,
+    TURN_DURATION,
+    TURN_ITERATIONS,
+    track_turn_usage
+)
+from agent.core.llm import NODE_MODEL_SETTINGS, get_client_registry, get_llm_for_node
+from agent.core.tracing import TracedCheckpointer, span, trace_request
+from agent.core.rate_limit import (
+    AdmissionRejected,
+    get_admission_controller,
+    get_rate_limiter
+)
+from agent.core.scheduler import call_context
+from agent.core.conversion import get_conversion_service
+from langchain_core.messages import AIMessageChunk
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Any, List, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+    from langgraph.checkpoint.base import BaseCheckpointSaver
+    from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+    from langgraph.graph.state import CompiledStateGraph
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# (query vector, language, index version) an answer is cached under
+_CacheKey = Tuple["np.ndarray", str, int]
+
+# Thread used when the caller has no session; shared, so never rate-limited per session
+DEFAULT_THREAD_ID = "default-thread"
+
+# Nodes whose LLM output is the user-facing answer and is streamed token by token
+STREAMED_NODES = ("responder",)
+
+PROGRESS_MESSAGES = {
+    "router": "Understanding the question",
+    "quick_responder": "Answering",
+    "reflector": "Planning the research",
+    "researcher": "Searching the knowledge base",
+    "critic": "Reviewing the findings",
+    "responder": "Answer ready",
+    "compactor": "Updating conversation memory"
+}
 
 class MonteAzulAgent:
     """
     Encapsulates the AlphaCodium Flow for researching Monte Azul Group.
     """
-    def __init__(self):
+    def __init__(self, speculative: bool | None = None):
+        # Draft the answer while the critic runs, keeping it if the research passes
+        self.speculative = (
+            settings.SPECULATIVE_RESPONDER if speculative is None else speculative
+        )
         self.builder = self._build_graph_builder()
-        self.graph = None 
-        # Ultimate fallback for demo stability
-        from langgraph.checkpoint.memory import MemorySaver
-        self.memory_saver = MemorySaver()
+        # Ultimate fallback for demo stability; startup() swaps in the SQLite saver
+        self.memory_saver = bounded_memory_saver(settings)
+        self.local_saver = self.memory_saver
+        self.pool: AsyncConnectionPool | None = None
+        self.postgres_saver: "AsyncPostgresSaver | None" = None
+        # Skips the pool timeout on every request while Postgres is down
+        self.db_breaker = CircuitBreaker(
+            "postgres",
+            failure_threshold=settings.DB_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.DB_BREAKER_RESET_SECONDS
+        )
+        self._answer_cache: SemanticAnswerCache | None = None
+        self._graphs: Dict[int, Any] = {}
+        self._lifecycle_lock = asyncio.Lock()
+        self._started = False
+        self._ready = False
+        self._warm_up_error: str | None = None
+        self._background: set = set()
+
+    @property
+    def answer_cache(self) -> SemanticAnswerCache | None:
+        # Built on first use: creating the embedding client imports the OpenAI SDK
+        if self._answer_cache is None and settings.ANSWER_CACHE_ENABLED:
+            self._answer_cache = SemanticAnswerCache(
+                get_embeddings(),
+                threshold=settings.ANSWER_CACHE_THRESHOLD,
+                max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS
+            )
+        return self._answer_cache
 
     def _should_continue(self, state: AgentState):
         """
         Conditional edge to decide if we need more research.
         """
-        if state.get("iterations", 0) >= 5:
+        if state.get("answer") is not None:
+            # The speculative critic already committed its draft
+            return "compactor"
+        if state.get("iterations", 0) >= MAX_RESEARCH_ITERATIONS:
             return "responder"
         if state.get("is_sufficient"):
             return "responder"
         return "reflector"
 
+    def _route_turn(self, state: AgentState) -> str:
+        """
+        Conditional edge after the router: trivial turns skip research entirely.
+        """
+        return "quick_responder" if state.get("route") else "reflector"
+
     def _build_graph_builder(self):
         workflow = StateGraph(AgentState)
+        workflow.add_node("router", router)
+        workflow.add_node("quick_responder", quick_responder)
         workflow.add_node("reflector", reflector)
         workflow.add_node("researcher", researcher)
-        workflow.add_node("critic", critic)
+        workflow.add_node("critic", speculative_critic if self.speculative else critic)
         workflow.add_node("responder", responder)
-        
-        workflow.set_entry_point("reflector")
+        workflow.add_node("compactor", compactor)
+
+        workflow.set_entry_point("router")
+        workflow.add_conditional_edges(
+            "router",
+            self._route_turn,
+            {
+                "quick_responder": "quick_responder",
+                "reflector": "reflector"
+            }
+        )
+        workflow.add_edge("quick_responder", "compactor")
         workflow.add_edge("reflector", "researcher")
         workflow.add_edge("researcher", "critic")
-        
+
         workflow.add_conditional_edges(
             "critic",
             self._should_continue,
             {
                 "reflector": "reflector",
-                "responder": "responder"
+                "responder": "responder",
+                "compactor": "compactor"
             }
         )
-        workflow.add_edge("responder", END)
+        workflow.add_edge("responder", "compactor")
+        workflow.add_edge("compactor", END)
         return workflow
 
-    async def run(self, query: str, thread_id: str = "default-thread") -> Dict[str, Any]:
+    # --- Lifecycle ---
+
+    async def startup(self) -> None:
         """
-        Execute the agent with a query and thread_id for persistence.
+        Opens the shared checkpointer pool and the local checkpointer. Safe to call more
+        than once.
         """
-        from langchain_core.messages import HumanMessage
-        
+        async with self._lifecycle_lock:
+            if self._started:
+                return
+            self._started = True
+            if settings.DATABASE_URL:
+                await self._connect_postgres()
+            await self._open_local_saver()
+            self._warn_if_unprunable()
+
+    def _warn_if_unprunable(self) -> None:
+        if not settings.CHECKPOINT_PRUNE_ENABLED:
+            return
+        for saver in (self.postgres_saver, self.local_saver):
+            if saver is not None and not supports_pruning(saver):
+                logger.warning(
+                    f"{type(saver).__name__} cannot prune checkpoints: threads keep "
+                    "every checkpoint even after their history is compacted"
+                )
+
+    async def shutdown(self) -> None:
+        """
+        Closes the shared pools and drops compiled graphs.
+        """
+        async with self._lifecycle_lock:
+            await self._close_postgres()
+            await self._close_local_saver()
+            await get_client_registry().aclose()
+            await asyncio.to_thread(get_conversion_service().shutdown)
+            self._graphs.clear()
+            self._started = False
+            self._ready = False
+
+    async def warm_up(self) -> None:
+        """
+        Loads everything a first request would otherwise pay for: checkpointer pool,
+        retriever (Chroma + BM25), embedding and LLM clients, tokenizer, the compiled
+        graph and the Docling worker pool (used by auto-ingestion). Blocking loads run
+        in a thread so the server keeps answering health checks.
+        """
+        start = asyncio.get_running_loop().time()
+        try:
+            await self.startup()
+            await asyncio.to_thread(get_retriever)
+            await asyncio.to_thread(count_tokens, "warm up")
+            await asyncio.to_thread(lambda: self.answer_cache)
+            for node in NODE_MODEL_SETTINGS:
+                await asyncio.to_thread(get_llm_for_node, node)
+            await self._acquire_graph()
+            await self._warm_up_conversion()
+        except Exception as e:
+            self._warm_up_error = str(e)
+            logger.error(f"Warm-up failed: {e}")
+            raise
+        self._warm_up_error = None
+        self._ready = True
+        ObservabilityMiddleware.log_event(
+            "warm_up",
+            {
+                "seconds": round(asyncio.get_running_loop().time() - start, 3),
+                "durable_memory": self.postgres_saver is not None
+            }
+        )
+
+    @staticmethod
+    async def _warm_up_conversion() -> None:
+        # Only auto-ingestion converts pages while serving, so a pool that cannot
+        # start does not make the agent unready
+        try:
+            await asyncio.to_thread(get_conversion_service().warm_up)
+        except Exception as e:
+            FALLBACKS.inc(kind="conversion_warm_up")
+            logger.warning(
+                f"Docling conversion pool did not warm up ({e}); it starts on first use"
+            )
+
+    def health(self) -> Dict[str, Any]:
+        """
+        Liveness/readiness snapshot. The process is live once it can answer this call;
+        it is ready once warm_up() has completed.
+        """
+        return {
+            "live": True,
+            "ready": self._ready,
+            "warm_up_error": self._warm_up_error,
+            "durable_memory": self.postgres_saver is not None,
+            "local_checkpointer": type(self.local_saver).__name__,
+            "db_breaker": self.db_breaker.state
+        }
+
+    @asynccontextmanager
+    async def lifespan(self) -> AsyncIterator["MonteAzulAgent"]:
+        """
+        Async context manager wrapping startup/shutdown for host frameworks.
+        """
+        await self.startup()
+        try:
+            yield self
+        finally:
+            await self.shutdown()
+
+    async def _connect_postgres(self) -> None:
+        """
+        Opens the pool and runs the checkpointer schema setup (DDL) exactly once.
+        """
+        pool = AsyncConnectionPool(
+            conninfo=settings.DATABASE_URL,
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+            timeout=settings.DB_POOL_TIMEOUT,
+            # Validate connections on checkout so dropped sockets get replaced
+            check=AsyncConnectionPool.check_connection,
+            kwargs={
+                "autocommit": True,
+                "prepare_threshold": 0,
+                "row_factory": dict_row
+            },
+            open=False
+        )
+        try:
+            from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+
+            await pool.open(wait=True, timeout=settings.DB_POOL_TIMEOUT)
+            saver = AsyncPostgresSaver(pool)
+            await saver.setup()
+        except Exception as e:
+            logger.warning(
+                f"Postgres checkpointer unavailable ({e}). "
+                "Using the local checkpointer."
+            )
+            self.db_breaker.record_failure()
+            await pool.close()
+            return
+        self.pool = pool
+        self.postgres_saver = saver
+        self.db_breaker.record_success()
+        if settings.RATE_LIMIT_BACKEND == "postgres":
+            await get_rate_limiter().attach_postgres(pool)
+        logger.info("Postgres checkpointer pool ready.")
+
+    async def _close_postgres(self) -> None:
+        get_rate_limiter().detach_postgres()
+        if self.postgres_saver is not None:
+            self._graphs.pop(id(self.postgres_saver), None)
+        self.postgres_saver = None
+        if self.pool is not None:
+            pool, self.pool = self.pool, None
+            await pool.close()
+
+    async def _open_local_saver(self) -> None:
+        """
+        Swaps the in-memory checkpointer for the SQLite one (WAL, batched commits).
+        """
+        if settings.LOCAL_CHECKPOINTER != "sqlite":
+            return
+        try:
+            self.local_saver = await open_sqlite_saver(settings)
+        except Exception as e:
+            FALLBACKS.inc(kind="checkpointer_local_memory")
+            logger.warning(
+                f"SQLite checkpointer unavailable ({e}). "
+                "Using the in-memory checkpointer."
+            )
+
+    async def _close_local_saver(self) -> None:
+        if self.local_saver is self.memory_saver:
+            return
+        saver, self.local_saver = self.local_saver, self.memory_saver
+        self._graphs.pop(id(saver), None)
+        await saver.aclose()
+
+    def _compiled(self, checkpointer: "BaseCheckpointSaver") -> "CompiledStateGraph":
+        """
+        Returns the graph compiled for `checkpointer`, compiling it only once.
+        Checkpoint reads and writes show up as spans in request traces.
+        """
+        key = id(checkpointer)
+        graph = self._graphs.get(key)
+        if graph is None:
+            graph = self.builder.compile(checkpointer=TracedCheckpointer(checkpointer))
+            self._graphs[key] = graph
+        return graph
+
+    async def _acquire_graph(self) -> Tuple["CompiledStateGraph", bool]:
+        """
+        Picks the Postgres graph when Postgres is healthy, otherwise the local
+        checkpointer's graph. Returns (graph, is_durable).
+        """
+        with span("checkpointer.acquire"):
+            return await self._select_graph()
+
+    async def _select_graph(self) -> Tuple["CompiledStateGraph", bool]:
+        await self.startup()
+        if settings.DATABASE_URL and self.db_breaker.allow_request():
+            if self.postgres_saver is None:
+                # Health-checked reconnection: one trial per breaker window
+                async with self._lifecycle_lock:
+                    if self.postgres_saver is None:
+                        await self._connect_postgres()
+            if self.postgres_saver is not None:
+                return self._compiled(self.postgres_saver), True
+        if settings.DATABASE_URL:
+            FALLBACKS.inc(kind="checkpointer_unavailable")
+        return self._compiled(self.local_saver), False
+
+    # --- Execution ---
+
+    async def run(
+        self,
+        query: str,
+        thread_id: str = DEFAULT_THREAD_ID,
+        client_id: str | None = None
+    ) -> Dict[str, Any]:
+        """
+        Execute the agent with a query and thread_id for persistence. `client_id`
+        (e.g. the caller's address) scopes the per-client rate limits; it defaults to
+        thread_id.
+        """
+        start = time.perf_counter()
+        with (
+            trace_request("agent.run", thread_id) as trace,
+            track_turn_usage() as usage,
+            call_context(thread_id=thread_id)
+        ):
+            try:
+                async with self._admitted(thread_id, client_id, usage):
+                    result = await self._run(query, thread_id)
+            except AdmissionRejected as e:
+                self._record_rejection(thread_id, e)
+                if trace is not None:
+                    trace.root.set(path="rejected", reason=e.reason)
+                return {
+                    "query": GuardrailMiddleware.redact_pii(query),
+                    "answer": e.message,
+                    "rejected": True,
+                    "reason": e.reason,
+                    "retry_after": round(e.retry_after, 1)
+                }
+            if result.get("cached"):
+                path = "cached"
+            else:
+                path = "quick" if result.get("route") else "graph"
+            self._record_turn(
+                thread_id, path, result.get("iterations", 0), usage, start
+            )
+            if trace is not None:
+                trace.root.set(path=path, iterations=result.get("iterations", 0))
+        return result
+
+    async def _run(self, query: str, thread_id: str) -> Dict[str, Any]:
         # 1. Apply Input Guardrails
         safe_query = GuardrailMiddleware.apply_input_guardrails(query)
-        ObservabilityMiddleware.log_event(EVENT_SESSION_START, {"query": safe_query, "thread_id": thread_id})
-        
-        # 1. Try Supabase (Postgres)
-        if settings.DATABASE_URL:
+        ObservabilityMiddleware.log_event(
+            EVENT_SESSION_START, {"query": safe_query, "thread_id": thread_id}
+        )
+
+        # 2. Durable graph if Postgres is healthy
+        graph, durable = await self._acquire_graph()
+
+        # 3. Semantic answer cache: repeat questions skip the graph entirely
+        hit, cache_key = await self._lookup_cached_answer(graph, safe_query, thread_id)
+        if hit is not None:
+            answer = await self._serve_cached_answer(graph, safe_query, thread_id, hit)
+            return {"query": safe_query, "answer": answer, "cached": True}
+
+        if durable:
             try:
-                # Add a timeout to avoid hanging
-                async with AsyncConnectionPool(conninfo=settings.DATABASE_URL, max_size=20, open=True, timeout=10.0) as pool:
-                    saver = AsyncPostgresSaver(pool)
-                    await saver.setup()
-                    graph = self.builder.compile(checkpointer=saver)
-                    return await self._execute(graph, safe_query, thread_id)
+                result = await self._execute(graph, safe_query, thread_id)
+                self.db_breaker.record_success()
+                self._store_answer(cache_key, safe_query, result.get("answer"))
+                return result
+            except PsycopgError as e:
+                self.db_breaker.record_failure()
+                FALLBACKS.inc(kind="checkpointer_memory")
+                logger.warning(
+                    f"Supabase connection failed ({e}). "
+                    "Falling back to the local checkpointer."
+                )
+                graph = self._compiled(self.local_saver)
+
+        # 4. Expert Fallback: local checkpointer (Always works)
+        result = await self._execute(graph, safe_query, thread_id)
+        self._store_answer(cache_key, safe_query, result.get("answer"))
+        return result
+
+    async def _lookup_cached_answer(
+        self, graph: "CompiledStateGraph", query: str, thread_id: str
+    ) -> Tuple[Tuple[str, float] | None, _CacheKey | None]:
+        """
+        Returns (hit, cache_key). `hit` is (answer, similarity) or None; `cache_key` is
+        reused to store the fresh answer so the query is embedded only once.
+        Only standalone turns use the cache: a follow-up depends on its thread's
+        history, so it is neither answered from nor stored into the shared cache.
+        """
+        if self.answer_cache is None or classify_turn(query).is_trivial:
+            # Greetings are answered by the router fast path without an embedding call
+            return None, None
+        if await self._has_history(graph, thread_id):
+            return None, None
+        with span("answer_cache.lookup") as current:
+            try:
+                vector = await self.answer_cache.embed(query)
+                cache_key = (
+                    vector,
+                    detect_language(query),
+                    get_retriever().index_version
+                )
             except Exception as e:
-                print(f"WARNING: Supabase connection failed ({e}). Falling back to MemorySaver.")
-        
-        # 2. Expert Fallback: MemorySaver (Always works)
-        graph = self.builder.compile(checkpointer=self.memory_saver)
-        return await self._execute(graph, safe_query, thread_id)
+                logger.warning(f"Answer cache lookup skipped ({e})")
+                return None, None
+            hit = self.answer_cache.lookup(*cache_key)
+            if current is not None:
+                current.set(hit=hit is not None)
+        CACHE_REQUESTS.inc(cache="answer", result="hit" if hit is not None else "miss")
+        return hit, cache_key
+
+    @staticmethod
+    async def _has_history(graph: "CompiledStateGraph", thread_id: str) -> bool:
+        try:
+            snapshot = await graph.aget_state(
+                {"configurable": {"thread_id": thread_id}}
+            )
+        except Exception as e:
+            logger.warning(
+                f"Could not read thread history, skipping the answer cache ({e})"
+            )
+            return True
+        values = snapshot.values or {}
+        return bool(values.get("messages") or values.get("summary"))
+
+    async def _serve_cached_answer(
+        self,
+        graph: "CompiledStateGraph",
+        query: str,
+        thread_id: str,
+        hit: Tuple[str, float]
+    ) -> str:
+        from langchain_core.messages import AIMessage, HumanMessage
+        answer, similarity = hit
+        answer = GuardrailMiddleware.redact_pii(answer)
+        ObservabilityMiddleware.log_event(
+            "answer_cache_hit",
+            {"thread_id": thread_id, "similarity": round(similarity, 4)}
+        )
+        try:
+            # Keep the thread history consistent, as if the responder had answered
+            await graph.aupdate_state(
+                {"configurable": {"thread_id": thread_id}},
+                {
+                    "query": query,
+                    "answer": answer,
+                    "messages": [
+                        HumanMessage(content=query),
+                        AIMessage(content=answer)
+                    ]
+                },
+                as_node="responder"
+            )
+        except Exception as e:
+            logger.warning(f"Could not record cached turn in thread history ({e})")
+        ObservabilityMiddleware.log_event(
+            EVENT_SESSION_END, {"thread_id": thread_id, "status": "success_cached"}
+        )
+        return answer
+
+    def _store_answer(
+        self, cache_key: _CacheKey | None, query: str, answer: str | None
+    ) -> None:
+        if cache_key is None or not answer:
+            return
+        vector, language, version = cache_key
+        self.answer_cache.store(vector, query, answer, language, version)
 
     async def _execute(self, graph, query, thread_id):
-        from langchain_core.messages import HumanMessage
         config = {"configurable": {"thread_id": thread_id}}
-        initial_input = {
-            "query": query,
-            "messages": [HumanMessage(content=query)]
-        }
+        initial_input = self._initial_input(query)
         try:
             result = await graph.ainvoke(initial_input, config)
+            if result.get("compacted"):
+                self._prune_checkpoints(graph, thread_id)
             if "answer" in result and result["answer"]:
                 result["answer"] = GuardrailMiddleware.redact_pii(result["answer"])
-            ObservabilityMiddleware.log_event(EVENT_SESSION_END, {"thread_id": thread_id, "status": "success"})
+            ObservabilityMiddleware.log_event(
+                EVENT_SESSION_END, {"thread_id": thread_id, "status": "success"}
+            )
             return result
         except Exception as e:
-            ObservabilityMiddleware.log_event("error", {"thread_id": thread_id, "error": str(e)})
+            ObservabilityMiddleware.log_event(
+                "error", {"thread_id": thread_id, "error": str(e)}
+            )
             raise e
 
-    async def stream_run(self, query: str, thread_id: str = "default-thread"):
+    async def stream_run(
+        self,
+        query: str,
+        thread_id: str = DEFAULT_THREAD_ID,
+        client_id: str | None = None
+    ) -> AsyncIterator[AgentEvent]:
         """
-        Stream the agent execution for real-time updates.
+        Stream the agent execution as typed AgentEvents: node progress interleaved with
+        responder tokens as they are generated, then the final answer.
+        A refused turn yields a single answer event flagged `rejected`.
         """
-        from langchain_core.messages import HumanMessage
-        
-        safe_query = GuardrailMiddleware.apply_input_guardrails(query)
-        ObservabilityMiddleware.log_event(EVENT_SESSION_START, {"query": safe_query, "thread_id": thread_id, "mode": "streaming"})
-        
-        # 1. Try Supabase
-        if settings.DATABASE_URL:
+        start = time.perf_counter()
+        path, iterations = "graph", 0
+        with (
+            trace_request("agent.stream_run", thread_id) as trace,
+            track_turn_usage() as usage,
+            call_context(thread_id=thread_id)
+        ):
             try:
-                 async with AsyncConnectionPool(conninfo=settings.DATABASE_URL, max_size=20, open=True, timeout=10.0) as pool:
-                    saver = AsyncPostgresSaver(pool)
-                    await saver.setup()
-                    graph = self.builder.compile(checkpointer=saver)
-                    async for event in graph.astream({"query": safe_query, "messages": [HumanMessage(content=safe_query)]}, {"configurable": {"thread_id": thread_id}}, stream_mode="values"):
+                async with self._admitted(thread_id, client_id, usage):
+                    async for event in self._stream_run(query, thread_id):
+                        if event.node == "quick_responder":
+                            path = "quick"
+                        if event.type == "answer":
+                            path = "cached" if event.data.get("cached") else path
+                            iterations = event.data.get("iterations", 0)
                         yield event
-                    return # Exit after successful streaming
-            except Exception as e:
-                print(f"WARNING: Supabase streaming failed ({e}). Falling back to MemorySaver.")
+            except AdmissionRejected as e:
+                self._record_rejection(thread_id, e)
+                if trace is not None:
+                    trace.root.set(path="rejected", reason=e.reason)
+                yield answer_event(
+                    e.message,
+                    rejected=True,
+                    reason=e.reason,
+                    retry_after=round(e.retry_after, 1)
+                )
+                return
+            self._record_turn(thread_id, path, iterations, usage, start)
+            if trace is not None:
+                trace.root.set(path=path, iterations=iterations)
 
-        # 2. Expert Fallback: MemorySaver (Always works)
-        graph = self.builder.compile(checkpointer=self.memory_saver)
-        async for event in graph.astream({"query": safe_query, "messages": [HumanMessage(content=safe_query)]}, {"configurable": {"thread_id": thread_id}}, stream_mode="values"):
+    @asynccontextmanager
+    async def _admitted(
+        self, thread_id: str, client_id: str | None, usage: Dict[str, float]
+    ) -> AsyncIterator[None]:
+        """
+        Admits a turn: rate limits first (cheap, fails fast), then a concurrency slot.
+        Raises AdmissionRejected before any work is done. On exit the slot is released
+        and the LLM tokens the turn used are charged to its token buckets.
+        The shared default thread is not a session, so it gets no session buckets.
+        """
+        if thread_id == DEFAULT_THREAD_ID:
+            thread_id = None
+        client_id = client_id or thread_id
+        limiter = get_rate_limiter()
+        admission = get_admission_controller()
+        with span("admission"):
+            await limiter.check(thread_id, client_id)
+            await admission.acquire()
+        try:
+            yield
+        finally:
+            admission.release()
+            await limiter.record_tokens(
+                thread_id,
+                client_id,
+                usage["prompt_tokens"] + usage["completion_tokens"]
+            )
+
+    @staticmethod
+    def _record_rejection(thread_id: str, error: AdmissionRejected) -> None:
+        REJECTIONS.inc(reason=error.reason)
+        ObservabilityMiddleware.log_event(
+            "request_rejected",
+            {
+                "thread_id": thread_id,
+                "reason": error.reason,
+                "retry_after": round(error.retry_after, 1)
+            }
+        )
+
+    async def _stream_run(
+        self, query: str, thread_id: str
+    ) -> AsyncIterator[AgentEvent]:
+        safe_query = GuardrailMiddleware.apply_input_guardrails(query)
+        ObservabilityMiddleware.log_event(
+            EVENT_SESSION_START,
+            {"query": safe_query, "thread_id": thread_id, "mode": "streaming"}
+        )
+
+        graph, durable = await self._acquire_graph()
+
+        hit, cache_key = await self._lookup_cached_answer(graph, safe_query, thread_id)
+        if hit is not None:
+            answer = await self._serve_cached_answer(graph, safe_query, thread_id, hit)
+            yield progress_event("answer_cache", "Answer served from cache")
+            yield token_event(answer, node="answer_cache")
+            yield answer_event(answer, cached=True)
+            return
+
+        if durable:
+            emitted = False
+            try:
+                async for event in self._stream_graph(
+                    graph, safe_query, thread_id, cache_key
+                ):
+                    emitted = True
+                    yield event
+                self.db_breaker.record_success()
+                return # Exit after successful streaming
+            except PsycopgError as e:
+                self.db_breaker.record_failure()
+                if emitted:
+                    # Partial output already reached the client; replaying repeats it
+                    raise
+                FALLBACKS.inc(kind="checkpointer_memory")
+                logger.warning(
+                    f"Supabase streaming failed ({e}). "
+                    "Falling back to the local checkpointer."
+                )
+                graph = self._compiled(self.local_saver)
+
+        # Expert Fallback: local checkpointer (Always works)
+        async for event in self._stream_graph(graph, safe_query, thread_id, cache_key):
             yield event
-            
-        ObservabilityMiddleware.log_event(EVENT_SESSION_END, {"thread_id": thread_id, "status": "success_stream"})
+
+    async def _stream_graph(
+        self,
+        graph: "CompiledStateGraph",
+        query: str,
+        thread_id: str,
+        cache_key: _CacheKey | None
+    ) -> AsyncIterator[AgentEvent]:
+        config = {"configurable": {"thread_id": thread_id}}
+        redactor = GuardrailMiddleware.stream_redactor()
+        answer = None
+        iterations = 0
+        compacted = False
+        # Speculative draft tokens are held back until the critic commits the draft;
+        # a draft that fails after its commit is reset and no longer streamed
+        draft: List[str] = []
+        draft_committed = draft_failed = False
+        async for mode, chunk in graph.astream(
+            self._initial_input(query),
+            config,
+            stream_mode=["updates", "messages", "custom"]
+        ):
+            if mode == "custom":
+                decision = chunk.get("speculation") if isinstance(chunk, dict) else None
+                if decision == "commit":
+                    draft_committed = True
+                    text = redactor.feed("".join(draft))
+                    if text:
+                        yield token_event(text, node="responder")
+                elif decision == "reset":
+                    draft_committed, draft_failed = False, True
+                    redactor = GuardrailMiddleware.stream_redactor()
+                    yield reset_event()
+                if decision in ("commit", "discard", "reset"):
+                    draft.clear()
+                continue
+            if mode == "messages":
+                message, metadata = chunk
+                # Only incremental chunks: full messages returned by nodes would
+                # repeat the text
+                if not isinstance(message, AIMessageChunk) or not isinstance(
+                    message.content, str
+                ):
+                    continue
+                if SPECULATIVE_TAG in metadata.get("tags", ()):
+                    if draft_failed:
+                        continue
+                    if not draft_committed:
+                        draft.append(message.content)
+                        continue
+                    node = "responder"
+                elif metadata.get("langgraph_node") in STREAMED_NODES:
+                    node = metadata["langgraph_node"]
+                else:
+                    continue
+                text = redactor.feed(message.content)
+                if text:
+                    yield token_event(text, node=node)
+                continue
+            for node, update in chunk.items():
+                if not isinstance(update, dict):
+                    continue
+                if update.get("answer"):
+                    answer = update["answer"]
+                iterations = update.get("iterations", iterations)
+                compacted = compacted or bool(update.get("compacted"))
+                yield progress_event(node, self._progress_text(node, update))
+
+        tail = redactor.flush()
+        if tail:
+            yield token_event(tail)
+        if compacted:
+            self._prune_checkpoints(graph, thread_id)
+        self._store_answer(cache_key, query, answer)
+        ObservabilityMiddleware.log_event(
+            EVENT_SESSION_END, {"thread_id": thread_id, "status": "success_stream"}
+        )
+        yield answer_event(
+            GuardrailMiddleware.redact_pii(answer or ""), iterations=iterations
+        )
+
+    @staticmethod
+    def _record_turn(
+        thread_id: str,
+        path: str,
+        iterations: int,
+        usage: Dict[str, float],
+        start: float
+    ) -> None:
+        duration = time.perf_counter() - start
+        TURN_DURATION.observe(duration, path=path)
+        TURN_COST.observe(usage["cost_usd"])
+        if path == "graph":
+            TURN_ITERATIONS.observe(iterations)
+        ObservabilityMiddleware.log_event(
+            "turn_usage",
+            {
+                "thread_id": thread_id,
+                "path": path,
+                "seconds": round(duration, 3),
+                "iterations": iterations,
+                "llm_calls": int(usage["llm_calls"]),
+                "prompt_tokens": int(usage["prompt_tokens"]),
+                "completion_tokens": int(usage["completion_tokens"]),
+                "cost_usd": round(usage["cost_usd"], 6)
+            }
+        )
+
+    @staticmethod
+    def _progress_text(node: str, update: Dict[str, Any]) -> str:
+        if node == "researcher" and update.get("completed_steps"):
+            return update["completed_steps"][-1]
+        if node == "critic" and update.get("answer"):
+            return PROGRESS_MESSAGES["responder"]
+        return PROGRESS_MESSAGES.get(node, node)
+
+    def _prune_checkpoints(self, graph: "CompiledStateGraph", thread_id: str) -> None:
+        """
+        Drops the thread's superseded checkpoints (keeps the latest) off the request
+        path. Called only after a turn compacted its history: the old checkpoints then
+        only hold history that now lives in the summary.
+        """
+        if not settings.CHECKPOINT_PRUNE_ENABLED or not supports_pruning(
+            graph.checkpointer
+        ):
+            # Unsupported savers were reported once at startup
+            return
+
+        async def prune() -> None:
+            try:
+                await graph.checkpointer.aprune([thread_id], strategy="keep_latest")
+            except Exception as e:
+                logger.warning(f"Checkpoint pruning failed for {thread_id}: {e}")
+                return
+            ObservabilityMiddleware.log_event(
+                "checkpoints_pruned", {"thread_id": thread_id}
+            )
+
+        task = asyncio.create_task(prune())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    @staticmethod
+    def _initial_input(query: str) -> Dict[str, Any]:
+        from langchain_core.messages import HumanMessage
+        # Reset the previous turn's answer so it is never replayed for this one, and its
+        # research (None clears the list) so references and iterations do not pile up
+        return {
+            "query": query,
+            "answer": None,
+            "compacted": False,
+            "research": None,
+            "iterations": 0,
+            "is_sufficient": False,
+            "completed_steps": [],
+            "messages": [HumanMessage(content=query)]
+        }
 
 # Instance for easy import
 agent = MonteAzulAgent()
@@ -1,3 +1,4 @@
+from typing import Any
 from langgraph.graph import StateGraph, END
 from agent.core.state import AgentState
 from agent.graph.nodes.research_nodes import reflector, researcher, critic, responder
@@ -47,5 +48,13 @@ def create_alpha_codium_graph():
     # 4. Compile the graph
     return workflow.compile()
 
-# Instance of the graph
-graph = create_alpha_codium_graph()
+_graph = None
+
+def __getattr__(name: str) -> Any:
+    # `graph` is compiled on first access instead of at import
+    global _graph
+    if name == "graph":
+        if _graph is None:
+            _graph = create_alpha_codium_graph()
+        return _graph
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,50 +1,173 @@
-from typing import Dict, Any, List
-from langchain_core.messages import HumanMessage, SystemMessage
-from agent.core.llm import get_llm
+import asyncio
+import logging
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Dict, Any, List, Set, Tuple
+from langchain_core.documents import Document
+from langchain_core.messages import (
+    BaseMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage
+)
+from langgraph.config import get_stream_writer
+from agent.core.llm import get_llm_for_node
 from agent.core.state import AgentState
 from agent.core.prompts import (
     REFLECTOR_SYSTEM_PROMPT, 
     CRITIC_SYSTEM_PROMPT, 
     RESPONDER_SYSTEM_PROMPT
 )
-from agent.core.retrieval import RAGRetriever
 from agent.core.middleware import ObservabilityMiddleware
-import json
+from agent.core.metrics import (
+    FALLBACKS,
+    SPECULATIVE_DRAFTS,
+    SPECULATIVE_SAVED,
+    SPECULATIVE_WASTE_COST,
+    SPECULATIVE_WASTE_TOKENS,
+    estimate_cost
+)
+from agent.core.context_packing import ContextPacker, count_tokens
+from agent.core.router import classify_turn, quick_reply
+from agent.core.history import HistoryCompactor, message_tokens, summary_message
+from agent.core.index_sync import chunk_id
+from agent.core.config import get_settings
+from agent.core.scheduler import call_context
 from pydantic import BaseModel, Field
 
+if TYPE_CHECKING:
+    from agent.core.retrieval import RAGRetriever
+
+logger = logging.getLogger(__name__)
+
 # --- Pydantic Models for Structured Output ---
 
 class ReflectionPlan(BaseModel):
     reflection: str = Field(description="Self-critique of existing knowledge.")
-    plan: List[str] = Field(description="List of specific search queries or URLs to research next.")
+    plan: List[str] = Field(
+        description="List of specific search queries or URLs to research next."
+    )
 
 class ResearchSufficiency(BaseModel):
-    is_sufficient: bool = Field(description="True if info is complete, False otherwise.")
-    reasoning: str = Field(description="Explanation of why research is/isn't sufficient.")
+    is_sufficient: bool = Field(
+        description="True if info is complete, False otherwise."
+    )
+    reasoning: str = Field(
+        description="Explanation of why research is/isn't sufficient."
+    )
+
+@lru_cache
+def get_retriever() -> "RAGRetriever":
+    """
+    Opens Chroma and the BM25 index on first use (or during warm-up), not at import.
+    """
+    from agent.core.retrieval import RAGRetriever
+    return RAGRetriever()
+
+# The research loop hands over to the responder after this many reflector rounds
+MAX_RESEARCH_ITERATIONS = 5
+# Tags the speculative responder draft's LLM tokens in the graph's message stream
+SPECULATIVE_TAG = "speculative_draft"
+
+_settings = get_settings()
+context_packer = ContextPacker(
+    token_budget=_settings.RESPONDER_CONTEXT_TOKENS,
+    mmr_lambda=_settings.CONTEXT_MMR_LAMBDA,
+    dedup_threshold=_settings.CONTEXT_DEDUP_THRESHOLD
+)
+history_compactor = HistoryCompactor(
+    keep_turns=_settings.HISTORY_KEEP_TURNS,
+    trigger_tokens=_settings.HISTORY_COMPACT_TRIGGER_TOKENS,
+    summary_tokens=_settings.HISTORY_SUMMARY_TOKENS
+)
+
+async def resolve_research(research: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Expands research references into {"url", "content", "score", "query"} entries,
+    in order. References to chunks removed from the index since retrieval are dropped.
+    """
+    if not research:
+        return []
+    docs = await get_retriever().aget_chunks([r["chunk_id"] for r in research])
+    return [
+        {
+            "url": r["url"],
+            "content": docs[r["chunk_id"]].page_content,
+            "score": r["score"],
+            "query": r["query"]
+        }
+        for r in research
+        if r["chunk_id"] in docs
+    ]
 
-# Initialize Retriever
-retriever = RAGRetriever()
+def research_refs(
+    results: List[Tuple[str, List[Document]]], seen: Set[str]
+) -> List[Dict[str, Any]]:
+    """
+    Compact references to the retrieved chunks not in `seen` (updated in place).
+    """
+    refs = []
+    for q, docs in results:
+        for doc in docs:
+            key = doc.id or chunk_id(doc.metadata.get("source", ""), doc.page_content)
+            if key in seen:
+                continue
+            seen.add(key)
+            refs.append(
+                {
+                    "chunk_id": key,
+                    "score": doc.metadata.get("score"),
+                    "query": q,
+                    "url": doc.metadata.get("source", "Monte Azul Website")
+                }
+            )
+    return refs
 
 # --- Node Functions ---
 
+@ObservabilityMiddleware.log_node_execution("router")
+async def router(state: AgentState) -> Dict[str, Any]:
+    # Deterministic, no-LLM triage of greetings/thanks/small talk
+    route = classify_turn(state["query"])
+    ObservabilityMiddleware.log_event(
+        "route_decision",
+        {
+            "route": "quick_responder" if route.is_trivial else "reflector",
+            "kind": route.kind,
+            "language": route.language
+        }
+    )
+    return {"route": route.kind}
+
+@ObservabilityMiddleware.log_node_execution("quick_responder")
+async def quick_responder(state: AgentState) -> Dict[str, Any]:
+    from langchain_core.messages import AIMessage
+    reply = quick_reply(classify_turn(state["query"]))
+    return {
+        "answer": reply,
+        "messages": [AIMessage(content=reply)]
+    }
+
 @ObservabilityMiddleware.log_node_execution("reflector")
 async def reflector(state: AgentState) -> Dict[str, Any]:
-    llm = get_llm().with_structured_output(ReflectionPlan)
+    llm = get_llm_for_node("reflector").with_structured_output(ReflectionPlan)
     
     # Summarize existing research
     research_summary = ""
-    for r in state.get("research", []):
+    for r in await resolve_research(state.get("research", [])):
         research_summary += f"Chunk: {r['content'][:300]}...\nSource: {r['url']}\n\n"
     
     context = f"""
-    Current Iteration: {state.get('iterations', 0)}
+    Current Iteration: {state.get("iterations", 0)}
     Retrieved Context: {research_summary if research_summary else "No info retrieved yet."}
     """
     
-    result = await llm.ainvoke([
-        SystemMessage(content=REFLECTOR_SYSTEM_PROMPT),
-        HumanMessage(content=f"User Query: {state['query']}\nContext: {context}")
-    ])
+    result = await llm.ainvoke(
+        [
+            SystemMessage(content=REFLECTOR_SYSTEM_PROMPT),
+            HumanMessage(content=f"User Query: {state['query']}\nContext: {context}")
+        ]
+    )
     
     # In RAG mode, the plan consists of search queries for our local index
     return {
@@ -55,67 +178,47 @@ async def reflector(state: AgentState) -> Dict[str, Any]:
 
 @ObservabilityMiddleware.log_node_execution("researcher")
 async def researcher(state: AgentState) -> Dict[str, Any]:
-    new_research = list(state.get("research", []))
+    # Only new references are returned; the research reducer appends them
+    seen = {r["chunk_id"] for r in state.get("research", [])}
     completed = list(state.get("completed_steps", []))
-    import asyncio
     
     # If no plan, use the query itself
     queries = state["plan"] if state["plan"] else [state["query"]]
     
-    # Define an async retrieval helper
-    async def retrieve_query(q):
+    async def retrieve_all(qs: List[str]) -> List[Tuple[str, List[Document]]]:
+        # One batched embedding call + one multi-vector Chroma query for the whole plan
         try:
-            # We wrap the non-async retrieve in an executor if it blocks, 
-            # but since we want to be fast, we run them in parallel.
-            # If retriever.retrieve is blocking (no ainvoke), we run it in a thread.
-            loop = asyncio.get_event_loop()
-            docs = await loop.run_in_executor(None, retriever.retrieve, q)
-            return q, docs
-        except Exception as e:
-            print(f"DEBUG: Researcher error for {q}: {e}")
-            return q, []
-
-    # Run all queries in parallel
-    results = await asyncio.gather(*[retrieve_query(q) for q in queries])
-    
-    found_docs = False
-    for q, docs in results:
-        if docs:
-            found_docs = True
-            for doc in docs:
-                content_preview = doc.page_content[:100]
-                if not any(content_preview in r['content'] for r in new_research):
-                    new_research.append({
-                        "url": doc.metadata.get("source", "Monte Azul Website"),
-                        "content": doc.page_content,
-                        "metadata": doc.metadata
-                    })
+            return list(zip(qs, await get_retriever().aretrieve_many(qs)))
+        except Exception:
+            # Degrade to "nothing found" so the turn can still be answered
+            FALLBACKS.inc(kind="retrieval")
+            logger.exception(f"Retrieval failed for {qs}")
+            return [(q, []) for q in qs]
+
+    results = await retrieve_all(queries)
+    
+    found_docs = any(docs for _, docs in results)
+    new_research = research_refs(results, seen)
     
     # --- AUTO-INGESTION FALLBACK (Docling) ---
     # If no research was found and it's the first step, ingest the official URL
-    from agent.core.config import get_settings
-    settings = get_settings()
     if not found_docs and state.get("iterations", 0) <= 1:
-        print(f"DEBUG: No docs found in DB. Auto-ingesting {settings.WEBSITE_URL} via Docling...")
-        await retriever.ingest_url(settings.WEBSITE_URL)
+        logger.warning(
+            "No docs found in DB. "
+            f"Auto-ingesting {_settings.WEBSITE_URL} via Docling..."
+        )
+        FALLBACKS.inc(kind="auto_ingest")
+        await get_retriever().ingest_url(_settings.WEBSITE_URL)
         # Re-run the queries once after ingestion
-        results = await asyncio.gather(*[retrieve_query(q) for q in queries])
-        for q, docs in results:
-            for doc in docs:
-                content_preview = doc.page_content[:100]
-                if not any(content_preview in r['content'] for r in new_research):
-                    new_research.append({
-                        "url": doc.metadata.get("source", "Monte Azul Website"),
-                        "content": doc.page_content,
-                        "metadata": doc.metadata
-                    })
+        results = await retrieve_all(queries)
+        new_research += research_refs(results, seen)
     
     for q, _ in results:
         completed.append(f"Retrieved context for: {q}")
     
     # Early termination: if no new research found after first attempt
     is_sufficient = state.get("is_sufficient", False)
-    if len(new_research) == len(state.get("research", [])) and state.get("iterations", 0) > 0:
+    if not new_research and state.get("iterations", 0) > 0:
         is_sufficient = True
 
     return {
@@ -125,49 +228,189 @@ async def researcher(state: AgentState) -> Dict[str, Any]:
         "is_sufficient": is_sufficient
     }
 
-@ObservabilityMiddleware.log_node_execution("critic")
-async def critic(state: AgentState) -> Dict[str, Any]:
+async def _critic_verdict(state: AgentState) -> ResearchSufficiency:
     # Optimization: Use a faster model for the critic (gpt-4o-mini) 
     # to reduce internal latency without sacrificing final answer quality.
-    llm = get_llm(model_name="gpt-4o-mini").with_structured_output(ResearchSufficiency)
+    llm = get_llm_for_node("critic").with_structured_output(ResearchSufficiency)
     
     # Since we only have one source, the critic mainly evaluates 
     # if the scraped content is enough for the specific question.
     research_meta = "\n".join([f"- {r['url']}" for r in state.get("research", [])])
     
-    result = await llm.ainvoke([
-        SystemMessage(content=CRITIC_SYSTEM_PROMPT),
-        HumanMessage(content=f"Query: {state['query']}\nSource available: {research_meta}")
-    ])
+    return await llm.ainvoke(
+        [
+            SystemMessage(content=CRITIC_SYSTEM_PROMPT),
+            HumanMessage(
+                content=f"Query: {state['query']}\nSource available: {research_meta}"
+            )
+        ]
+    )
+
+
+@ObservabilityMiddleware.log_node_execution("critic")
+async def critic(state: AgentState) -> Dict[str, Any]:
+    result = await _critic_verdict(state)
     
     return {
         "is_sufficient": result.is_sufficient,
         "reflection": f"Critic Evaluation: {result.reasoning}"
     }
 
-@ObservabilityMiddleware.log_node_execution("responder")
-async def responder(state: AgentState) -> Dict[str, Any]:
-    llm = get_llm()
-    from langchain_core.messages import AIMessage
+async def _responder_messages(state: AgentState) -> List[BaseMessage]:
+    # Pack the most relevant, non-redundant chunks into the token budget
+    context, stats = context_packer.pack(
+        await resolve_research(state.get("research", []))
+    )
+    ObservabilityMiddleware.log_event("context_packing", stats)
     
-    # Provide the full content of the official site since it's only one page
-    context_data = []
-    for r in state.get("research", []):
-        context_data.append({
-            "url": r["url"],
-            "content": str(r["content"])[:8000] # Allow more content as it's the only source
-        })
-    
-    # Construct message list: system + history + context/query
-    messages = [
+    # Message list: system + summary of older turns + recent history + context/query
+    return [
         SystemMessage(content=RESPONDER_SYSTEM_PROMPT),
+        *summary_message(state.get("summary")),
         *state.get("messages", []),
-        HumanMessage(content=f"Context and Query Details: {json.dumps(context_data)}")
+        HumanMessage(
+            content=f"Context and Query Details:\n{context or 'No context retrieved.'}"
+        )
     ]
+
+@ObservabilityMiddleware.log_node_execution("responder")
+async def responder(state: AgentState) -> Dict[str, Any]:
+    llm = get_llm_for_node("responder")
+    from langchain_core.messages import AIMessage
     
-    response = await llm.ainvoke(messages)
+    response = await llm.ainvoke(await _responder_messages(state))
     
     return {
         "answer": response.content,
         "messages": [AIMessage(content=response.content)]
     }
+
+def _stream_writer() -> Callable[[Any], None]:
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        # Called outside a graph run (benchmarks, tests)
+        return lambda _: None
+
+class _Draft:
+    """
+    A responder call started before the critic has decided whether it is needed.
+    """
+    def __init__(self, state: AgentState):
+        self.state = state
+        self.prompt_tokens = 0
+        self.parts: List[str] = []
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self) -> str:
+        # Scheduled like the responder: in the common case it is the answer
+        with call_context(node="responder"):
+            messages = await _responder_messages(self.state)
+            self.prompt_tokens = sum(message_tokens(m) for m in messages)
+            async for chunk in get_llm_for_node("responder").astream(
+                messages, config={"tags": [SPECULATIVE_TAG]}
+            ):
+                if isinstance(chunk.content, str):
+                    self.parts.append(chunk.content)
+        return "".join(self.parts)
+
+    async def discard(self) -> None:
+        self.task.cancel()
+        try:
+            await self.task
+        except (asyncio.CancelledError, Exception):
+            pass
+        completion_tokens = count_tokens("".join(self.parts))
+        SPECULATIVE_DRAFTS.inc(outcome="discarded")
+        SPECULATIVE_WASTE_TOKENS.inc(self.prompt_tokens, kind="prompt")
+        SPECULATIVE_WASTE_TOKENS.inc(completion_tokens, kind="completion")
+        SPECULATIVE_WASTE_COST.inc(
+            estimate_cost(
+                _settings.RESPONDER_MODEL,
+                self.prompt_tokens,
+                completion_tokens,
+                _settings.LLM_PRICES_PER_MTOKEN
+            )
+        )
+
+@ObservabilityMiddleware.log_node_execution("critic")
+async def speculative_critic(state: AgentState) -> Dict[str, Any]:
+    """
+    The critic with the responder drafted concurrently. If the research is accepted
+    (or the iteration cap is reached) the draft becomes the answer and the responder
+    node is skipped; otherwise the draft is cancelled. Draft tokens are tagged
+    SPECULATIVE_TAG and a {"speculation": "commit" | "discard"} custom stream event
+    tells streaming clients whether to release or drop them. Commit happens as soon as
+    the critic accepts, so the rest of the draft streams live; if the draft then fails,
+    {"speculation": "reset"} voids the released text and the responder node answers.
+    """
+    from langchain_core.messages import AIMessage
+    writer = _stream_writer()
+    draft = _Draft(state)
+    start = time.perf_counter()
+    try:
+        result = await _critic_verdict(state)
+    except BaseException:
+        await draft.discard()
+        writer({"speculation": "discard"})
+        raise
+    critic_seconds = time.perf_counter() - start
+    update = {
+        "is_sufficient": result.is_sufficient,
+        "reflection": f"Critic Evaluation: {result.reasoning}"
+    }
+    if not (
+        result.is_sufficient or state.get("iterations", 0) >= MAX_RESEARCH_ITERATIONS
+    ):
+        await draft.discard()
+        writer({"speculation": "discard"})
+        return update
+
+    writer({"speculation": "commit"})
+    try:
+        answer = await draft.task
+    except Exception as e:
+        # The responder node runs instead; clients drop the part already streamed
+        writer({"speculation": "reset"})
+        SPECULATIVE_DRAFTS.inc(outcome="failed")
+        ObservabilityMiddleware.log_event("speculative_draft_failed", {"error": str(e)})
+        return update
+    SPECULATIVE_DRAFTS.inc(outcome="committed")
+    SPECULATIVE_SAVED.observe(critic_seconds)
+    return {
+        **update,
+        "answer": answer,
+        "messages": [AIMessage(content=answer)]
+    }
+
+@ObservabilityMiddleware.log_node_execution("compactor")
+async def compactor(state: AgentState) -> Dict[str, Any]:
+    # Runs after the answer: folds turns beyond the verbatim window into the summary
+    split = history_compactor.split(state.get("messages", []))
+    if split is None:
+        return {}
+    folded, kept = split
+    try:
+        summary = await history_compactor.summarize(
+            get_llm_for_node("compactor"), state.get("summary"), folded
+        )
+    except Exception as e:
+        # Keep the full history this turn; the next one retries
+        FALLBACKS.inc(kind="history_compaction")
+        ObservabilityMiddleware.log_event(
+            "history_compaction_failed", {"error": str(e)}
+        )
+        return {}
+    ObservabilityMiddleware.log_event(
+        "history_compacted",
+        {
+            "folded_messages": len(folded),
+            "kept_messages": len(kept),
+            "summary_chars": len(summary)
+        }
+    )
+    return {
+        "summary": summary,
+        "compacted": True,
+        "messages": [RemoveMessage(id=m.id) for m in folded]
+    }
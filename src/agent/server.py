@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import secrets
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List
+from agent.core.config import get_settings
+from agent.graph.agent import agent
+
+if TYPE_CHECKING:
+    import gradio as gr
+    from fastapi import FastAPI
+
+logger = logging.getLogger(__name__)
+
+def create_app(demo: "gr.Blocks", path: str = "/") -> "FastAPI":
+    """
+    Mounts a Gradio app on FastAPI with liveness/readiness probes, a
+    Prometheus-compatible /metrics endpoint and the recent request traces
+    (/traces, /traces/{trace_id}?format=chrome|otlp). Traces carry thread ids and
+    queries, so those endpoints need `Authorization: Bearer <TRACES_TOKEN>` and are
+    not served at all without a token.
+
+    The port is bound immediately; the agent warms up in the background and
+    /readyz returns 503 until it has finished (/healthz is 200 as soon as the
+    process serves requests).
+    """
+    import gradio as gr
+    from fastapi import Depends, FastAPI, HTTPException, Request
+    from fastapi.responses import JSONResponse, PlainTextResponse
+    from agent.core.metrics import REGISTRY
+    from agent.core.tracing import get_trace_store
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        warm_up = asyncio.create_task(agent.warm_up())
+        try:
+            yield
+        finally:
+            warm_up.cancel()
+            await agent.shutdown()
+
+    app = FastAPI(lifespan=lifespan)
+
+    def require_traces_token(request: Request) -> None:
+        token = get_settings().TRACES_TOKEN
+        if not token:
+            raise HTTPException(status_code=404)
+        supplied = request.headers.get("authorization", "").removeprefix("Bearer ")
+        if not secrets.compare_digest(supplied.encode("utf-8"), token.encode("utf-8")):
+            raise HTTPException(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+
+    @app.get("/healthz")
+    async def healthz() -> Dict[str, str]:
+        return {"status": "alive"}
+
+    @app.get("/readyz")
+    async def readyz() -> JSONResponse:
+        health = agent.health()
+        return JSONResponse(health, status_code=200 if health["ready"] else 503)
+
+    @app.get("/metrics")
+    async def metrics() -> PlainTextResponse:
+        return PlainTextResponse(
+            REGISTRY.render(), media_type="text/plain; version=0.0.4"
+        )
+
+    @app.get("/traces", dependencies=[Depends(require_traces_token)])
+    async def traces(
+        limit: int = 50, thread_id: str | None = None
+    ) -> List[Dict[str, Any]]:
+        return [trace.summary() for trace in get_trace_store().recent(limit, thread_id)]
+
+    @app.get("/traces/{trace_id}", dependencies=[Depends(require_traces_token)])
+    async def trace_detail(trace_id: str, format: str = "chrome") -> Any:
+        trace = get_trace_store().get(trace_id)
+        if trace is None:
+            return JSONResponse({"error": "unknown trace"}, status_code=404)
+        return trace.to_otlp() if format == "otlp" else trace.to_chrome()
+
+    return gr.mount_gradio_app(app, demo.queue(), path=path)
+
+def serve(demo: "gr.Blocks", host: str = "0.0.0.0", port: int = 7860) -> None:
+    import uvicorn
+    uvicorn.run(create_app(demo), host=host, port=port)
@@ -1,6 +1,5 @@
 from langchain_core.tools import tool
-from langchain_docling import DoclingLoader
-from langchain_docling.interfaces import ExportType
+from agent.core.conversion import EXPORT_MARKDOWN, get_conversion_service
 
 @tool
 def scrape_website(url: str) -> str:
@@ -9,15 +8,9 @@ def scrape_website(url: str) -> str:
     This converts complex HTML/Webpages into structured Markdown, preserving tables and lists.
     """
     try:
-        # Initialize the Docling Loader
-        # ExportType.MARKDOWN ensures we get the best format for LLM reasoning
-        loader = DoclingLoader(
-            file_path=[url],
-            export_type=ExportType.MARKDOWN
-        )
-        
-        # Load the content
-        docs = loader.load()
+        # Convert on the shared pool of warm Docling workers
+        # MARKDOWN export ensures we get the best format for LLM reasoning
+        docs = get_conversion_service().convert(url, EXPORT_MARKDOWN)
         
         if docs and len(docs) > 0:
             # Join content if multiple results (unlikely for a single URL)
@@ -1,31 +1,52 @@
 import gradio as gr
 import asyncio
-from agent.graph.agent import agent
+from agent.graph.agent import DEFAULT_THREAD_ID, agent
+from agent.server import serve
 from agent.core.config import get_settings
 
 settings = get_settings()
 
-async def predict(message, history, session_id):
+def client_id(request: gr.Request | None) -> str | None:
+    """
+    The caller's address, used for per-client rate limits.
+    """
+    if request is None or request.client is None:
+        return None
+    return request.client.host
+
+async def predict(message, history, session_id, request: gr.Request):
     """
     Connects the Gradio UI to the Agent's streaming execution.
     """
     if not session_id:
-        session_id = "gradio-user"
-        
+        # Without a typed id, each browser session gets its own thread
+        session_id = getattr(request, "session_hash", None) or DEFAULT_THREAD_ID
+
     response_text = ""
-    async for event in agent.stream_run(query=message, thread_id=session_id):
-        # 1. Update with status updates (research progress)
-        if "completed_steps" in event:
-            latest_step = event["completed_steps"][-1]
-            yield f"⏳ {latest_step}..."
-            
-        # 2. Final Answer
-        if "answer" in event:
-            response_text = event["answer"]
+    async for event in agent.stream_run(
+        query=message, thread_id=session_id, client_id=client_id(request)
+    ):
+        # 1. Status updates (research progress) until the answer starts streaming
+        if event.type == "progress" and not response_text:
+            yield f"⏳ {event.text}..."
+
+        # 2. Answer tokens as they are generated
+        elif event.type == "token":
+            response_text += event.text
+            yield response_text
+
+        # A streamed draft was withdrawn; the real answer follows
+        elif event.type == "reset":
+            response_text = ""
+            yield "⏳ ..."
+
+        # 3. Final (redacted) answer
+        elif event.type == "answer":
+            response_text = event.text or response_text
             yield response_text
 
 def launch_ui():
-    with gr.Blocks() as demo:
+    with gr.Blocks(theme=gr.themes.Soft()) as demo:
         gr.Markdown("# 🤖 Monte Azul Website Agent")
         gr.Markdown("Expert research assistant for https://www.monteazulgroup.com/es")
         
@@ -46,7 +67,8 @@ def launch_ui():
             cache_examples=False
         )
         
-    demo.queue().launch(server_name="0.0.0.0", server_port=7860, theme=gr.themes.Soft())
+    # Binds the port right away; /readyz turns 200 once the agent has warmed up
+    serve(demo, host="0.0.0.0", port=7860)
 
 if __name__ == "__main__":
     launch_ui()
@@ -0,0 +1,12 @@
+"""
+Offline settings for tests that import the agent: must be in place before any
+module reads Settings (they are cached process-wide).
+"""
+import os
+import tempfile
+
+os.environ.update({
+    "OPENAI_API_KEY": "offline-test",
+    "CHROMA_PATH": tempfile.mkdtemp(prefix="monteazul-test-"),
+    "DATABASE_URL": "",
+})
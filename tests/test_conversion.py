@@ -0,0 +1,57 @@
+"""
+ConversionService queue slots and pool recovery, without Docling: the worker
+initializer is swapped for a no-op and jobs are plain builtins.
+
+    PYTHONPATH=src python -m pytest tests
+"""
+import asyncio
+import os
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from agent.core import conversion
+from agent.core.conversion import ConversionService
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(conversion, "_init_worker", os.getpid)
+    service = ConversionService(workers=1, max_pending=1)
+    yield service
+    service.shutdown()
+
+def test_cancelled_wait_for_a_slot_does_not_leak_it(service):
+    async def run():
+        service._slots.acquire()  # the queue is full
+        task = asyncio.create_task(service.aconvert("page.html"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        service._slots.release()
+        # The waiting thread takes the slot now and must hand it back
+        await asyncio.sleep(0.2)
+    asyncio.run(run())
+    assert service._slots.acquire(blocking=False)
+
+def test_broken_pool_is_replaced(service):
+    with pytest.raises(BrokenProcessPool):
+        service._submit_with_slot(os._exit, 1).result()
+    assert service._slots.acquire(blocking=False)
+    service._slots.release()
+    assert service._submit_with_slot(os.getpid).result(timeout=30) > 0
+
+def test_agent_warm_up_starts_the_pool_and_tolerates_failure(monkeypatch):
+    import agent.graph.agent as agent_module
+
+    class Pool:
+        def __init__(self, error=None):
+            self.error, self.warmed = error, False
+
+        def warm_up(self):
+            self.warmed = True
+            if self.error:
+                raise self.error
+
+    for pool in (Pool(), Pool(BrokenProcessPool("no docling"))):
+        monkeypatch.setattr(agent_module, "get_conversion_service", lambda: pool)
+        asyncio.run(agent_module.MonteAzulAgent._warm_up_conversion())
+        assert pool.warmed
@@ -0,0 +1,173 @@
+"""
+SiteCrawler against a local fixture site served through httpx.MockTransport:
+change detection, 304s, removal, resumption and the needs-index flag.
+
+    PYTHONPATH=src python -m pytest tests
+"""
+import asyncio
+import hashlib
+import time
+import httpx
+import pytest
+from agent.core.crawler import SiteCrawler
+
+BASE = "http://fixture.local"
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+class FixtureSite:
+    """
+    A tiny site with ETags. `pages` maps paths to HTML; `hang` paths never answer.
+    """
+    def __init__(self, pages):
+        self.pages = dict(pages)
+        self.hang = set()
+        self.broken = set()
+        self.requests = []
+        self.times = []
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        self.requests.append((path, request.headers.get("if-none-match")))
+        self.times.append(time.monotonic())
+        if path in self.broken:
+            raise RuntimeError(f"unexpected failure for {path}")
+        if path == "/robots.txt":
+            return httpx.Response(404)
+        if path == "/sitemap.xml":
+            locs = "".join(
+                f"<url><loc>{BASE}{p}</loc></url>" for p in self.pages if p != "/"
+            )
+            return httpx.Response(
+                200,
+                text=f'<urlset xmlns="{SITEMAP_NS}">{locs}</urlset>'
+            )
+        if path in self.hang:
+            await asyncio.Event().wait()
+        if path not in self.pages:
+            return httpx.Response(404)
+        etag = '"' + hashlib.sha1(self.pages[path].encode("utf-8")).hexdigest() + '"'
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304)
+        return httpx.Response(
+            200,
+            text=self.pages[path],
+            headers={"content-type": "text/html", "etag": etag}
+        )
+
+def _page(title: str, *links: str) -> str:
+    anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+    return f"<html><body><h1>{title}</h1>{anchors}</body></html>"
+
+@pytest.fixture
+def site():
+    return FixtureSite(
+        {
+            "/": _page("Home", "/a", "/b"),
+            "/a": _page("A", "/c"),
+            "/b": _page("B"),
+            "/c": _page("C")
+        }
+    )
+
+def crawl(
+    site: FixtureSite,
+    tmp_path,
+    timeout: float | None = None,
+    per_host_delay: float = 0.0
+):
+    async def run():
+        client = httpx.AsyncClient(
+            transport=httpx.MockTransport(site.handler), base_url=BASE
+        )
+        crawler = SiteCrawler(
+            BASE + "/",
+            str(tmp_path / "state.sqlite3"),
+            str(tmp_path / "cache"),
+            concurrency=2,
+            per_host_delay=per_host_delay,
+            client=client
+        )
+        try:
+            if timeout is None:
+                return crawler, await crawler.crawl()
+            return crawler, await asyncio.wait_for(crawler.crawl(), timeout)
+        finally:
+            await client.aclose()
+            crawler.state.close()
+    return asyncio.run(run())
+
+def mark_indexed(tmp_path, urls):
+    # What WebsiteIndexer does after a successful sync_source
+    from agent.core.crawler import CrawlState
+    state = CrawlState(str(tmp_path / "state.sqlite3"))
+    for url in urls:
+        state.mark_indexed(url)
+    state.close()
+
+def test_first_crawl_reports_every_page_changed(site, tmp_path):
+    _, result = crawl(site, tmp_path)
+    assert sorted(result["changed"]) == [
+        BASE + "/",
+        BASE + "/a",
+        BASE + "/b",
+        BASE + "/c"
+    ]
+    assert result["unchanged"] == result["removed"] == result["failed"] == []
+
+def test_indexed_pages_are_revalidated_with_304(site, tmp_path):
+    _, first = crawl(site, tmp_path)
+    mark_indexed(tmp_path, first["changed"])
+    site.requests.clear()
+    _, second = crawl(site, tmp_path)
+    assert second["changed"] == []
+    assert len(second["unchanged"]) == 4
+    assert all(etag for path, etag in site.requests if path in ("/a", "/b", "/c"))
+
+def test_changed_page_is_detected(site, tmp_path):
+    _, first = crawl(site, tmp_path)
+    mark_indexed(tmp_path, first["changed"])
+    site.pages["/b"] = _page("B, updated")
+    _, second = crawl(site, tmp_path)
+    assert second["changed"] == [BASE + "/b"]
+
+def test_removed_page_is_reported(site, tmp_path):
+    _, first = crawl(site, tmp_path)
+    mark_indexed(tmp_path, first["changed"])
+    # Still linked from "/a", but gone
+    del site.pages["/c"]
+    _, second = crawl(site, tmp_path)
+    assert second["removed"] == [BASE + "/c"]
+    assert len(second["unchanged"]) == 3
+
+def test_page_not_indexed_is_reported_changed_again(site, tmp_path):
+    _, first = crawl(site, tmp_path)
+    # "/b" failed conversion (or the process died before its sync)
+    mark_indexed(tmp_path, [u for u in first["changed"] if u != BASE + "/b"])
+    _, second = crawl(site, tmp_path)
+    assert second["changed"] == [BASE + "/b"]
+    assert len(second["unchanged"]) == 3
+
+def test_interrupted_crawl_resumes_from_the_frontier(site, tmp_path):
+    site.hang.add("/c")
+    with pytest.raises(asyncio.TimeoutError):
+        crawl(site, tmp_path, timeout=0.5)
+    site.hang.clear()
+    site.requests.clear()
+    _, resumed = crawl(site, tmp_path)
+    fetched = {path for path, _ in site.requests}
+    assert BASE + "/c" in resumed["changed"]
+    # Pages finished before the interruption are not fetched again
+    assert "/" not in fetched and "/b" not in fetched
+
+def test_unexpected_errors_fail_the_page_not_the_crawl(site, tmp_path):
+    # More broken pages than workers: a dead worker would hang the crawl
+    site.broken.update({"/a", "/b", "/c"})
+    _, result = crawl(site, tmp_path, timeout=5)
+    assert sorted(result["failed"]) == [BASE + "/a", BASE + "/b", BASE + "/c"]
+    assert result["changed"] == [BASE + "/"]
+
+def test_robots_and_sitemap_fetches_are_throttled(site, tmp_path):
+    crawl(site, tmp_path, per_host_delay=0.05)
+    assert [path for path, _ in site.requests[:2]] == ["/robots.txt", "/sitemap.xml"]
+    gaps = [b - a for a, b in zip(site.times, site.times[1:])]
+    assert min(gaps) >= 0.04
@@ -0,0 +1,102 @@
+"""
+History compaction: the compactor folds old turns into the summary and removes
+them from the thread, and only compacted turns prune their checkpoints.
+
+    PYTHONPATH=src python -m pytest tests
+"""
+import asyncio
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage
+from langgraph.checkpoint.memory import InMemorySaver
+import agent.graph.nodes.research_nodes as nodes
+from agent.core.checkpointers import BoundedMemorySaver, supports_pruning
+from agent.core.history import HistoryCompactor
+
+class FakeSummarizer:
+    def __init__(self):
+        self.prompts = []
+
+    async def ainvoke(self, messages):
+        self.prompts.append(messages[-1].content)
+        return AIMessage(content=" resumen de la conversación ")
+
+def conversation(turns: int):
+    messages = []
+    for n in range(turns):
+        messages += [
+            HumanMessage(content=f"pregunta {n} " * 20, id=f"h{n}"),
+            AIMessage(content=f"respuesta {n} " * 20, id=f"a{n}"),
+        ]
+    return messages
+
+@pytest.fixture
+def summarizer(monkeypatch):
+    llm = FakeSummarizer()
+    monkeypatch.setattr(
+        nodes, "history_compactor", HistoryCompactor(keep_turns=2, trigger_tokens=100)
+    )
+    monkeypatch.setattr(nodes, "get_llm_for_node", lambda node: llm)
+    return llm
+
+def test_compactor_folds_old_turns_into_the_summary(summarizer):
+    update = asyncio.run(
+        nodes.compactor({"messages": conversation(4), "summary": "antes"})
+    )
+    assert update["compacted"] is True
+    assert update["summary"] == "resumen de la conversación"
+    assert all(isinstance(m, RemoveMessage) for m in update["messages"])
+    assert [m.id for m in update["messages"]] == ["h0", "a0", "h1", "a1"]
+    # The previous summary and the folded turns go into the summarization prompt
+    assert "antes" in summarizer.prompts[0] and "pregunta 1" in summarizer.prompts[0]
+
+def test_short_history_is_left_alone(summarizer):
+    assert (
+        asyncio.run(nodes.compactor({"messages": conversation(2), "summary": None}))
+        == {}
+    )
+    assert summarizer.prompts == []
+
+def test_failed_summary_keeps_the_history(monkeypatch, summarizer):
+    async def fail(messages):
+        raise RuntimeError("provider error")
+    monkeypatch.setattr(summarizer, "ainvoke", fail)
+    assert (
+        asyncio.run(nodes.compactor({"messages": conversation(4), "summary": None}))
+        == {}
+    )
+
+def test_pruning_support_is_detected():
+    assert not supports_pruning(InMemorySaver())
+    assert supports_pruning(BoundedMemorySaver())
+
+class ScriptedGraph:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def astream(self, inputs, config, stream_mode):
+        for chunk in self.chunks:
+            yield chunk
+
+@pytest.mark.parametrize("compacted", [False, True])
+def test_only_compacted_turns_prune_checkpoints(monkeypatch, compacted):
+    from agent.graph.agent import MonteAzulAgent
+    agent = MonteAzulAgent()
+    pruned = []
+    monkeypatch.setattr(
+        agent, "_prune_checkpoints", lambda graph, thread_id: pruned.append(thread_id)
+    )
+    compactor_update = {"compacted": True, "summary": "s"} if compacted else {}
+    graph = ScriptedGraph(
+        [
+            ("updates", {"responder": {"answer": "Prado es un proyecto."}}),
+            ("updates", {"compactor": compactor_update})
+        ]
+    )
+
+    async def run():
+        return [
+            e async for e in agent._stream_graph(graph, "¿Qué es Prado?", "t1", None)
+        ]
+
+    asyncio.run(run())
+    assert pruned == (["t1"] if compacted else [])
@@ -0,0 +1,132 @@
+"""
+Rate limiting and admission control: bucket scoping, token debt, the SQLite store
+and the AdmissionController queue.
+
+    PYTHONPATH=src python -m pytest tests
+"""
+import asyncio
+import pytest
+from agent.core.rate_limit import (
+    AdmissionController,
+    BucketLimit,
+    Overloaded,
+    RateLimiter,
+    RateLimitExceeded,
+    SQLiteBucketStore
+)
+
+def limiter():
+    return RateLimiter(
+        [BucketLimit("session", "requests", 2), BucketLimit("client", "requests", 3)]
+    )
+
+def test_each_session_has_its_own_bucket():
+    async def run():
+        rl = limiter()
+        for thread_id in ("s1", "s1", "s2", "s2"):
+            await rl.check(thread_id, None)
+        with pytest.raises(RateLimitExceeded) as exc:
+            await rl.check("s1", None)
+        assert exc.value.reason == "session_requests"
+    asyncio.run(run())
+
+def test_turns_without_a_session_only_hit_the_client_bucket():
+    async def run():
+        rl = limiter()
+        for _ in range(3):
+            await rl.check(None, "10.0.0.1")
+        with pytest.raises(RateLimitExceeded) as exc:
+            await rl.check(None, "10.0.0.1")
+        assert exc.value.reason == "client_requests"
+        await rl.check(None, "10.0.0.2")
+        await rl.check(None, None)
+    asyncio.run(run())
+
+def test_tokens_charged_after_a_turn_refuse_the_next_one():
+    async def run():
+        rl = RateLimiter([BucketLimit("session", "tokens", 100)])
+        await rl.check("s1", None)
+        await rl.record_tokens("s1", None, 150)
+        with pytest.raises(RateLimitExceeded) as exc:
+            await rl.check("s1", None)
+        assert exc.value.reason == "session_tokens"
+        # 50 tokens of debt plus one, refilled at 100 per minute
+        assert 25 < exc.value.retry_after < 35
+    asyncio.run(run())
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "limits.sqlite3")
+    first, second = SQLiteBucketStore(path), SQLiteBucketStore(path)
+    assert first.take_sync("k", 1, 1, capacity=2, rate=0.01).granted
+    assert second.take_sync("k", 1, 1, capacity=2, rate=0.01).granted
+    refused = first.take_sync("k", 1, 1, capacity=2, rate=0.01)
+    assert not refused.granted and refused.retry_after > 0
+
+def test_sqlite_store_backs_the_limiter(tmp_path):
+    async def run():
+        rl = RateLimiter(
+            [BucketLimit("client", "requests", 1)],
+            SQLiteBucketStore(str(tmp_path / "l.sqlite3"))
+        )
+        await rl.check(None, "10.0.0.1")
+        with pytest.raises(RateLimitExceeded):
+            await rl.check(None, "10.0.0.1")
+    asyncio.run(run())
+
+def test_admission_hands_slots_over_in_fifo_order():
+    async def run():
+        admission = AdmissionController(max_in_flight=1, max_queue=2, queue_timeout=5)
+        order = []
+
+        async def turn(name):
+            await admission.acquire()
+            order.append(name)
+
+        await admission.acquire()
+        waiters = [asyncio.create_task(turn("a")), asyncio.create_task(turn("b"))]
+        await asyncio.sleep(0)
+        assert admission.queued == 2
+        admission.release()
+        await asyncio.sleep(0)
+        admission.release()
+        await asyncio.gather(*waiters)
+        assert order == ["a", "b"] and admission.in_flight == 1
+    asyncio.run(run())
+
+def test_admission_sheds_when_the_queue_is_full():
+    async def run():
+        admission = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5)
+        await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await admission.acquire()
+        waiter.cancel()
+    asyncio.run(run())
+
+def test_admission_times_out_in_the_queue():
+    async def run():
+        admission = AdmissionController(
+            max_in_flight=1, max_queue=1, queue_timeout=0.05
+        )
+        await admission.acquire()
+        with pytest.raises(Overloaded):
+            await admission.acquire()
+        assert admission.queued == 0 and admission.in_flight == 1
+    asyncio.run(run())
+
+def test_cancelled_waiter_does_not_keep_a_slot():
+    async def run():
+        admission = AdmissionController(max_in_flight=1, max_queue=2, queue_timeout=5)
+        await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        # The slot is handed to the waiter just as it is cancelled: it must pass it on
+        admission.release()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert admission.in_flight == 0 and admission.queued == 0
+        await admission.acquire()
+        assert admission.in_flight == 1
+    asyncio.run(run())
@@ -0,0 +1,68 @@
+"""
+PII redaction: Luhn-checked cards, phone boundaries, long numbers and streaming
+with arbitrary chunk boundaries.
+
+    PYTHONPATH=src python -m pytest tests
+"""
+import random
+import pytest
+from agent.core.redaction import PIIRedactor, StreamingRedactor
+
+redactor = PIIRedactor()
+
+@pytest.mark.parametrize("text,expected", [
+    # Luhn-valid cards, contiguous and in card-style groups
+    ("card 4111111111111111 ok", "card [REDACTED_CREDIT_CARD] ok"),
+    ("card 4111 1111 1111 1111 ok", "card [REDACTED_CREDIT_CARD] ok"),
+    ("amex 3782 822463 10005.", "amex [REDACTED_CREDIT_CARD]."),
+    # Spaced groups failing Luhn are tables, not cards
+    ("precios 4111 1111 1111 1112 EUR", "precios 4111 1111 1111 1112 EUR"),
+    # Long unbroken runs that fail Luhn are still masked
+    ("ref 4111111111111112 ok", "ref [REDACTED_NUMBER] ok"),
+    ("iban 12345678901234567890123", "iban [REDACTED_NUMBER]"),
+    # Phones: 10 to 15 digits, "+" included
+    ("tel 123456789", "tel 123456789"),
+    ("tel 6001234567", "tel [REDACTED_PHONE]"),
+    ("tel +34600123456", "tel [REDACTED_PHONE]"),
+    ("tel 123456789012345", "tel [REDACTED_PHONE]"),
+    ("year 2024 and price 1500", "year 2024 and price 1500"),
+    ("mail ventas@monteazulgroup.com now", "mail [REDACTED_EMAIL] now"),
+    ("600123456789@x.com", "[REDACTED_EMAIL]"),
+])
+def test_redact(text, expected):
+    assert redactor.redact(text) == expected
+
+SAMPLE = (
+    "Escríbenos a ventas@monteazulgroup.com o llama al +34600123456. "
+    "Tarjeta 4111 1111 1111 1111, referencia 4111111111111112, precios 1200 1350 1500. "
+    "Código 2024-05 y teléfono 6001234567 "
+)
+
+def stream(text, sizes):
+    streaming = StreamingRedactor(redactor)
+    out, i = [], 0
+    for size in sizes:
+        out.append(streaming.feed(text[i:i + size]))
+        i += size
+    out.append(streaming.feed(text[i:]))
+    out.append(streaming.flush())
+    return "".join(out)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_stream_matches_batch_for_any_chunking(seed):
+    rng = random.Random(seed)
+    text = SAMPLE * 3
+    sizes = [rng.randint(1, 7) for _ in range(len(text) // 3)]
+    assert stream(text, sizes) == redactor.redact(text)
+
+def test_stream_holds_back_a_number_split_across_chunks():
+    streaming = StreamingRedactor(redactor)
+    assert streaming.feed("tarjeta 4111 1111") == "tarjeta "
+    assert streaming.feed(" 1111 1111") == ""
+    assert streaming.feed(" gracias") == "[REDACTED_CREDIT_CARD] "
+    assert streaming.flush() == "gracias"
+
+def test_stream_releases_an_overlong_token():
+    streaming = StreamingRedactor(redactor)
+    released = streaming.feed("x" * (StreamingRedactor.MAX_HOLDBACK + 10))
+    assert len(released) == 10
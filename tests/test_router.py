@@ -0,0 +1,97 @@
+"""
+The zero-LLM router (agent.core.router.classify_turn) against labeled turns.
+Each entry is (text, expected_kind, expected_language); kind None means "research".
+`python -m benchmarks.router_eval` reuses the corpus for accuracy and latency.
+
+    PYTHONPATH=src python -m pytest tests
+"""
+import pytest
+from agent.core.router import classify_turn, quick_reply
+
+ROUTER_CORPUS = [
+    # Greetings
+    ("hola", "greeting", "es"),
+    ("Hola!", "greeting", "es"),
+    ("holaaa", "greeting", "es"),
+    ("¡Hola, buenos días!", "greeting", "es"),
+    ("buenas tardes", "greeting", "es"),
+    ("Buenas noches", "greeting", "es"),
+    ("buen día", "greeting", "es"),
+    ("qué tal", "greeting", "es"),
+    ("hola amigo", "greeting", "es"),
+    ("saludos", "greeting", "es"),
+    ("hi", "greeting", "en"),
+    ("Hello!", "greeting", "en"),
+    ("hey there", "greeting", "en"),
+    ("good morning", "greeting", "en"),
+    ("Good evening", "greeting", "en"),
+    # Thanks
+    ("gracias", "thanks", "es"),
+    ("Muchas gracias!", "thanks", "es"),
+    ("ok gracias", "thanks", "es"),
+    ("perfecto, muchas gracias", "thanks", "es"),
+    ("te agradezco", "thanks", "es"),
+    ("thanks", "thanks", "en"),
+    ("Thank you so much!", "thanks", "en"),
+    ("great, thanks", "thanks", "en"),
+    # Farewells
+    ("adiós", "farewell", "es"),
+    ("chao", "farewell", "es"),
+    ("hasta luego", "farewell", "es"),
+    ("nos vemos", "farewell", "es"),
+    ("bye", "farewell", "en"),
+    ("Goodbye!", "farewell", "en"),
+    ("see you later", "farewell", "en"),
+    # Small talk
+    ("¿cómo estás?", "small_talk", "es"),
+    ("hola, ¿cómo estás?", "small_talk", "es"),
+    ("¿quién eres?", "small_talk", "es"),
+    ("how are you?", "small_talk", "en"),
+    ("hi, how are you doing?", "small_talk", "en"),
+    ("who are you?", "small_talk", "en"),
+    # Acknowledgements of the previous answer: a neutral reply, not the introduction
+    ("ok", "acknowledgement", "es"),
+    ("genial", "acknowledgement", "es"),
+    ("vale, entendido", "acknowledgement", "es"),
+    ("great", "acknowledgement", "en"),
+    ("cool", "acknowledgement", "en"),
+    ("ok got it", "acknowledgement", "en"),
+    # Research questions (must NOT be short-circuited)
+    ("¿Qué es Prado?", None, "es"),
+    ("hola, ¿qué servicios ofrece Monte Azul?", None, "es"),
+    ("¿Cómo puedo contactar a ventas?", None, "es"),
+    ("¿Quiénes son los directivos?", None, "es"),
+    ("gracias, ¿y cuál es el teléfono?", None, "es"),
+    ("¿Dónde están ubicadas las oficinas?", None, "es"),
+    ("Buenos días, necesito información de proyectos", None, "es"),
+    ("¿Cómo está estructurado el grupo Monte Azul?", None, "es"),
+    ("hola quiero comprar un departamento", None, "es"),
+    ("What is Monte Azul Group?", None, "en"),
+    ("What is Prado?", None, "en"),
+    ("How can I contact sales?", None, "en"),
+    ("hi, what services do you offer?", None, "en"),
+    ("thanks, and where is the office?", None, "en"),
+    ("Who are the directors?", None, "en"),
+    ("How are the projects financed?", None, "en"),
+    ("hello I want to know about Prado", None, "en"),
+    ("ok, ¿y los precios?", None, "es"),
+    ("ola", None, "es"),
+    ("sup", None, "en"),
+    ("ty", None, "en"),
+]
+
+@pytest.mark.parametrize("text,kind,language", ROUTER_CORPUS)
+def test_corpus_turn_is_routed_as_labeled(text, kind, language):
+    route = classify_turn(text)
+    assert route.kind == kind
+    if kind is not None:
+        assert route.language == language
+
+def test_no_question_is_routed_as_small_talk():
+    questions = [text for text, kind, _ in ROUTER_CORPUS if kind is None]
+    assert [text for text in questions if classify_turn(text).is_trivial] == []
+
+def test_acknowledgements_do_not_get_the_introduction():
+    for text, kind, _ in ROUTER_CORPUS:
+        if kind == "acknowledgement":
+            assert "asistente" not in quick_reply(classify_turn(text)).lower()
@@ -0,0 +1,127 @@
+"""
+LLMScheduler dispatch order and provider feedback, driven by a fake clock:
+priorities, round-robin across threads, the starvation bypass, AIMD on 429 and
+shedding.
+
+    PYTHONPATH=src python -m pytest tests
+"""
+import asyncio
+import pytest
+from agent.core.scheduler import (
+    BACKGROUND,
+    INTERACTIVE,
+    RESEARCH,
+    LLMScheduler,
+    SchedulerOverloaded
+)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def grant_order(scheduler, waiters):
+    """
+    Releases the held slot once per waiter and records who was granted next.
+    """
+    order, pending = [], dict(waiters)
+    for _ in range(len(waiters)):
+        scheduler.release()
+        granted = [name for name, w in pending.items() if w.granted]
+        assert len(granted) == 1
+        order.append(granted[0])
+        del pending[granted[0]]
+    return order
+
+def run(test):
+    # Async waiters are woken through the running loop
+    async def main():
+        test()
+    asyncio.run(main())
+
+def scheduler(**kwargs):
+    kwargs.setdefault("clock", FakeClock())
+    s = LLMScheduler(max_concurrency=1, **kwargs)
+    # Occupy the only slot so everything after it queues
+    assert s._enqueue(BACKGROUND, "holder", 0, is_async=True).granted
+    return s
+
+def test_interactive_calls_go_before_research():
+    def test():
+        s = scheduler()
+        waiters = [
+            ("research", s._enqueue(RESEARCH, "t1", 0, is_async=True)),
+            ("background", s._enqueue(BACKGROUND, "t1", 0, is_async=True)),
+            ("interactive", s._enqueue(INTERACTIVE, "t2", 0, is_async=True)),
+        ]
+        assert grant_order(s, waiters) == ["interactive", "research", "background"]
+    run(test)
+
+def test_tenants_alternate_within_a_priority():
+    def test():
+        s = scheduler()
+        names = ("a1", "a2", "a3", "b1", "b2")
+        waiters = [(n, s._enqueue(RESEARCH, n[0], 0, is_async=True)) for n in names]
+        assert grant_order(s, waiters) == ["a1", "b1", "a2", "b2", "a3"]
+    run(test)
+
+def test_lower_priority_gets_through_after_starvation_limit():
+    def test():
+        s = scheduler(starvation_limit=2)
+        waiters = [("research", s._enqueue(RESEARCH, "t0", 0, is_async=True))]
+        for n in range(1, 5):
+            waiters.append(
+                (f"i{n}", s._enqueue(INTERACTIVE, f"t{n}", 0, is_async=True))
+            )
+        assert grant_order(s, waiters) == ["i1", "i2", "research", "i3", "i4"]
+    run(test)
+
+def test_429_halves_the_limit_once_per_episode():
+    clock = FakeClock()
+    s = LLMScheduler(max_concurrency=8, clock=clock)
+    s.record_response(429, retry_after=5)
+    assert s.limit == 4
+    clock.now = 1.0  # same episode: concurrent 429s do not compound
+    s.record_response(429, retry_after=5)
+    assert s.limit == 4
+    clock.now = 10.0
+    s.record_response(429, retry_after=1)
+    assert s.limit == 2
+    for _ in range(20):
+        s.record_response(200)
+    assert 2 < s.limit <= 8
+
+def test_dispatching_pauses_for_retry_after():
+    def test():
+        clock = FakeClock()
+        s = LLMScheduler(max_concurrency=4, clock=clock)
+        s.record_response(429, retry_after=5)
+        waiter = s._enqueue(INTERACTIVE, "t1", 0, is_async=True)
+        assert not waiter.granted
+        s._timer.cancel()
+        clock.now = 5.0
+        s._on_timer()
+        assert waiter.granted
+    run(test)
+
+def test_calls_beyond_the_queue_are_shed():
+    def test():
+        s = scheduler(max_queue=1)
+        s._enqueue(RESEARCH, "t1", 0, is_async=True)
+        with pytest.raises(SchedulerOverloaded) as exc:
+            s._enqueue(RESEARCH, "t2", 0, is_async=True)
+        assert exc.value.reason == "queue_full"
+    run(test)
+
+def test_queue_timeout_sheds_the_call():
+    async def main():
+        s = LLMScheduler(max_concurrency=1, queue_timeout=0.05)
+        await s.acquire(RESEARCH, "t1")
+        with pytest.raises(SchedulerOverloaded) as exc:
+            await s.acquire(RESEARCH, "t2")
+        assert exc.value.reason == "timeout"
+        s.release()
+        await s.acquire(INTERACTIVE, "t3")
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""
+SparseIndex ID storage and analyzer bookkeeping.
+
+    PYTHONPATH=src python -m pytest tests
+"""
+import multiprocessing
+import pytest
+from agent.core import sparse_index
+from agent.core.sparse_index import MAX_ID_BYTES, SparseIndex, ensure_synced
+from agent.core.text_analysis import SpanishAnalyzer
+
+class _Collection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def count(self):
+        return len(self.docs)
+
+class FakeVectorStore:
+    def __init__(self, docs):
+        self._collection = _Collection(docs)
+
+    def get(self, limit, offset, include):
+        page = list(self._collection.docs.items())[offset:offset + limit]
+        return {"ids": [i for i, _ in page], "documents": [d for _, d in page]}
+
+def test_long_ids_are_rejected_not_truncated(tmp_path):
+    index = SparseIndex(str(tmp_path))
+    with pytest.raises(ValueError):
+        index.add(["x" * (MAX_ID_BYTES + 1)], ["Servicios de construcción"])
+    assert index.num_docs == 0
+
+def test_deleting_a_long_id_keeps_its_prefix(tmp_path):
+    index = SparseIndex(str(tmp_path))
+    kept = "x" * MAX_ID_BYTES
+    index.add([kept], ["Servicios de construcción"])
+    index.delete([kept + "-other"])
+    assert [doc_id for doc_id, _ in index.search("construcción")] == [kept]
+
+def test_index_from_another_analyzer_is_rebuilt(tmp_path):
+    docs = {"a": "Proyectos residenciales en Prado", "b": "Contacto de ventas"}
+    store = FakeVectorStore(docs)
+    ensure_synced(
+        SparseIndex(str(tmp_path), analyzer=SpanishAnalyzer(min_token_length=5)), store
+    )
+
+    index = SparseIndex(str(tmp_path))
+    assert index.num_docs == len(docs) and not index.analyzer_matches
+    ensure_synced(index, store)
+    assert index.analyzer_matches
+    assert SparseIndex(str(tmp_path)).analyzer_matches
+
+def test_repeated_id_in_a_batch_keeps_the_last_text(tmp_path):
+    index = SparseIndex(str(tmp_path))
+    index.add(
+        ["a", "b", "a"],
+        ["Proyectos en Prado", "Contacto de ventas", "Servicios de construcción"]
+    )
+    assert index.num_docs == 2
+    assert index.search("prado") == []
+    assert [doc_id for doc_id, _ in index.search("construcción")] == ["a"]
+
+def _add_batches(path, prefix, batches):
+    index = SparseIndex(path, max_segments=3)
+    for n in range(batches):
+        index.add([f"{prefix}-{n}"], [f"Documento {prefix} número {n} sobre Prado"])
+
+@pytest.mark.skipif(sparse_index.fcntl is None, reason="needs fcntl")
+def test_concurrent_writer_processes_keep_each_others_documents(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    writers = [
+        ctx.Process(target=_add_batches, args=(str(tmp_path), p, 15))
+        for p in ("x", "y")
+    ]
+    for w in writers:
+        w.start()
+    for w in writers:
+        w.join(60)
+        assert w.exitcode == 0
+    index = SparseIndex(str(tmp_path))
+    assert index.num_docs == 30
+    assert len(index.search("prado", k=50)) == 30
@@ -0,0 +1,110 @@
+"""
+speculative_critic ordering with a fake responder LLM: the draft is committed when
+the critic accepts, discarded when it does not, and reset if it fails after commit.
+
+    PYTHONPATH=src python -m pytest tests
+"""
+import asyncio
+import pytest
+from langchain_core.messages import AIMessageChunk
+import agent.graph.nodes.research_nodes as nodes
+
+class FakeResponder:
+    def __init__(self, parts, fail_after=None):
+        self.parts = parts
+        self.fail_after = fail_after
+
+    async def astream(self, messages, config=None):
+        for i, part in enumerate(self.parts):
+            if i == self.fail_after:
+                raise RuntimeError("provider error")
+            await asyncio.sleep(0.01)
+            yield AIMessageChunk(content=part)
+
+@pytest.fixture
+def run_critic(monkeypatch):
+    def run(sufficient: bool, responder: FakeResponder):
+        events = []
+
+        async def verdict(state):
+            return nodes.ResearchSufficiency(is_sufficient=sufficient, reasoning="test")
+
+        monkeypatch.setattr(nodes, "_critic_verdict", verdict)
+        monkeypatch.setattr(nodes, "get_llm_for_node", lambda node: responder)
+        monkeypatch.setattr(nodes, "_stream_writer", lambda: events.append)
+        state = {
+            "query": "¿Qué es Prado?",
+            "research": [],
+            "messages": [],
+            "iterations": 1
+        }
+        update = asyncio.run(nodes.speculative_critic(state))
+        return update, [e["speculation"] for e in events]
+    return run
+
+def test_accepted_draft_is_committed_as_the_answer(run_critic):
+    update, events = run_critic(True, FakeResponder(["Prado es ", "un proyecto."]))
+    assert events == ["commit"]
+    assert update["answer"] == "Prado es un proyecto."
+
+def test_rejected_draft_is_discarded(run_critic):
+    update, events = run_critic(False, FakeResponder(["Prado es ", "un proyecto."]))
+    assert events == ["discard"]
+    assert "answer" not in update and update["is_sufficient"] is False
+
+def test_draft_failing_after_commit_is_reset(run_critic):
+    update, events = run_critic(
+        True, FakeResponder(["Prado es ", "un proyecto."], fail_after=1)
+    )
+    assert events == ["commit", "reset"]
+    # No answer: the responder node answers instead
+    assert "answer" not in update and update["is_sufficient"] is True
+
+class ScriptedGraph:
+    """
+    Replays a fixed astream() sequence, as the compiled graph would emit it.
+    """
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def astream(self, inputs, config, stream_mode):
+        for chunk in self.chunks:
+            yield chunk
+
+def _draft_token(text):
+    return "messages", (AIMessageChunk(content=text), {"tags": [nodes.SPECULATIVE_TAG]})
+
+def _responder_token(text):
+    return "messages", (AIMessageChunk(content=text), {"langgraph_node": "responder"})
+
+def test_stream_clears_a_reset_draft():
+    from agent.graph.agent import MonteAzulAgent
+    graph = ScriptedGraph(
+        [
+            _draft_token("Prado "),
+            ("custom", {"speculation": "commit"}),
+            _draft_token("es"),
+            ("custom", {"speculation": "reset"}),
+            _draft_token(" ignored"),
+            ("updates", {"critic": {"is_sufficient": True}}),
+            _responder_token("Prado es un proyecto."),
+            ("updates", {"responder": {"answer": "Prado es un proyecto."}})
+        ]
+    )
+
+    async def collect():
+        agent = MonteAzulAgent()
+        return [
+            e async for e in agent._stream_graph(graph, "¿Qué es Prado?", "t1", None)
+        ]
+
+    events = asyncio.run(collect())
+    kinds = [e.type for e in events]
+    assert kinds.index("reset") < kinds.index("answer")
+    after_reset = events[kinds.index("reset") + 1 :]
+    assert (
+        "".join(e.text for e in after_reset if e.type == "token")
+        == "Prado es un proyecto."
+    )
+    assert "ignored" not in "".join(e.text for e in events if e.type == "token")
+    assert events[-1].text == "Prado es un proyecto."
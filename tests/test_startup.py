@@ -0,0 +1,18 @@
+"""
+Serving cold start: benchmarks.startup_budget imports the agent in fresh
+interpreters and fails on a slow import or an eagerly loaded heavy module.
+
+    PYTHONPATH=src python -m pytest tests
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_agent_import_stays_within_budget():
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup_budget"],
+        cwd=ROOT, capture_output=True, text=True, timeout=300
+    )
+    assert result.returncode == 0, result.stdout + result.stderr